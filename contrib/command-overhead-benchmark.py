@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+#
+# Copyright (C) 2017 FreeIPA Contributors see COPYING for license
+#
+"""Benchmark of the per-call overhead of the command framework
+
+The benchmark calls a command which does nothing in its execute() method,
+so all of the measured time is spent converting, normalizing, validating
+and logging the params and validating the output. The command takes a
+multi-valued option similar to the SSH public keys of user_add. No IPA
+server is needed:
+
+    $ python contrib/command-overhead-benchmark.py --calls 10000 --values 50
+
+Use --debug to measure the calls with debug logging enabled.
+"""
+from __future__ import print_function
+
+import argparse
+import gc
+import logging
+import os
+import time
+
+from ipalib import Command, create_api
+from ipalib.parameters import Int, Password, Str
+from ipapython.version import API_VERSION
+
+
+class benchmark_cmd(Command):
+    takes_args = (
+        Str('uid'),
+    )
+    takes_options = (
+        Str('givenname'),
+        Str('sn'),
+        Int('uidnumber', minvalue=1),
+        Password('userpassword?'),
+        Str('ipasshpubkey*'),
+    )
+
+    def execute(self, *args, **options):
+        return dict(result=None)
+
+
+def call_command(cmd, calls, values):
+    keys = [u'ssh-rsa %s user%d@example.com' % (u'A' * 372, i)
+            for i in range(values)]
+    for i in range(calls):
+        cmd(u'user%d' % i, givenname=u'Test', sn=u'User', uidnumber=100000,
+            userpassword=u'Secret123', ipasshpubkey=keys,
+            version=API_VERSION)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--calls', type=int, default=10000,
+                        help='number of calls of the command')
+    parser.add_argument('--values', type=int, default=50,
+                        help='number of values of the multi-valued option')
+    parser.add_argument('--debug', action='store_true',
+                        help='enable debug logging to /dev/null')
+    args = parser.parse_args()
+
+    if args.debug:
+        logging.basicConfig(level=logging.DEBUG,
+                            stream=open(os.devnull, 'w'))
+
+    api = create_api(mode='dummy')
+    api.env.in_server = True
+    api.add_plugin(benchmark_cmd)
+    api.finalize()
+
+    gc.collect()
+    start = time.time()
+    call_command(api.Command.benchmark_cmd, args.calls, args.values)
+    elapsed = time.time() - start
+    print('%-24s %8.3f s' % ('call command', elapsed))
+    print('%-24s %8.1f us' % ('per call', elapsed / args.calls * 1e6))
+
+
+if __name__ == '__main__':
+    main()
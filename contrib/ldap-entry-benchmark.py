@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+#
+# Copyright (C) 2017 FreeIPA Contributors see COPYING for license
+#
+"""Benchmark of LDAPEntry handling of large search results
+
+The benchmark converts a synthetic search result with user-like entries to
+LDAPEntry objects the same way as LDAPClient does for real searches, then
+reads all values of every entry and finally modifies a few entries and
+generates their modlists. The encoding and decoding of single values is
+timed separately. No LDAP server is needed:
+
+    $ python contrib/ldap-entry-benchmark.py --entries 100000
+"""
+from __future__ import print_function
+
+import argparse
+import datetime
+import gc
+import time
+
+from ipapython.dn import DN
+from ipapython.ipaldap import LDAPClient
+
+
+def make_result(count):
+    result = []
+    for i in range(count):
+        uid = 'user%d' % i
+        dn = 'uid=%s,cn=users,cn=accounts,dc=example,dc=com' % uid
+        attrs = {
+            'objectClass': [b'top', b'person', b'organizationalperson',
+                            b'inetorgperson', b'inetuser', b'posixaccount',
+                            b'krbprincipalaux', b'krbticketpolicyaux',
+                            b'ipaobject', b'ipasshuser', b'ipaSshGroupOfPubKeys'],
+            'uid': [uid.encode('ascii')],
+            'givenName': [b'Test'],
+            'sn': [('User %d' % i).encode('ascii')],
+            'cn': [('Test User %d' % i).encode('ascii')],
+            'uidNumber': [str(100000 + i).encode('ascii')],
+            'gidNumber': [str(100000 + i).encode('ascii')],
+            'homeDirectory': [('/home/%s' % uid).encode('ascii')],
+            'loginShell': [b'/bin/sh'],
+            'krbPrincipalName': [('%s@EXAMPLE.COM' % uid).encode('ascii')],
+            'mail': [('%s@example.com' % uid).encode('ascii')],
+            'memberOf': [b'cn=ipausers,cn=groups,cn=accounts,dc=example,dc=com'],
+        }
+        result.append((dn, attrs))
+    return result
+
+
+def timed(label, func, *args):
+    gc.collect()
+    start = time.time()
+    value = func(*args)
+    print('%-24s %8.3f s' % (label, time.time() - start))
+    return value
+
+
+def read_entries(entries):
+    for entry in entries:
+        for name in entry:
+            entry[name]
+
+
+def modify_entries(entries, step):
+    for entry in entries[::step]:
+        entry['loginShell'] = [u'/bin/bash']
+        entry['mail'].append(u'alias@example.com')
+        entry.generate_modlist()
+
+
+def encode_values(client, rounds):
+    values = [u'Test User', 100000, True, b'\x00\x01',
+              DN('cn=ipausers,cn=groups,cn=accounts,dc=example,dc=com'),
+              datetime.datetime(2017, 1, 1)]
+    for _i in range(rounds):
+        for value in values:
+            client.encode(value)
+
+
+def decode_values(client, rounds):
+    values = [('cn', b'Test User'),
+              ('krbPrincipalName', b'user@EXAMPLE.COM'),
+              ('idnsName', b'host.example.com.'),
+              ('memberOf',
+               b'cn=ipausers,cn=groups,cn=accounts,dc=example,dc=com')]
+    for _i in range(rounds):
+        for attr, value in values:
+            client.decode(value, attr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--entries', type=int, default=100000,
+                        help='number of entries in the search result')
+    parser.add_argument('--modify-step', type=int, default=100,
+                        help='modify every n-th entry')
+    parser.add_argument('--rounds', type=int, default=100000,
+                        help='rounds of the encoding and decoding benchmark')
+    args = parser.parse_args()
+
+    client = LDAPClient('ldap://localhost', no_schema=True)
+    result = make_result(args.entries)
+    entries = timed('convert result', client._convert_result, result)
+    assert entries[0].dn == DN(result[0][0])
+    timed('read all values', read_entries, entries)
+    timed('modify and modlist', modify_entries, entries, args.modify_step)
+    timed('encode values', encode_values, client, args.rounds)
+    timed('decode values', decode_values, client, args.rounds)
+
+
+if __name__ == '__main__':
+    main()
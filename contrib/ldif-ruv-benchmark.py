@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+#
+# Copyright (C) 2017 FreeIPA Contributors see COPYING for license
+#
+"""Benchmark of the removal of the RUV entry from LDIF during restore
+
+The benchmark generates a synthetic LDIF export with user-like entries and
+the RUV tombstone entry in the middle and copies it without the RUV entry
+the same way as ipa-restore does before importing the LDIF. No LDAP server
+is needed:
+
+    $ python contrib/ldif-ruv-benchmark.py --entries 100000
+"""
+from __future__ import print_function
+
+import argparse
+import gc
+import io
+import logging
+import time
+
+from ipaserver.install.ipa_restore import remove_ruv
+
+RUV_ENTRY = (
+    b"dn: nsuniqueid=ffffffff-ffffffff-ffffffff-ffffffff,dc=example,dc=com\n"
+    b"objectClass: top\n"
+    b"objectClass: nsTombstone\n"
+    b"objectClass: extensibleobject\n"
+    b"nsuniqueid: ffffffff-ffffffff-ffffffff-ffffffff\n"
+    b"nsds50ruv: {replicageneration} 58ad8d3a000000040000\n"
+)
+
+
+def make_entry(i):
+    return (
+        b"dn: uid=user%d,cn=users,cn=accounts,dc=example,dc=com\n"
+        b"objectClass: top\n"
+        b"objectClass: person\n"
+        b"uid: user%d\n"
+        b"description: a long value which is continued on the next line a\n"
+        b" nd ends here\n"
+        b"nsuniqueid: %08x-11111111-22222222-33333333\n" % (i, i, i)
+    )
+
+
+def make_ldif(count):
+    entries = [make_entry(i) for i in range(count)]
+    entries.insert(count // 2, RUV_ENTRY)
+    return b"version: 1\n" + b"\n".join(entries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--entries', type=int, default=100000,
+                        help='number of entries in the LDIF')
+    args = parser.parse_args()
+
+    data = make_ldif(args.entries)
+    out = io.BytesIO()
+
+    gc.collect()
+    start = time.time()
+    remove_ruv(io.BytesIO(data), out, logging.getLogger(__name__))
+    elapsed = time.time() - start
+
+    assert len(out.getvalue()) == len(data) - len(RUV_ENTRY) - 1
+    print('%-24s %8.3f s' % ('remove RUV', elapsed))
+    print('%-24s %8.1f MB/s' % ('throughput',
+                                 len(data) / (1024.0 * 1024.0) /
+                                 max(elapsed, 1e-6)))
+
+
+if __name__ == '__main__':
+    main()
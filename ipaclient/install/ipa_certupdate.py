@@ -18,9 +18,12 @@
 #
 
 import os
+import sys
 import tempfile
 import shutil
+import threading
 
+import six
 # pylint: disable=import-error
 from six.moves.urllib.parse import urlsplit
 # pylint: enable=import-error
@@ -97,7 +100,19 @@ class CertUpdate(admintool.AdminTool):
             shutil.rmtree(tmpdir)
 
         server_fstore = sysrestore.FileStore(paths.SYSRESTORE)
-        if server_fstore.has_files():
+        is_server = server_fstore.has_files()
+
+        # the databases are independent of each other, update them at once
+        db_paths = [api.env.nss_dir]
+        if is_server:
+            instance = '-'.join(api.env.realm.split('.'))
+            db_paths += [
+                paths.ETC_DIRSRV_SLAPD_INSTANCE_TEMPLATE % instance,
+                paths.HTTPD_ALIAS_DIR,
+            ]
+        self.update_dbs(db_paths, certs)
+
+        if is_server:
             self.update_server(certs)
             try:
                 # pylint: disable=import-error,ipa-forbidden-import
@@ -114,31 +129,14 @@ class CertUpdate(admintool.AdminTool):
     def update_client(self, certs):
         self.update_file(paths.IPA_CA_CRT, certs)
 
-        ipa_db = certdb.NSSDatabase(api.env.nss_dir)
-
-        # Remove old IPA certs from /etc/ipa/nssdb
-        for nickname in ('IPA CA', 'External CA cert'):
-            while ipa_db.has_nickname(nickname):
-                try:
-                    ipa_db.delete_cert(nickname)
-                except ipautil.CalledProcessError as e:
-                    self.log.error("Failed to remove %s from %s: %s",
-                                   nickname, ipa_db.secdir, e)
-                    break
-
-        self.update_db(ipa_db.secdir, certs)
-
         tasks.remove_ca_certs_from_systemwide_ca_store()
         tasks.insert_ca_certs_into_systemwide_ca_store(certs)
 
     def update_server(self, certs):
         instance = '-'.join(api.env.realm.split('.'))
-        self.update_db(
-            paths.ETC_DIRSRV_SLAPD_INSTANCE_TEMPLATE % instance, certs)
         if services.knownservices.dirsrv.is_running():
             services.knownservices.dirsrv.restart(instance)
 
-        self.update_db(paths.HTTPD_ALIAS_DIR, certs)
         if services.knownservices.httpd.is_running():
             services.knownservices.httpd.restart()
 
@@ -178,13 +176,53 @@ class CertUpdate(admintool.AdminTool):
         except Exception as e:
             self.log.error("failed to update %s: %s", filename, e)
 
+    def update_dbs(self, db_paths, certs):
+        """
+        Update the databases in parallel threads, an exception raised in
+        any of them is re-raised once all of them finished.
+        """
+        threads = []
+        exc_infos = []
+        for path in db_paths:
+            exc_info = []
+            t = threading.Thread(target=self._update_db_thread,
+                                 args=(path, certs, exc_info))
+            t.daemon = True
+            t.start()
+            threads.append(t)
+            exc_infos.append(exc_info)
+        for t in threads:
+            t.join()
+        for exc_info in exc_infos:
+            if exc_info:
+                six.reraise(*exc_info)
+
+    def _update_db_thread(self, path, certs, exc_info):
+        try:
+            self.update_db(path, certs)
+        except BaseException:
+            exc_info.extend(sys.exc_info())
+
     def update_db(self, path, certs):
         db = certdb.NSSDatabase(path)
+
+        if path == api.env.nss_dir:
+            # Remove old IPA certs from /etc/ipa/nssdb
+            for nickname, e in db.delete_certs(('IPA CA', 'External CA cert')):
+                self.log.error("Failed to remove %s from %s: %s",
+                               nickname, path, e)
+
+        nss_certs = []
         for cert, nickname, trusted, eku in certs:
             trust_flags = certstore.key_policy_to_trust_flags(
                 trusted, True, eku)
-            try:
-                db.add_cert(cert, nickname, trust_flags)
-            except ipautil.CalledProcessError as e:
-                self.log.error(
-                    "failed to update %s in %s: %s", nickname, path, e)
+            nss_certs.append((cert, nickname, trust_flags))
+
+        try:
+            failed = db.add_certs(nss_certs)
+        except ipautil.CalledProcessError as e:
+            self.log.error("failed to update %s: %s", path, e)
+            return
+        for nickname, e in failed:
+            self.log.error(
+                "failed to update %s in %s: %s", nickname, path, e)
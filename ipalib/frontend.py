@@ -369,6 +369,17 @@ class HasParam(Plugin):
 _callback_registry = {}
 
 
+class _ParamsRepr(object):
+    __slots__ = ('command', 'params')
+
+    def __init__(self, command, params):
+        self.command = command
+        self.params = params
+
+    def __str__(self):
+        return ', '.join(self.command._repr_iter(**self.params))
+
+
 class Command(HasParam):
     """
     A public IPA atomic operation.
@@ -459,16 +470,15 @@ class Command(HasParam):
                 self.add_message(
                     messages.VersionMissing(server_version=self.api_version))
         params = self.args_options_2_params(*args, **options)
-        self.debug(
-            'raw: %s(%s)', self.name, ', '.join(self._repr_iter(**params))
-        )
+        record = getattr(context, 'params_record', None)
+        if record is not None and record.params is None:
+            record.params = dict(params)
+        self.debug('raw: %s(%s)', self.name, self._repr_params(params))
         if self.api.env.in_server:
             params.update(self.get_default(**params))
         params = self.normalize(**params)
         params = self.convert(**params)
-        self.debug(
-            '%s(%s)', self.name, ', '.join(self._repr_iter(**params))
-        )
+        self.debug('%s(%s)', self.name, self._repr_params(params))
         if self.api.env.in_server:
             self.validate(**params)
         (args, options) = self.params_2_args_options(**params)
@@ -517,6 +527,16 @@ class Command(HasParam):
             value = params[option.name]
             yield '%s=%r' % (option.name, option.safe_value(value))
 
+    def _repr_params(self, params):
+        """
+        Return an object rendering ``params`` like `_repr_iter()` when it is
+        converted to a string.
+
+        Passing this object to a logger defers the formatting of the params
+        until the message is actually emitted.
+        """
+        return _ParamsRepr(self, params)
+
     def args_options_2_params(self, *args, **options):
         """
         Merge (args, options) into params.
@@ -645,9 +665,12 @@ class Command(HasParam):
         >>> c.normalize(first=u'JOHN', last=u'DOE')
         {'last': u'DOE', 'first': u'john'}
         """
-        return dict(
-            (k, self.params[k].normalize(v)) for (k, v) in kw.items()
-        )
+        normalizers = self.__normalizers
+        result = {}
+        for k, v in kw.items():
+            normalize = normalizers[k]
+            result[k] = v if normalize is None else normalize(v)
+        return result
 
     def convert(self, **kw):
         """
@@ -665,9 +688,8 @@ class Command(HasParam):
         >>> c.convert(one=1, two=2)
         {'two': u'2', 'one': 1}
         """
-        return dict(
-            (k, self.params[k].convert(v)) for (k, v) in kw.items()
-        )
+        converters = self.__converters
+        return dict((k, converters[k](v)) for (k, v) in kw.items())
 
     def __convert_iter(self, kw):
         for param in self.params():
@@ -692,8 +714,7 @@ class Command(HasParam):
         {}
         """
         if _params is None:
-            _params = [p.name for p in self.params()
-                       if p.name not in kw and (p.required or p.autofill)]
+            _params = [name for name in self.__autofill if name not in kw]
         return dict(self.__get_default_iter(_params, kw))
 
     def get_default_of(self, _name, **kw):
@@ -710,12 +731,8 @@ class Command(HasParam):
         # Find out what additional parameters are needed to dynamically create
         # the default values with default_from.
         dep = set()
-        for param in reversed(self.params_by_default):
-            if param.name in params or param.name in dep:
-                if param.default_from is None:
-                    continue
-                for name in param.default_from.keys:
-                    dep.add(name)
+        for name in params:
+            dep.update(self.__default_deps.get(name, ()))
 
         for param in self.params_by_default():
             default = None
@@ -755,9 +772,11 @@ class Command(HasParam):
         If any value fails the validation, `ipalib.errors.ValidationError`
         (or a subclass thereof) will be raised.
         """
-        for param in self.params():
-            value = kw.get(param.name, None)
-            param.validate(value, supplied=param.name in kw)
+        for name, validate, validates_missing in self.__validators:
+            if name in kw:
+                validate(kw[name], supplied=True)
+            elif validates_missing:
+                validate(None, supplied=False)
 
     def verify_client_version(self, client_version):
         """
@@ -873,10 +892,39 @@ class Command(HasParam):
                     pass
             params.insert(pos, i)
         self.params_by_default = NameSpace(params, sort=False)
+        self.__compile_params()
         self.output = NameSpace(self._iter_output(), sort=False)
         self._create_param_namespace('output_params')
         super(Command, self)._on_finalize()
 
+    def __compile_params(self):
+        """
+        Prepare the per-param callables used by `Command.normalize`,
+        `Command.convert`, `Command.validate` and `Command.get_default`, so
+        that whatever depends only on the params is not redone on every call.
+        """
+        self.__normalizers = dict(
+            (p.name, p._compile_normalize()) for p in self.params())
+        self.__converters = dict(
+            (p.name, p._compile_convert()) for p in self.params())
+        self.__validators = tuple(
+            (p.name, p.validate, p._validates_missing())
+            for p in self.params())
+        self.__autofill = tuple(
+            p.name for p in self.params() if p.required or p.autofill)
+
+        # The parameters needed to create the default value of each parameter
+        # with default_from, including the indirect ones.
+        self.__default_deps = {}
+        for param in self.params():
+            dep = set()
+            for p in reversed(self.params_by_default):
+                if p.name == param.name or p.name in dep:
+                    if p.default_from is None:
+                        continue
+                    dep.update(p.default_from.keys)
+            self.__default_deps[param.name] = frozenset(dep)
+
     def _iter_output(self):
         if type(self.has_output) is not tuple:
             raise TypeError('%s.has_output: need a %r; got a %r: %r' % (
@@ -613,18 +613,124 @@ def check_state(dirs):
     return reqids
 
 
-def wait_for_request(request_id, timeout=120):
-    for _i in range(0, timeout, 5):
-        state = get_request_value(request_id, 'status')
-        root_logger.debug("certmonger request is in state %r", state)
-        if state in ('CA_REJECTED', 'CA_UNREACHABLE', 'CA_UNCONFIGURED',
-                     'NEED_GUIDANCE', 'NEED_CA', 'MONITORING'):
-            break
-        time.sleep(5)
-    else:
-        raise RuntimeError("request timed out")
+# states in which certmonger does not make any further progress on its own
+REQUEST_DONE_STATES = ('CA_REJECTED', 'CA_UNREACHABLE', 'CA_UNCONFIGURED',
+                       'NEED_GUIDANCE', 'NEED_CA', 'MONITORING')
 
-    return state
+
+def _get_request_states(cm, request_ids):
+    states = {}
+    for request_id in request_ids:
+        request_path = cm.obj_if.find_request_by_nickname(request_id)
+        if not request_path:
+            raise RuntimeError("certmonger request %s not found" % request_id)
+        request = _cm_dbus_object(cm.bus, cm, request_path, DBUS_CM_REQUEST_IF,
+                                  DBUS_CM_IF, True)
+        state = str(request.prop_if.Get(DBUS_CM_REQUEST_IF, 'status'))
+        root_logger.debug("certmonger request %s is in state %r",
+                          request_id, state)
+        states[request_id] = state
+    return states
+
+
+def _wait_for_requests_poll(cm, request_ids, timeout):
+    """
+    Wait for requests by polling their state, the polling interval grows
+    from half a second to 5 seconds.
+    """
+    deadline = time.time() + timeout
+    interval = 0.5
+    states = {}
+    pending = list(request_ids)
+    while True:
+        for request_id, state in _get_request_states(cm, pending).items():
+            states[request_id] = state
+            if state in REQUEST_DONE_STATES:
+                pending.remove(request_id)
+        if not pending:
+            return states
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            raise RuntimeError("request timed out")
+        time.sleep(min(interval, remaining))
+        interval = min(interval * 2, 5)
+
+
+def _wait_for_requests_signal(request_ids, timeout):
+    """
+    Wait for requests by listening to certmonger's PropertiesChanged
+    signals. The states are also checked every 5 seconds in case a signal
+    is missed.
+    """
+    # pylint: disable=import-error
+    from dbus.mainloop.glib import DBusGMainLoop
+    from gi.repository import GLib
+    # pylint: enable=import-error
+
+    bus = dbus.SystemBus(mainloop=DBusGMainLoop(), private=True)
+    try:
+        bus.get_name_owner(DBUS_CM_NAME)
+        cm = _cm_dbus_object(bus, None, DBUS_CM_PATH, DBUS_CM_IF)
+        loop = GLib.MainLoop()
+
+        def wake_up(*_args):
+            loop.quit()
+            # keep the timeout source, it is removed after the loop
+            return True
+
+        match = bus.add_signal_receiver(
+            wake_up, signal_name='PropertiesChanged',
+            dbus_interface=DBUS_PROPERTY_IF, bus_name=DBUS_CM_NAME)
+        try:
+            deadline = time.time() + timeout
+            states = {}
+            pending = list(request_ids)
+            while True:
+                for request_id, state in _get_request_states(
+                        cm, pending).items():
+                    states[request_id] = state
+                    if state in REQUEST_DONE_STATES:
+                        pending.remove(request_id)
+                if not pending:
+                    return states
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    raise RuntimeError("request timed out")
+                source = GLib.timeout_add(int(min(remaining, 5) * 1000),
+                                          wake_up)
+                loop.run()
+                GLib.source_remove(source)
+        finally:
+            match.remove()
+    finally:
+        bus.close()
+
+
+def wait_for_requests(request_ids, timeout=120):
+    """
+    Wait until certmonger stops processing all of the given requests.
+
+    Each request is considered finished as soon as it reaches one of
+    REQUEST_DONE_STATES. Changes are received as D-Bus signals when the
+    GLib main loop integration is available, otherwise the request states
+    are polled.
+
+    :returns: dict mapping request IDs to their final states
+    :raises RuntimeError: when a request did not finish in timeout seconds
+    """
+    request_ids = list(request_ids)
+    try:
+        return _wait_for_requests_signal(request_ids, timeout)
+    except (ImportError, ValueError, dbus.DBusException) as e:
+        root_logger.debug("Unable to wait for certmonger signals, "
+                          "polling request states: %s", e)
+
+    cm = _certmonger()
+    return _wait_for_requests_poll(cm, request_ids, timeout)
+
+
+def wait_for_request(request_id, timeout=120):
+    return wait_for_requests([request_id], timeout)[request_id]
 
 if __name__ == '__main__':
     request_id = request_cert(paths.HTTPD_ALIAS_DIR,
@@ -23,9 +23,11 @@
 # parts of the system configuration to the way it was
 # before ipa-server-install was first run
 
+import functools
 import os
 import os.path
 import shutil
+import threading
 from ipapython.ipa_log_manager import root_logger
 import random
 
@@ -44,6 +46,18 @@ SYSRESTORE_PATH = paths.TMP
 SYSRESTORE_INDEXFILE = "sysrestore.index"
 SYSRESTORE_STATEFILE = "sysrestore.state"
 
+# Upgrade steps executed by a StepScheduler may run concurrently, serialize
+# the read-modify-write cycles of the index and state files among all threads
+_lock = threading.RLock()
+
+
+def _locked(func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with _lock:
+            return func(*args, **kwargs)
+    return wrapper
+
 
 class FileStore(object):
     """Class for handling backup and restore of files"""
@@ -104,6 +118,7 @@ class FileStore(object):
         with open(self._index, "w") as f:
             p.write(f)
 
+    @_locked
     def backup_file(self, path):
         """Create a copy of the file at @path - so long as a copy
         does not already exist - which will be restored to its
@@ -136,6 +151,8 @@ class FileStore(object):
         stat = os.stat(path)
 
         template = '{stat.st_mode},{stat.st_uid},{stat.st_gid},{path}'
+        # other instances may have updated the index in the meantime
+        self._load()
         self.files[filename] = template.format(stat=stat, path=path)
         self.save()
 
@@ -152,6 +169,7 @@ class FileStore(object):
                 break
         return result
 
+    @_locked
     def restore_file(self, path, new_path = None):
         """Restore the copy of a file at @path to its original
         location and delete the copy.
@@ -203,7 +221,8 @@ class FileStore(object):
 
         tasks.restore_context(path)
 
-        del self.files[filename]
+        self._load()
+        self.files.pop(filename, None)
         self.save()
 
         return True
@@ -250,6 +269,7 @@ class FileStore(object):
 
         return len(self.files) > 0
 
+    @_locked
     def untrack_file(self, path):
         """Remove file at path @path from list of backed up files.
 
@@ -285,7 +305,8 @@ class FileStore(object):
         except Exception as e:
             root_logger.error('Error removing %s: %s' % (backup_path, str(e)))
 
-        del self.files[filename]
+        self._load()
+        self.files.pop(filename, None)
         self.save()
 
         return True
@@ -295,8 +316,8 @@ class StateFile(object):
     """A metadata file for recording system state which can
     be backed up and later restored.
     StateFile gets reloaded every time to prevent loss of information
-    recorded by child processes. But we do not solve concurrency
-    because there is no need for it right now.
+    recorded by child processes. Updates from threads of the same process
+    are serialized, concurrent processes are not handled.
     The format is something like:
 
     [httpd]
@@ -369,6 +390,7 @@ class StateFile(object):
         with open(self._path, "w") as f:
             p.write(f)
 
+    @_locked
     def backup_state(self, module, key, value):
         """Backup an item of system state from @module, identified
         by the string @key and with the value @value. @value may be
@@ -401,6 +423,7 @@ class StateFile(object):
 
         return self.modules[module].get(key, None)
 
+    @_locked
     def delete_state(self, module, key):
         """Delete system state from @module, identified by the string
         @key.
@@ -416,6 +439,7 @@ class StateFile(object):
         else:
             self.save()
 
+    @_locked
     def restore_state(self, module, key):
         """Return the value of an item of system state from @module,
         identified by the string @key, and remove it from the backed
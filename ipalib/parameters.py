@@ -135,6 +135,16 @@ if six.PY3:
     unicode = str
 
 
+def _is_inherited(obj, name, *classes):
+    """
+    Return True if the method ``name`` of ``obj`` is the one defined by one
+    of ``classes``, i.e. it is not overridden by the class of ``obj``.
+    """
+    func = six.get_unbound_function(getattr(type(obj), name))
+    return any(func is six.get_unbound_function(getattr(cls, name))
+               for cls in classes)
+
+
 class DefaultFrom(ReadOnly):
     """
     Derive a default value from other supplied values.
@@ -776,6 +786,53 @@ class Param(ReadOnly):
         except Exception:
             return value
 
+    def _compile_normalize(self):
+        """
+        Return a callable equivalent to `Param.normalize()`.
+
+        ``None`` is returned instead if `Param.normalize()` always returns
+        the value unchanged.
+        """
+        if (self.normalizer is None and not self.multivalue and
+                _is_inherited(self, 'normalize', Param) and
+                _is_inherited(self, '_normalize_scalar', Param)):
+            return None
+        return self.normalize
+
+    def _compile_convert(self):
+        """
+        Return a callable equivalent to `Param.convert()`.
+
+        If the conversion of a scalar value of one of the allowed types is
+        known to return the value unchanged, the callable returns such values
+        without calling `Param.convert()`.
+        """
+        convert = self.convert
+        if (self.multivalue or
+                not _is_inherited(self, 'convert', Param) or
+                not _is_inherited(self, '_convert_scalar',
+                                  Param, Bool, Number, Int, Str)):
+            return convert
+
+        allowed_types = frozenset(self.allowed_types)
+        if _is_inherited(self, '_convert_scalar', Int):
+            # Int.convert_int() checks Int.allowed_types
+            allowed_types &= frozenset(Int.allowed_types)
+
+        def fast_convert(value):
+            # null values are converted to None by convert()
+            if value and type(value) in allowed_types:
+                return value
+            return convert(value)
+
+        return fast_convert
+
+    def _validates_missing(self):
+        """
+        Return False if `Param.validate()` of a missing value is a no-op.
+        """
+        return self.required or not _is_inherited(self, 'validate', Param)
+
     def convert(self, value):
         """
         Convert ``value`` to the Python type required by this parameter.
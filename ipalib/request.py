@@ -53,6 +53,34 @@ def context_frame():
             del context.current_frame
 
 
+class _ParamsRecord(object):
+    def __init__(self):
+        self.params = None
+
+
+@contextlib.contextmanager
+def params_record():
+    """
+    Record the raw params of the first command called within the block.
+
+    The params converted by `frontend.Command.args_options_2_params()` are
+    available in the ``params`` attribute of the yielded object after the
+    command is called, or ``None`` if the conversion failed.
+    """
+    try:
+        record_back = context.params_record
+    except AttributeError:
+        pass
+    context.params_record = _ParamsRecord()
+    try:
+        yield context.params_record
+    finally:
+        try:
+            context.params_record = record_back
+        except UnboundLocalError:
+            del context.params_record
+
+
 class Connection(ReadOnly):
     """
     Base class for connection objects stored on `request.context`.
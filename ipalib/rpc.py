@@ -87,6 +87,12 @@ else:
     from httplib import BadStatusLine as RemoteDisconnected
 # pylint: enable=import-error
 
+# orjson is an optional, faster JSON encoder for Python 3
+try:
+    import orjson  # pylint: disable=import-error
+except ImportError:
+    orjson = None
+
 
 if six.PY3:
     unicode = str
@@ -291,6 +297,11 @@ class _JSONPrimer(dict):
     The _ipa_obj_hook() functions unserializes the marked JSON objects to
     bytes, datetime and DNSName.
 
+    On Python 3, the primer can also be used as the default hook of a JSON
+    encoder, see default(). The encoder then serializes the data structure
+    in a single pass and calls the hook for the values it cannot handle
+    itself only.
+
     :see: _ipa_obj_hook
     """
     __slots__ = ('version', '_cap_datetime', '_cap_dnsname')
@@ -339,6 +350,25 @@ class _JSONPrimer(dict):
         func = self[obj.__class__]
         return obj if func is _identity else func(obj)
 
+    def default(self, obj, _identity=_identity):
+        """Default hook of JSON encoders
+
+        Convert an object which the encoder cannot serialize itself. On
+        Python 2, bytes are serialized as text by the encoders, so convert()
+        has to be used instead.
+        """
+        func = self[obj.__class__]
+        if func is not _identity:
+            return func(obj)
+        # subclasses of str, int and float are passed to the hook by orjson
+        if isinstance(obj, unicode):
+            return unicode.__str__(obj)
+        elif isinstance(obj, float):
+            return float(obj)
+        elif isinstance(obj, six.integer_types):
+            return int(obj)
+        raise TypeError(obj.__class__)
+
     def _enc_datetime(self, val):
         cap = self._cap_datetime
         if cap is None:
@@ -393,11 +423,30 @@ def json_encode_binary(val, version, pretty_print=False):
     :note: pretty printing triggers a slow path in Python's JSON module. Only
            use pretty_print in debug mode.
     """
-    result = _JSONPrimer(version).convert(val)
+    primer = _JSONPrimer(version)
+    if six.PY2:
+        result = primer.convert(val)
+        if pretty_print:
+            return json.dumps(result, indent=4, sort_keys=True)
+        else:
+            return json.dumps(result)
+
     if pretty_print:
-        return json.dumps(result, indent=4, sort_keys=True)
-    else:
-        return json.dumps(result)
+        return json.dumps(val, default=primer.default, indent=4,
+                          sort_keys=True)
+    if orjson is not None:
+        try:
+            # subclasses, e.g. CIDict, are serialized by the hook so that
+            # their own items() are used like with the json module
+            return orjson.dumps(
+                val, default=primer.default,
+                option=(orjson.OPT_PASSTHROUGH_DATETIME |
+                        orjson.OPT_PASSTHROUGH_SUBCLASS)).decode('utf-8')
+        except TypeError:
+            # e.g. integers out of the 64-bit range or non-string keys,
+            # let the json module either handle or report them
+            pass
+    return json.dumps(val, default=primer.default)
 
 
 def _ipa_obj_hook(dct, _iteritems=six.iteritems, _list=list):
@@ -25,6 +25,7 @@ interacting with system services.
 
 import os
 import json
+import threading
 import time
 import collections
 import warnings
@@ -55,6 +56,10 @@ wellknownports = {
 
 SERVICE_POLL_INTERVAL = 0.1 # seconds
 
+# services may be started and stopped concurrently, serialize updates of
+# the list of started services
+_svc_list_lock = threading.Lock()
+
 
 class KnownServices(collections.Mapping):
     """
@@ -115,19 +120,20 @@ class PlatformService(object):
         """
         if not update_service_list:
             return
-        svc_list = []
-        try:
-            with open(paths.SVC_LIST_FILE, 'r') as f:
-                svc_list = json.load(f)
-        except Exception:
-            # not fatal, may be the first service
-            pass
+        with _svc_list_lock:
+            svc_list = []
+            try:
+                with open(paths.SVC_LIST_FILE, 'r') as f:
+                    svc_list = json.load(f)
+            except Exception:
+                # not fatal, may be the first service
+                pass
 
-        if self.service_name not in svc_list:
-            svc_list.append(self.service_name)
+            if self.service_name not in svc_list:
+                svc_list.append(self.service_name)
 
-        with open(paths.SVC_LIST_FILE, 'w') as f:
-            json.dump(svc_list, f)
+            with open(paths.SVC_LIST_FILE, 'w') as f:
+                json.dump(svc_list, f)
 
         return
 
@@ -138,19 +144,20 @@ class PlatformService(object):
         """
         if not update_service_list:
             return
-        svc_list = []
-        try:
-            with open(paths.SVC_LIST_FILE, 'r') as f:
-                svc_list = json.load(f)
-        except Exception:
-            # not fatal, may be the first service
-            pass
+        with _svc_list_lock:
+            svc_list = []
+            try:
+                with open(paths.SVC_LIST_FILE, 'r') as f:
+                    svc_list = json.load(f)
+            except Exception:
+                # not fatal, may be the first service
+                pass
 
-        while self.service_name in svc_list:
-            svc_list.remove(self.service_name)
+            while self.service_name in svc_list:
+                svc_list.remove(self.service_name)
 
-        with open(paths.SVC_LIST_FILE, 'w') as f:
-            json.dump(svc_list, f)
+            with open(paths.SVC_LIST_FILE, 'w') as f:
+                json.dump(svc_list, f)
 
         return
 
@@ -261,10 +268,25 @@ class SystemdService(PlatformService):
             elements = self.systemd_name.split("@")
             if elements[0] in wellknownports:
                 ports = wellknownports[elements[0]]
-        if ports:
+        if ports and not self.is_notify_service(instance_name):
             ipautil.wait_for_open_ports('localhost', ports,
                                         self.api.env.startup_timeout)
 
+    def is_notify_service(self, instance_name=""):
+        """
+        Return True if the service notifies systemd when it is ready.
+
+        systemd reports such services active only once they finished their
+        start up, so their ports need not be polled.
+        """
+        unit = instance_name or self.systemd_name
+        try:
+            result = ipautil.run([paths.SYSTEMCTL, "show", "-p", "Type", unit],
+                                 capture_output=True)
+        except ipautil.CalledProcessError:
+            return False
+        return result.output.strip() == 'Type=notify'
+
     def stop(self, instance_name="", capture_output=True):
         instance = self.service_instance(instance_name)
         args = [paths.SYSTEMCTL, "stop", instance]
@@ -538,6 +538,155 @@ class NSSDatabase(object):
     def delete_cert(self, nick):
         self.run_certutil(["-D", "-n", nick])
 
+    def run_certutil_batch(self, commands):
+        """Run several certutil commands in a single certutil process
+
+        :param commands: list of certutil argument lists, without the
+            database and password file arguments
+        """
+        lines = []
+        for args in commands:
+            line = []
+            for arg in args:
+                if '"' in arg or '\n' in arg:
+                    raise ValueError("invalid certutil argument %r" % arg)
+                if not arg or ' ' in arg:
+                    arg = '"%s"' % arg
+                line.append(arg)
+            lines.append(' '.join(line))
+
+        with tempfile.NamedTemporaryFile(mode='w') as f:
+            f.write('\n'.join(lines) + '\n')
+            f.flush()
+            return self.run_certutil(["-B", "-i", f.name],
+                                     capture_output=True)
+
+    def _get_certs_by_nickname(self, counts):
+        """Return dict mapping nicknames to sets of DER certificates stored
+        under them
+
+        :param counts: dict mapping nicknames to the number of certificates
+            stored under them, as listed by list_certs()
+        """
+        nicknames = sorted(counts)
+        if not nicknames:
+            return {}
+        result = self.run_certutil_batch(
+            [["-L", "-n", nick, "-a"] for nick in nicknames])
+        certs = []
+        start = 0
+        while True:
+            try:
+                cert, start = find_cert_from_txt(result.output, start)
+            except RuntimeError:
+                break
+            certs.append(base64.b64decode(x509.strip_header(cert)))
+
+        # the certificates are printed in the order of the commands
+        if len(certs) != sum(counts.values()):
+            root_logger.debug("Unexpected number of certificates in %s",
+                              self.secdir)
+            return {}
+        by_nickname = {}
+        for nick in nicknames:
+            by_nickname[nick] = set(certs[:counts[nick]])
+            certs = certs[counts[nick]:]
+        return by_nickname
+
+    def add_certs(self, certs):
+        """Add DER certificates with their trust flags
+
+        Certificates which are already present under the same nickname with
+        identical trust flags are skipped, all other certificates are added
+        by a single certutil process. When that fails, the certificates are
+        added one by one to find out which of them failed.
+
+        :param certs: iterable of (cert, nickname, trust_flags) tuples
+        :return: list of (nickname, error) tuples for certificates which
+            could not be added
+        """
+        def normalize(flags):
+            return tuple(frozenset(f) for f in flags.split(','))
+
+        certs = list(certs)
+        present = {}
+        counts = {}
+        for nick, flags in self.list_certs():
+            present.setdefault(nick, set()).add(normalize(flags))
+            counts[nick] = counts.get(nick, 0) + 1
+
+        candidates = set(nick for _cert, nick, flags in certs
+                         if normalize(flags) in present.get(nick, ()))
+        try:
+            existing = self._get_certs_by_nickname(
+                dict((nick, counts[nick]) for nick in candidates))
+        except ipautil.CalledProcessError:
+            existing = {}
+
+        to_add = [(cert, nick, flags) for cert, nick, flags in certs
+                  if not (normalize(flags) in present.get(nick, ()) and
+                          cert in existing.get(nick, ()))]
+        root_logger.debug("Adding %d of %d certificates to %s",
+                          len(to_add), len(certs), self.secdir)
+        if not to_add:
+            return []
+
+        tmpdir = tempfile.mkdtemp()
+        try:
+            commands = []
+            for i, (cert, nick, flags) in enumerate(to_add):
+                filename = os.path.join(tmpdir, '%d.der' % i)
+                with open(filename, 'wb') as f:
+                    f.write(cert)
+                commands.append(
+                    ["-A", "-n", nick, "-t", flags, "-i", filename])
+            try:
+                self.run_certutil_batch(commands)
+            except ipautil.CalledProcessError:
+                pass
+            else:
+                return []
+        finally:
+            shutil.rmtree(tmpdir)
+
+        failed = []
+        for cert, nick, flags in to_add:
+            try:
+                self.add_cert(cert, nick, flags)
+            except ipautil.CalledProcessError as e:
+                failed.append((nick, e))
+        return failed
+
+    def delete_certs(self, nicknames):
+        """Delete all certificates stored under the given nicknames
+
+        All certificates are deleted by a single certutil process. When that
+        fails, the certificates are deleted one by one.
+
+        :return: list of (nickname, error) tuples for nicknames whose
+            certificates could not be deleted
+        """
+        commands = [["-D", "-n", nick] for nick, _flags in self.list_certs()
+                    if nick in nicknames]
+        if not commands:
+            return []
+        try:
+            self.run_certutil_batch(commands)
+        except ipautil.CalledProcessError:
+            pass
+        else:
+            return []
+
+        failed = []
+        for nick in nicknames:
+            while self.has_nickname(nick):
+                try:
+                    self.delete_cert(nick)
+                except ipautil.CalledProcessError as e:
+                    failed.append((nick, e))
+                    break
+        return failed
+
     def verify_server_cert_validity(self, nickname, hostname):
         """Verify a certificate is valid for a SSL server with given hostname
 
@@ -20,28 +20,33 @@
 #
 
 import binascii
+import errno
+import hashlib
 import time
 import datetime
 from decimal import Decimal
-from copy import deepcopy
 import contextlib
 import collections
 import os
 import pwd
+import sys
+import tempfile
 
 # pylint: disable=import-error
+from six.moves import cPickle as pickle
 from six.moves.urllib.parse import urlparse
 # pylint: enable=import-error
 
 import ldap
 import ldap.sasl
 import ldap.filter
-from ldap.controls import SimplePagedResultsControl
+from ldap.controls import LDAPControl, SimplePagedResultsControl
+from ldap.controls.psearch import PersistentSearchControl
 import six
 
 # pylint: disable=ipa-forbidden-import
 from ipalib import errors, _
-from ipalib.constants import LDAP_GENERALIZED_TIME_FORMAT
+from ipalib.constants import LDAP_GENERALIZED_TIME_FORMAT, USER_CACHE_PATH
 # pylint: enable=ipa-forbidden-import
 from ipapython.ipautil import format_netloc, CIDict
 from ipapython.ipa_log_manager import log_mgr
@@ -71,6 +76,11 @@ TRUNCATED_ADMIN_LIMIT = object()
 
 DIRMAN_DN = DN(('cn', 'directory manager'))
 
+# Tree Delete control, draft-armijo-ldap-treedelete
+TREE_DELETE_OID = '1.2.840.113556.1.4.805'
+# Persistent search control, draft-ietf-ldapext-psearch
+PERSISTENT_SEARCH_OID = PersistentSearchControl.controlType
+
 
 class _ServerSchema(object):
     '''
@@ -86,11 +96,25 @@ class _ServerSchema(object):
 class SchemaCache(object):
     '''
     Cache the schema's from individual LDAP servers.
+
+    Besides the in-memory cache, the parsed schema is stored on disk in
+    ``cache_dir`` so that other processes talking to the same server can
+    skip downloading and parsing it. A cached schema is used only if the
+    modifyTimestamp and nsSchemaCSN of the server's schema entry match the
+    values it was stored with.
     '''
 
-    def __init__(self):
+    # bump when the format of the cache files changes
+    _cache_format = 1
+    _schema_dns = ('cn=schema', 'cn=subschema')
+    _version_attrs = ['modifyTimestamp', 'nsSchemaCSN']
+
+    def __init__(self, cache_dir=None):
         self.log = log_mgr.get_logger(self)
         self.servers = {}
+        if cache_dir is None:
+            cache_dir = os.path.join(USER_CACHE_PATH, 'ipa', 'ldap-schema')
+        self.cache_dir = cache_dir
 
     def get_schema(self, url, conn, force_update=False):
         '''
@@ -107,7 +131,8 @@ class SchemaCache(object):
 
         server_schema = self.servers.get(url)
         if server_schema is None:
-            schema = self._retrieve_schema_from_server(url, conn)
+            schema = self._retrieve_schema_from_server(
+                url, conn, use_disk_cache=not force_update)
             server_schema = _ServerSchema(url, schema)
             self.servers[url] = server_schema
         return server_schema.schema
@@ -119,7 +144,18 @@ class SchemaCache(object):
         except KeyError:
             pass
 
-    def _retrieve_schema_from_server(self, url, conn):
+    def _search_schema_entry(self, conn, attrlist):
+        try:
+            return conn.search_s(self._schema_dns[0], ldap.SCOPE_BASE,
+                                 attrlist=attrlist)[0]
+        except ldap.NO_SUCH_OBJECT:
+            # try different location for schema
+            # openldap has schema located in cn=subschema
+            self.log.debug('cn=schema not found, fallback to cn=subschema')
+            return conn.search_s(self._schema_dns[1], ldap.SCOPE_BASE,
+                                 attrlist=attrlist)[0]
+
+    def _retrieve_schema_from_server(self, url, conn, use_disk_cache=True):
         """
         Retrieve the LDAP schema from the provided url and determine if
         User-Private Groups (upg) are configured.
@@ -131,6 +167,10 @@ class SchemaCache(object):
 
         If a connection is provided then it the credentials bound to it are
         used. The connection is not closed when the request is done.
+
+        The schema is loaded from the disk cache if it is up to date and
+        use_disk_cache is True. A schema downloaded from the server is
+        always written to the disk cache.
         """
         assert conn is not None
 
@@ -138,15 +178,14 @@ class SchemaCache(object):
             'retrieving schema for SchemaCache url=%s conn=%s', url, conn)
 
         try:
-            try:
-                schema_entry = conn.search_s('cn=schema', ldap.SCOPE_BASE,
-                    attrlist=['attributetypes', 'objectclasses'])[0]
-            except ldap.NO_SUCH_OBJECT:
-                # try different location for schema
-                # openldap has schema located in cn=subschema
-                self.log.debug('cn=schema not found, fallback to cn=subschema')
-                schema_entry = conn.search_s('cn=subschema', ldap.SCOPE_BASE,
-                    attrlist=['attributetypes', 'objectclasses'])[0]
+            version = self._get_schema_version(conn)
+            if version is not None and use_disk_cache:
+                schema = self._read_cached_schema(url, version)
+                if schema is not None:
+                    return schema
+
+            schema_entry = self._search_schema_entry(
+                conn, ['attributetypes', 'objectclasses'])
         except ldap.SERVER_DOWN:
             raise errors.NetworkError(uri=url,
                                error=u'LDAP Server Down, unable to retrieve LDAP schema')
@@ -161,11 +200,111 @@ class SchemaCache(object):
             #       raise a more appropriate exception
             raise
 
-        return ldap.schema.SubSchema(schema_entry[1])
+        schema = ldap.schema.SubSchema(schema_entry[1])
+        if version is not None:
+            self._write_cached_schema(url, version, schema)
+        return schema
+
+    def _get_schema_version(self, conn):
+        """
+        Return the values identifying the current version of the schema or
+        None if the server does not provide any.
+        """
+        _dn, attrs = self._search_schema_entry(conn, self._version_attrs)
+        version = {}
+        for attr, values in attrs.items():
+            version[attr.lower()] = sorted(
+                v.decode('utf-8') if isinstance(v, bytes) else v
+                for v in values)
+        return version or None
+
+    def _get_cache_path(self, url):
+        key = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, key)
+
+    def _read_cached_schema(self, url, version):
+        path = self._get_cache_path(url)
+        try:
+            with open(path, 'rb') as f:
+                # the cache is trusted only if nobody else could write it
+                st = os.fstat(f.fileno())
+                if st.st_uid != os.geteuid() or st.st_mode & 0o022:
+                    self.log.debug(
+                        'ignoring schema cache %s not owned by us', path)
+                    return None
+                data = pickle.load(f)
+        except EnvironmentError as e:
+            if e.errno != errno.ENOENT:
+                self.log.debug('failed to read schema cache %s: %s', path, e)
+            return None
+        except Exception as e:
+            self.log.debug('failed to load schema cache %s: %s', path, e)
+            return None
+
+        if (not isinstance(data, dict) or
+                data.get('format') != self._cache_format or
+                data.get('url') != url or
+                data.get('version') != version):
+            self.log.debug('schema cache %s is out of date', path)
+            return None
+
+        self.log.debug('using cached schema %s for url=%s', path, url)
+        return data['schema']
+
+    def _write_cached_schema(self, url, version, schema):
+        path = self._get_cache_path(url)
+        data = dict(
+            format=self._cache_format,
+            url=url,
+            version=version,
+            schema=schema,
+        )
+        try:
+            try:
+                os.makedirs(self.cache_dir, 0o700)
+            except EnvironmentError as e:
+                if e.errno != errno.EEXIST:
+                    raise
+
+            with tempfile.NamedTemporaryFile('wb', prefix='.tmp',
+                                             dir=self.cache_dir,
+                                             delete=False) as f:
+                try:
+                    pickle.dump(data, f, pickle.HIGHEST_PROTOCOL)
+                    f.flush()
+                    os.fdatasync(f.fileno())
+                    f.close()
+                except Exception:
+                    os.unlink(f.name)
+                    raise
+                else:
+                    os.rename(f.name, path)
+        except Exception as e:
+            self.log.debug('failed to write schema cache %s: %s', path, e)
 
 schema_cache = SchemaCache()
 
 
+class SearchTimings(object):
+    """
+    Time spent by searches
+
+    :param entries: number of entries found
+    :param server: seconds spent waiting for and receiving the results
+    :param conversion: seconds spent converting the results to entries
+    """
+    __slots__ = ('entries', 'server', 'conversion')
+
+    def __init__(self):
+        self.entries = 0
+        self.server = 0.0
+        self.conversion = 0.0
+
+    def __repr__(self):
+        return '%s(entries=%d, server=%.3f, conversion=%.3f)' % (
+            type(self).__name__, self.entries, self.server, self.conversion)
+
+
 class LDAPEntry(collections.MutableMapping):
     __slots__ = ('_conn', '_dn', '_names', '_nice', '_raw', '_sync',
                  '_not_list', '_orig', '_raw_view', '_single_value_view')
@@ -217,6 +356,7 @@ class LDAPEntry(collections.MutableMapping):
         if isinstance(_obj, LDAPEntry):
             #pylint: disable=E1103
             self._not_list = set(_obj._not_list)
+            _obj._copy_orig()
             self._orig = dict(_obj._orig)
             if _obj.conn is _conn:
                 self._names = CIDict(_obj._names)
@@ -263,6 +403,31 @@ class LDAPEntry(collections.MutableMapping):
     def copy(self):
         return LDAPEntry(self)
 
+    def _load(self, attrs):
+        """
+        Set the raw values of an entry read from LDAP.
+
+        The values are decoded when they are first accessed. The snapshot
+        of the original values used to generate the modlist is taken only
+        when the entry is modified.
+        """
+        for name, value in attrs.items():
+            name = self._add_attr_name(self._attr_name(name))
+            self._raw[name] = value
+            self._nice[name] = None
+        self._orig = None
+
+    def _copy_orig(self):
+        """
+        Take the snapshot of the original values if it was not taken yet.
+
+        Must be called before raw values are changed or handed out.
+        """
+        if self._orig is None:
+            self._orig = dict((name, list(value))
+                              for name, value in self._raw.items()
+                              if value is not None)
+
     def _sync_attr(self, name):
         nice = self._nice[name]
         assert isinstance(nice, list)
@@ -270,6 +435,19 @@ class LDAPEntry(collections.MutableMapping):
         raw = self._raw[name]
         assert isinstance(raw, list)
 
+        if name not in self._sync and not nice:
+            # first access to raw values, decode them
+            for value in raw:
+                try:
+                    nice.append(self._conn.decode(value, name))
+                except ValueError as e:
+                    raise ValueError("{error} in LDAP entry '{dn}'".format(
+                        error=e, dn=self._dn))
+            self._sync[name] = (list(nice), list(raw))
+            if len(nice) > 1:
+                self._not_list.discard(name)
+            return
+
         nice_sync, raw_sync = self._sync.setdefault(name, ([], []))
         if nice == nice_sync and raw == raw_sync:
             return
@@ -279,6 +457,9 @@ class LDAPEntry(collections.MutableMapping):
         raw_adds = set(raw) - set(raw_sync)
         raw_dels = set(raw_sync) - set(raw)
 
+        if nice_adds or nice_dels:
+            self._copy_orig()
+
         for value in nice_dels:
             value = self._conn.encode(value)
             if value in raw_adds:
@@ -311,7 +492,8 @@ class LDAPEntry(collections.MutableMapping):
                 continue
             nice.append(value)
 
-        self._sync[name] = (deepcopy(nice), deepcopy(raw))
+        # values are immutable, copies of the lists are enough
+        self._sync[name] = (list(nice), list(raw))
 
         if len(nice) > 1:
             self._not_list.discard(name)
@@ -331,22 +513,12 @@ class LDAPEntry(collections.MutableMapping):
         if name in self._names:
             return self._names[name]
 
-        if self._conn.schema is not None:
-            if six.PY2:
-                encoded_name = name.encode('utf-8')
-            else:
-                encoded_name = name
-            attrtype = self._conn.schema.get_obj(
-                ldap.schema.AttributeType, encoded_name)
-            if attrtype is not None:
-                for altname in attrtype.names:
-                    if six.PY2:
-                        altname = altname.decode('utf-8')
-                    self._names[altname] = name
+        for altname in self._conn.get_attribute_names(name):
+            self._names[altname] = name
 
         self._names[name] = name
 
-        for oldname in list(self._orig):
+        for oldname in list(self._orig or ()):
             if self._names.get(oldname) == name:
                 self._orig[name] = self._orig.pop(oldname)
                 break
@@ -354,6 +526,7 @@ class LDAPEntry(collections.MutableMapping):
         return name
 
     def _set_nice(self, name, value):
+        self._copy_orig()
         name = self._attr_name(name)
         name = self._add_attr_name(name)
 
@@ -387,6 +560,7 @@ class LDAPEntry(collections.MutableMapping):
                         name, i, item.__class__.__name__, item)
                 )
 
+        self._copy_orig()
         name = self._add_attr_name(name)
 
         if self._raw.get(name) is not value:
@@ -428,6 +602,9 @@ class LDAPEntry(collections.MutableMapping):
     def _get_raw(self, name):
         name = self._get_attr_name(name)
 
+        # the returned list may be modified by the caller
+        self._copy_orig()
+
         value = self._raw[name]
         if value is None:
             value = self._raw[name] = []
@@ -443,6 +620,7 @@ class LDAPEntry(collections.MutableMapping):
 
     def __delitem__(self, name):
         name = self._get_attr_name(name)
+        self._copy_orig()
 
         for (altname, keyname) in list(self._names.items()):
             if keyname == name:
@@ -454,6 +632,7 @@ class LDAPEntry(collections.MutableMapping):
         self._not_list.discard(name)
 
     def clear(self):
+        self._copy_orig()
         self._names.clear()
         self._nice.clear()
         self._raw.clear()
@@ -483,9 +662,12 @@ class LDAPEntry(collections.MutableMapping):
         if other is None:
             other = self
         assert isinstance(other, LDAPEntry)
-        self._orig = deepcopy(dict(other.raw))
+        # values are immutable, copies of the lists are enough
+        self._orig = dict((name, list(value))
+                          for name, value in other.raw.items())
 
     def generate_modlist(self):
+        self._copy_orig()
         modlist = []
 
         names = set(self)
@@ -580,6 +762,71 @@ class SingleValueLDAPEntryView(LDAPEntryView):
             self._entry[name] = [value]
 
 
+def _encode_bool(client, val):
+    if val:
+        return 'TRUE'
+    else:
+        return 'FALSE'
+
+
+def _encode_text(client, val):
+    return six.text_type(val).encode('utf-8')
+
+
+def _encode_dnsname(client, val):
+    return val.to_text().encode('ascii')
+
+
+def _encode_bytes(client, val):
+    return val
+
+
+def _encode_list(client, val):
+    return [client.encode(m) for m in val]
+
+
+def _encode_tuple(client, val):
+    return tuple(client.encode(m) for m in val)
+
+
+def _encode_dict(client, val):
+    # key in dict must be str not bytes
+    return dict((k, client.encode(v)) for k, v in val.items())
+
+
+def _encode_datetime(client, val):
+    return val.strftime(LDAP_GENERALIZED_TIME_FORMAT)
+
+
+def _encode_none(client, val):
+    return None
+
+
+def _decode_bytes(val):
+    return val
+
+
+def _decode_text(val):
+    return val.decode('utf-8')
+
+
+def _decode_datetime(val):
+    return datetime.datetime.strptime(
+        val.decode('utf-8'), LDAP_GENERALIZED_TIME_FORMAT)
+
+
+def _decode_dnsname(val):
+    return DNSName.from_text(val.decode('utf-8'))
+
+
+def _decode_dn(val):
+    return DN(val.decode('utf-8'))
+
+
+def _decode_principal(val):
+    return Principal(val.decode('utf-8'))
+
+
 class LDAPClient(object):
     """LDAP backend class
 
@@ -681,9 +928,40 @@ class LDAPClient(object):
         'nsslapd-minssf-exclude-rootdse': True,
     })
 
+    # Functions encoding values of a type to LDAP representation. Values
+    # of subclasses of these types are encoded by the function of their
+    # nearest base class.
+    _ENCODERS = dict.fromkeys(
+        (unicode, Decimal, DN, Principal) + six.integer_types,
+        _encode_text)
+    _ENCODERS.update({
+        bool: _encode_bool,
+        DNSName: _encode_dnsname,
+        bytes: _encode_bytes,
+        list: _encode_list,
+        tuple: _encode_tuple,
+        dict: _encode_dict,
+        datetime.datetime: _encode_datetime,
+        type(None): _encode_none,
+    })
+
+    # Functions decoding LDAP representation of values to an attribute
+    # type. Values of other attribute types are decoded by calling the type.
+    _DECODERS = {
+        bytes: _decode_bytes,
+        unicode: _decode_text,
+        datetime.datetime: _decode_datetime,
+        DNSName: _decode_dnsname,
+        DN: _decode_dn,
+        Principal: _decode_principal,
+    }
+
     time_limit = -1.0   # unlimited
     size_limit = 0      # unlimited
 
+    # number of search result messages converted to entries at once
+    result_batch_size = 1000
+
     def __init__(self, ldap_uri, start_tls=False, force_schema_updates=False,
                  no_schema=False, decode_attrs=True, cacert=None,
                  sasl_nocanon=False):
@@ -710,6 +988,7 @@ class LDAPClient(object):
         self._decode_attrs = decode_attrs
         self._cacert = cacert
         self._sasl_nocanon = sasl_nocanon
+        self._supported_controls = None
 
         self.host = 'localhost'
         self.port = None
@@ -722,6 +1001,8 @@ class LDAPClient(object):
         self.log = log_mgr.get_logger(self)
         self._has_schema = False
         self._schema = None
+        self._attribute_names = {}
+        self._attribute_decoders = {}
 
         self._conn = self._connect()
 
@@ -754,6 +1035,8 @@ class LDAPClient(object):
             # bypass ldap2's locking
             object.__setattr__(self, '_schema', schema)
             object.__setattr__(self, '_has_schema', True)
+            object.__setattr__(self, '_attribute_names', {})
+            object.__setattr__(self, '_attribute_decoders', {})
 
         return self._schema
 
@@ -785,6 +1068,36 @@ class LDAPClient(object):
         # bypass ldap2's locking
         object.__setattr__(self, '_has_schema', False)
         object.__setattr__(self, '_schema', None)
+        object.__setattr__(self, '_attribute_names', {})
+        object.__setattr__(self, '_attribute_decoders', {})
+
+    def get_attribute_names(self, name):
+        """
+        Return the names of attribute name defined in the schema.
+
+        The names are looked up in the schema once for every name and
+        cached until the schema is reacquired.
+        """
+        schema = self._get_schema()
+        try:
+            return self._attribute_names[name]
+        except KeyError:
+            pass
+
+        names = ()
+        if schema is not None:
+            if six.PY2:
+                encoded_name = name.encode('utf-8')
+            else:
+                encoded_name = name
+            attrtype = schema.get_obj(ldap.schema.AttributeType, encoded_name)
+            if attrtype is not None:
+                names = tuple(attrtype.names)
+                if six.PY2:
+                    names = tuple(n.decode('utf-8') for n in names)
+
+        self._attribute_names[name] = names
+        return names
 
     def get_attribute_type(self, name_or_oid):
         if not self._decode_attrs:
@@ -842,56 +1155,48 @@ class LDAPClient(object):
         """
         Encode attribute value to LDAP representation (str).
         """
-        # Booleans are both an instance of bool and int, therefore
-        # test for bool before int otherwise the int clause will be
-        # entered for a boolean value instead of the boolean clause.
-        if isinstance(val, bool):
-            if val:
-                return 'TRUE'
-            else:
-                return 'FALSE'
-        elif isinstance(val, (unicode, six.integer_types, Decimal, DN,
-                              Principal)):
-            return six.text_type(val).encode('utf-8')
-        elif isinstance(val, DNSName):
-            return val.to_text().encode('ascii')
-        elif isinstance(val, bytes):
-            return val
-        elif isinstance(val, list):
-            return [self.encode(m) for m in val]
-        elif isinstance(val, tuple):
-            return tuple(self.encode(m) for m in val)
-        elif isinstance(val, dict):
-            # key in dict must be str not bytes
-            dct = dict((k, self.encode(v)) for k, v in val.items())
-            return dct
-        elif isinstance(val, datetime.datetime):
-            return val.strftime(LDAP_GENERALIZED_TIME_FORMAT)
-        elif val is None:
-            return None
-        else:
-            raise TypeError("attempt to pass unsupported type to ldap, value=%s type=%s" %(val, type(val)))
+        try:
+            encoder = self._ENCODERS[type(val)]
+        except KeyError:
+            encoder = self._get_encoder(type(val), val)
+        return encoder(self, val)
+
+    def _get_encoder(self, cls, val):
+        # subclass of a supported type, use the encoder of the nearest base
+        # class and remember it
+        for base in cls.__mro__:
+            encoder = self._ENCODERS.get(base)
+            if encoder is not None:
+                self._ENCODERS[cls] = encoder
+                return encoder
+        raise TypeError("attempt to pass unsupported type to ldap, value=%s type=%s" %(val, type(val)))
+
+    def _get_decoder(self, attr):
+        """
+        Return the type of attribute attr and the function decoding its
+        raw values to that type.
+
+        The decoders are looked up once for every attribute and cached until
+        the schema is reacquired.
+        """
+        try:
+            return self._attribute_decoders[attr]
+        except KeyError:
+            pass
+
+        target_type = self.get_attribute_type(attr)
+        decoder = (target_type, self._DECODERS.get(target_type, target_type))
+        self._attribute_decoders[attr] = decoder
+        return decoder
 
     def decode(self, val, attr):
         """
         Decode attribute value from LDAP representation (str).
         """
         if isinstance(val, bytes):
-            target_type = self.get_attribute_type(attr)
+            target_type, decoder = self._get_decoder(attr)
             try:
-                if target_type is bytes:
-                    return val
-                elif target_type is unicode:
-                    return val.decode('utf-8')
-                elif target_type is datetime.datetime:
-                    return datetime.datetime.strptime(
-                        val.decode('utf-8'), LDAP_GENERALIZED_TIME_FORMAT)
-                elif target_type is DNSName:
-                    return DNSName.from_text(val.decode('utf-8'))
-                elif target_type in (DN, Principal):
-                    return target_type(val.decode('utf-8'))
-                else:
-                    return target_type(val)
+                return decoder(val)
             except Exception:
                 msg = 'unable to convert the attribute %r value %r to type %s' % (attr, val, target_type)
                 self.log.error(msg)
@@ -936,10 +1241,7 @@ class LDAPClient(object):
                 continue
 
             ipa_entry = LDAPEntry(self, DN(original_dn))
-
-            for attr, original_values in original_attrs.items():
-                ipa_entry.raw[attr] = original_values
-            ipa_entry.reset_modlist()
+            ipa_entry._load(original_attrs)
 
             ipa_result.append(ipa_entry)
 
@@ -1329,13 +1631,16 @@ class LDAPClient(object):
 
     def find_entries(self, filter=None, attrs_list=None, base_dn=None,
                      scope=ldap.SCOPE_SUBTREE, time_limit=None,
-                     size_limit=None, paged_search=False):
+                     size_limit=None, paged_search=False, timings=None):
         """
         Return a list of entries and indication of whether the results were
         truncated ([(dn, entry_attrs)], truncated) matching specified search
         parameters followed by truncated flag. If the truncated flag is True,
         search hit a server limit and its results are incomplete.
 
+        Results are received one message at a time and converted to entries
+        in batches of up to result_batch_size messages.
+
         Keyword arguments:
         attrs_list -- list of attributes to return, all if None (default None)
         base_dn -- dn of the entry at which to start the search (default '')
@@ -1344,6 +1649,7 @@ class LDAPClient(object):
         size_limit -- size (number of entries returned) limit
             (default unlimited)
         paged_search -- search using paged results control
+        timings -- SearchTimings object to add the time spent by the search to
 
         :raises: errors.NotFound if result set is empty
                                  or base_dn doesn't exist
@@ -1355,6 +1661,15 @@ class LDAPClient(object):
             filter = '(objectClass=*)'
         res = []
         truncated = False
+        if timings is None:
+            timings = SearchTimings()
+        batch = []
+
+        def convert_batch():
+            start = time.time()
+            res.extend(self._convert_result(batch))
+            timings.conversion += time.time() - start
+            del batch[:]
 
         if time_limit is None:
             time_limit = self.time_limit
@@ -1388,6 +1703,7 @@ class LDAPClient(object):
                 if paged_search:
                     sctrls = [SimplePagedResultsControl(0, page_size, cookie)]
 
+                start = time.time()
                 try:
                     id = self.conn.search_ext(
                         str(base_dn), scope, filter, attrs_list,
@@ -1399,9 +1715,11 @@ class LDAPClient(object):
                         objtype, res_list, _res_id, res_ctrls = result
                         if objtype == ldap.RES_SEARCH_RESULT:
                             break
-                        res_list = self._convert_result(res_list)
-                        if res_list:
-                            res.append(res_list[0])
+                        batch.extend(res_list)
+                        if len(batch) >= self.result_batch_size:
+                            timings.server += time.time() - start
+                            convert_batch()
+                            start = time.time()
 
                     if paged_search:
                         # Get cookie for the next page
@@ -1440,15 +1758,149 @@ class LDAPClient(object):
                             ldap.SIZELIMIT_EXCEEDED):
                         truncated = True
                         break
+                finally:
+                    # entries received before a limit was hit are returned
+                    timings.server += time.time() - start
+                    convert_batch()
 
                 if not paged_search or not cookie:
                     break
 
+        timings.entries += len(res)
+        if _debug_log_ldap:
+            self.log.debug('ldap.find_entries: %r', timings)
+
         if not res and not truncated:
             raise errors.EmptyResult(reason='no matching entry found')
 
         return (res, truncated)
 
+    def iter_entries(self, filter=None, attrs_list=None, base_dn=None,
+                     scope=ldap.SCOPE_SUBTREE, time_limit=None,
+                     page_size=2000):
+        """
+        Iterate over entries matching specified search parameters.
+
+        Unlike find_entries(), the entries are retrieved one page at a time
+        using the paged results control and are never all held in memory.
+
+        Keyword arguments:
+        attrs_list -- list of attributes to return, all if None (default None)
+        base_dn -- dn of the entry at which to start the search (default '')
+        scope -- search scope, see LDAP docs (default ldap2.SCOPE_SUBTREE)
+        time_limit -- time limit in seconds (default unlimited)
+        page_size -- number of entries retrieved in a single page
+
+        :raises: errors.NotFound if base_dn doesn't exist
+        :raises: errors.LimitsExceeded if the search hit a server limit,
+                 entries retrieved until then have already been returned
+        """
+        if base_dn is None:
+            base_dn = DN()
+        assert isinstance(base_dn, DN)
+        if not filter:
+            filter = '(objectClass=*)'
+
+        if time_limit is None:
+            time_limit = self.time_limit
+        if time_limit == 0:
+            time_limit = -1.0
+        if not isinstance(time_limit, float):
+            time_limit = float(time_limit)
+
+        if attrs_list:
+            attrs_list = [a.lower() for a in set(attrs_list)]
+
+        cookie = ''
+        with self.error_handler():
+            if six.PY2:
+                filter = self.encode(filter)
+                attrs_list = self.encode(attrs_list)
+
+            while True:
+                sctrls = [SimplePagedResultsControl(0, page_size, cookie)]
+                id = self.conn.search_ext(
+                    str(base_dn), scope, filter, attrs_list,
+                    serverctrls=sctrls, timeout=time_limit
+                )
+                while True:
+                    result = self.conn.result3(id, 0)
+                    objtype, res_list, _res_id, res_ctrls = result
+                    if objtype == ldap.RES_SEARCH_RESULT:
+                        break
+                    for entry in self._convert_result(res_list):
+                        yield entry
+
+                for ctrl in res_ctrls:
+                    if isinstance(ctrl, SimplePagedResultsControl):
+                        cookie = ctrl.cookie
+                        break
+                else:
+                    cookie = ''
+
+                if not cookie:
+                    break
+
+    def persistent_search(self, filter=None, attrs_list=None, base_dn=None,
+                          scope=ldap.SCOPE_SUBTREE, timeout=None):
+        """
+        Iterate over entries matching specified search parameters, then over
+        entries which are added or modified to match them later on.
+
+        The search is kept open by the server using the persistent search
+        control, the caller stops iterating to abandon it.
+
+        Keyword arguments:
+        attrs_list -- list of attributes to return, all if None (default None)
+        base_dn -- dn of the entry at which to start the search (default '')
+        scope -- search scope, see LDAP docs (default ldap2.SCOPE_SUBTREE)
+        timeout -- seconds after which the search is given up, unlimited if
+                   None (default None)
+
+        :raises: errors.NotFound if base_dn doesn't exist
+        :raises: errors.DatabaseTimeout if timeout expired
+        """
+        if base_dn is None:
+            base_dn = DN()
+        assert isinstance(base_dn, DN)
+        if not filter:
+            filter = '(objectClass=*)'
+
+        if attrs_list:
+            attrs_list = [a.lower() for a in set(attrs_list)]
+
+        deadline = None
+        if timeout is not None:
+            deadline = time.time() + timeout
+
+        with self.error_handler():
+            if six.PY2:
+                filter = self.encode(filter)
+                attrs_list = self.encode(attrs_list)
+
+            sctrls = [PersistentSearchControl(
+                changeTypes=['add', 'modify', 'modDN'], returnECs=False)]
+            id = self.conn.search_ext(
+                str(base_dn), scope, filter, attrs_list, serverctrls=sctrls)
+            try:
+                while True:
+                    remaining = None
+                    if deadline is not None:
+                        remaining = deadline - time.time()
+                        if remaining <= 0:
+                            raise errors.DatabaseTimeout()
+                    result = self.conn.result3(id, 0, remaining)
+                    objtype, res_list, _res_id, _res_ctrls = result
+                    if objtype == ldap.RES_SEARCH_RESULT:
+                        break
+                    for entry in self._convert_result(res_list):
+                        yield entry
+            finally:
+                try:
+                    self.conn.abandon(id)
+                except ldap.LDAPError:
+                    pass
+
     def find_entry_by_attr(self, attr, value, object_class, attrs_list=None,
                            base_dn=None):
         """
@@ -1505,6 +1957,44 @@ class LDAPClient(object):
 
         entry.reset_modlist()
 
+    def add_entries(self, entries, window=100):
+        """
+        Create new entries with pipelined asynchronous requests.
+
+        Up to window add requests are outstanding at a time, the failure
+        of one of them does not stop the other entries from being added.
+
+        Returns a list with an error for every entry in entries, None for
+        the entries which were added.
+        """
+        results = [None] * len(entries)
+
+        def wait(index, msgid):
+            try:
+                with self.error_handler():
+                    self.conn.result3(msgid)
+            except errors.NetworkError:
+                raise
+            except errors.PublicError as e:
+                results[index] = e
+            else:
+                entries[index].reset_modlist()
+
+        pending = collections.deque()
+        for index, entry in enumerate(entries):
+            # remove all [] values (python-ldap hates 'em)
+            attrs = dict((k, v) for k, v in entry.raw.items() if v)
+            with self.error_handler():
+                attrs = self.encode(attrs)
+                msgid = self.conn.add_ext(str(entry.dn), list(attrs.items()))
+            pending.append((index, msgid))
+            if len(pending) >= window:
+                wait(*pending.popleft())
+        while pending:
+            wait(*pending.popleft())
+
+        return results
+
     def move_entry(self, dn, new_dn, del_old=True):
         """
         Move an entry (either to a new superior or/and changing relative distinguished name)
@@ -1564,6 +2054,144 @@ class LDAPClient(object):
         with self.error_handler():
             self.conn.delete_s(str(dn))
 
+    def delete_entries(self, dns, window=100):
+        """
+        Delete entries with pipelined asynchronous requests.
+
+        Up to window delete requests are outstanding at a time, the failure
+        of one of them does not stop the other entries from being deleted.
+
+        Returns a list with an error for every DN in dns, None for the
+        entries which were deleted.
+        """
+        results = [None] * len(dns)
+
+        def wait(index, msgid):
+            try:
+                with self.error_handler():
+                    self.conn.result3(msgid)
+            except errors.NetworkError:
+                raise
+            except errors.PublicError as e:
+                results[index] = e
+
+        pending = collections.deque()
+        for index, dn in enumerate(dns):
+            with self.error_handler():
+                msgid = self.conn.delete_ext(str(dn))
+            pending.append((index, msgid))
+            if len(pending) >= window:
+                wait(*pending.popleft())
+        while pending:
+            wait(*pending.popleft())
+
+        return results
+
+    def get_supported_controls(self):
+        """
+        Return OIDs of controls supported by the server.
+
+        The list is read from the root DSE once and cached.
+        """
+        if self._supported_controls is None:
+            try:
+                entry = self.get_entry(DN(), ['supportedcontrol'])
+            except errors.NotFound:
+                controls = frozenset()
+            else:
+                controls = frozenset(entry.get('supportedcontrol', []))
+            # ldap2 objects are read-only after they are finalized
+            object.__setattr__(self, '_supported_controls', controls)
+        return self._supported_controls
+
+    def delete_subtree(self, dn, window=100):
+        """
+        Delete entry dn together with all entries below it.
+
+        The server deletes the whole subtree in a single operation when it
+        supports the tree delete control. Otherwise the subtree is read
+        with a single paged search and its entries are deleted deepest
+        first, with up to window delete requests outstanding at a time.
+        """
+        assert isinstance(dn, DN)
+
+        if TREE_DELETE_OID in self.get_supported_controls():
+            with self.error_handler():
+                self.conn.delete_ext_s(
+                    str(dn),
+                    serverctrls=[LDAPControl(TREE_DELETE_OID, True)])
+            return
+
+        while True:
+            dns = []
+            limits_error = None
+            try:
+                for entry in self.iter_entries(None, [''], dn,
+                                               ldap.SCOPE_SUBTREE):
+                    dns.append(entry.dn)
+            except errors.LimitsExceeded as e:
+                # delete what was found so far, the rest is found by the
+                # next search
+                limits_error = e
+
+            levels = {}
+            for entry_dn in dns:
+                levels.setdefault(len(entry_dn), []).append(entry_dn)
+            deleted = 0
+            nonleaf = None
+            for depth in sorted(levels, reverse=True):
+                count, error = self._delete_entries(
+                    levels[depth], window,
+                    ignore_nonleaf=limits_error is not None)
+                deleted += count
+                nonleaf = error or nonleaf
+
+            if limits_error is None:
+                return
+            if not deleted:
+                # the next search would find the same entries again
+                if nonleaf is not None:
+                    with self.error_handler():
+                        six.reraise(*nonleaf)
+                raise limits_error
+
+    def _delete_entries(self, dns, window, ignore_nonleaf=False):
+        """
+        Delete sibling entries with pipelined asynchronous requests.
+
+        Return the number of entries which are gone and the last ignored
+        non-leaf error, if any.
+        """
+        failures = []
+        nonleaf = []
+
+        def wait(msgid):
+            try:
+                self.conn.result3(msgid)
+            except ldap.NO_SUCH_OBJECT:
+                # already deleted
+                pass
+            except ldap.NOT_ALLOWED_ON_NONLEAF:
+                if not ignore_nonleaf:
+                    failures.append(sys.exc_info())
+                nonleaf.append(sys.exc_info())
+            except ldap.LDAPError:
+                failures.append(sys.exc_info())
+
+        with self.error_handler():
+            pending = collections.deque()
+            for dn in dns:
+                pending.append(self.conn.delete_ext(str(dn)))
+                if len(pending) >= window:
+                    wait(pending.popleft())
+            while pending:
+                wait(pending.popleft())
+
+            if failures:
+                six.reraise(*failures[0])
+
+        return len(dns) - len(nonleaf), nonleaf[-1] if nonleaf else None
+
     def entry_exists(self, dn):
         """
         Test whether the given object exists in LDAP.
@@ -20,6 +20,7 @@
 from __future__ import print_function
 
 import codecs
+import errno
 import string
 import tempfile
 import subprocess
@@ -38,6 +39,7 @@ import netifaces
 import time
 import pwd
 import grp
+import threading
 from contextlib import contextmanager
 import locale
 import collections
@@ -1188,50 +1190,109 @@ def backup_config_and_replace_variables(
     return old_values
 
 
+def _endpoint_open(endpoint):
+    """
+    Return True if endpoint accepts connections. endpoint is either
+    a (host, port) tuple or a path of an UNIX socket.
+    """
+    if isinstance(endpoint, tuple):
+        host, port = endpoint
+        return host_port_open(host, port)
+
+    s = socket.socket(socket.AF_UNIX)
+    try:
+        s.connect(endpoint)
+    except socket.error as e:
+        if e.errno in (errno.ENOENT, errno.ECONNREFUSED):
+            return False
+        raise
+    finally:
+        s.close()
+    return True
+
+
+def wait_for_endpoints(endpoints, timeout=0, max_interval=0.5):
+    """
+    Wait until all of the specified endpoints accept connections.
+
+    An endpoint is either a (host, port) tuple or a path of an UNIX socket.
+    All endpoints are probed at the same time; each one is first probed
+    after 50 milliseconds, the interval then doubles up to max_interval
+    seconds. Timeout in seconds may be specified to limit the wait. If the
+    timeout is exceeded, socket.timeout exception is raised.
+
+    Returns dict mapping endpoints to the number of seconds it took until
+    they were open.
+    """
+    timeout = float(timeout)
+    start = time.time()
+    op_timeout = start + timeout
+    report = {}
+    failures = []
+
+    def probe(endpoint):
+        interval = 0.05
+        try:
+            while not _endpoint_open(endpoint):
+                if timeout and time.time() > op_timeout:  # timeout exceeded
+                    failures.append(
+                        socket.timeout("Timeout exceeded: %s" % (endpoint,)))
+                    return
+                time.sleep(interval)
+                interval = min(interval * 2, max_interval)
+        except Exception as e:
+            failures.append(e)
+        else:
+            report[endpoint] = time.time() - start
+
+    endpoints = list(endpoints)
+    if len(endpoints) == 1:
+        probe(endpoints[0])
+    else:
+        threads = []
+        for endpoint in endpoints:
+            t = threading.Thread(target=probe, args=(endpoint,))
+            t.daemon = True
+            t.start()
+            threads.append(t)
+        for t in threads:
+            t.join()
+
+    for endpoint in endpoints:
+        if endpoint in report:
+            root_logger.debug('%s is open after %.3f seconds',
+                              endpoint, report[endpoint])
+    if failures:
+        raise failures[0]
+
+    return report
+
+
 def wait_for_open_ports(host, ports, timeout=0):
     """
     Wait until the specified port(s) on the remote host are open. Timeout
     in seconds may be specified to limit the wait. If the timeout is
     exceeded, socket.timeout exception is raised.
+
+    Returns dict mapping ports to the number of seconds it took until they
+    were open.
     """
-    timeout = float(timeout)
     if not isinstance(ports, (tuple, list)):
         ports = [ports]
 
     root_logger.debug('wait_for_open_ports: %s %s timeout %d', host, ports, timeout)
-    op_timeout = time.time() + timeout
-
-    for port in ports:
-        while True:
-            port_open = host_port_open(host, port)
-
-            if port_open:
-                break
-            if timeout and time.time() > op_timeout: # timeout exceeded
-                raise socket.timeout("Timeout exceeded")
-            time.sleep(1)
+    report = wait_for_endpoints([(host, port) for port in ports], timeout)
+    return dict((port, report[(host, port)]) for port in ports)
 
 def wait_for_open_socket(socket_name, timeout=0):
     """
     Wait until the specified socket on the local host is open. Timeout
-    in seconds may be specified to limit the wait.
-    """
-    timeout = float(timeout)
-    op_timeout = time.time() + timeout
+    in seconds may be specified to limit the wait. If the timeout is
+    exceeded, socket.timeout exception is raised.
 
-    while True:
-        try:
-            s = socket.socket(socket.AF_UNIX)
-            s.connect(socket_name)
-            s.close()
-            break
-        except socket.error as e:
-            if e.errno in (2,111):  # 111: Connection refused, 2: File not found
-                if timeout and time.time() > op_timeout: # timeout exceeded
-                    raise e
-                time.sleep(1)
-            else:
-                raise e
+    Returns the number of seconds it took until the socket was open.
+    """
+    return wait_for_endpoints([socket_name], timeout)[socket_name]
 
 
 def dn_attribute_property(private_name):
@@ -17,8 +17,11 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 #
 
+import hashlib
+import ldif
 import os
 import shutil
+import subprocess
 import tempfile
 import time
 import pwd
@@ -33,9 +36,10 @@ from ipalib import api, errors
 from ipapython import version
 from ipapython.ipautil import run, write_tmp_file
 from ipapython import admintool
-from ipapython.dn import DN
+from ipapython.dn import DN, RDN
 from ipaserver.install.replication import wait_for_task
 from ipaserver.install import installutils
+from ipaserver.install.scheduler import StepScheduler
 from ipapython import ipaldap
 from ipaplatform.constants import constants
 from ipaplatform.tasks import tasks
@@ -43,6 +47,17 @@ from ipaplatform.tasks import tasks
 
 ISO8601_DATETIME_FMT = '%Y-%m-%dT%H:%M:%S'
 
+# Name of the file with per-file checksums stored in the backup archive,
+# the format is compatible with sha256sum(1)
+MANIFEST = 'MANIFEST.sha256'
+
+# Incremental backups store entries changed since the base backup in an
+# LDIF file and DNs of deleted entries in a text file, one DN per line
+INCREMENTAL_LDIF = '%s-%s-incremental.ldif'
+INCREMENTAL_DELETED = '%s-%s-deleted.txt'
+
+RUV_UNIQUEID = 'ffffffff-ffffffff-ffffffff-ffffffff'
+
 """
 A test gpg can be generated like this:
 
@@ -65,10 +80,7 @@ EOF
 """
 
 
-def encrypt_file(filename, keyring, remove_original=True):
-    source = filename
-    dest = filename + '.gpg'
-
+def gpg_encrypt_args(dest, keyring):
     args = [paths.GPG,
             '--batch',
             '--default-recipient-self',
@@ -82,6 +94,14 @@ def encrypt_file(filename, keyring, remove_original=True):
         args.append(keyring + '.sec')
 
     args.append('-e')
+    return args
+
+
+def encrypt_file(filename, keyring, remove_original=True):
+    source = filename
+    dest = filename + '.gpg'
+
+    args = gpg_encrypt_args(dest, keyring)
     args.append(source)
 
     result = run(args, raiseonerr=False)
@@ -94,6 +114,140 @@ def encrypt_file(filename, keyring, remove_original=True):
     return dest
 
 
+def backend_suffix(backend):
+    if backend == 'ipaca':
+        return DN(('o', 'ipaca'))
+    return api.env.basedn
+
+
+def tombstone_dn(dn):
+    """
+    Return DN of the entry which was deleted and replaced by tombstone `dn`
+    """
+    rdn = dn[0]
+    if len(rdn) > 1:
+        # newer 389-ds tombstones have nsuniqueid in a multi-valued RDN
+        avas = [ava for ava in rdn if ava.attr.lower() != 'nsuniqueid']
+        return DN(RDN(*avas), dn[1:])
+    return dn[1:]
+
+
+def read_header(backup_dir):
+    config = SafeConfigParser()
+    with open(os.path.join(backup_dir, 'header')) as fd:
+        config.readfp(fd)
+    return config
+
+
+def archive_members(names, structure_dirs=(), exclude=()):
+    """
+    Return paths to store in an archive created with ``tar --no-recursion``
+
+    Existing ``names`` are expanded to all files and directories below
+    them, except for the ``exclude`` subtrees. Existing ``structure_dirs``
+    are stored as directory entries only, without their content.
+    """
+    members = []
+    seen = set()
+
+    def add(path):
+        if path not in seen:
+            seen.add(path)
+            members.append(path)
+
+    for name in names:
+        if name in exclude or not os.path.exists(name):
+            continue
+        if os.path.islink(name) or not os.path.isdir(name):
+            add(name)
+            continue
+        for root, dirs, files in os.walk(name):
+            add(root)
+            dirs[:] = sorted(d for d in dirs
+                             if os.path.join(root, d) not in exclude)
+            for d in dirs:
+                # symbolic links to directories are not walked into
+                if os.path.islink(os.path.join(root, d)):
+                    add(os.path.join(root, d))
+            for f in sorted(files):
+                add(os.path.join(root, f))
+
+    for name in structure_dirs:
+        if os.path.isdir(name):
+            add(name)
+
+    return members
+
+
+def gzip_program():
+    """
+    Return the gzip compressor, the multi-threaded pigz when it is
+    available. pigz output is a regular gzip stream so the archive can be
+    extracted with ``tar -xzf``.
+    """
+    if os.path.exists(paths.PIGZ):
+        return paths.PIGZ
+    return 'gzip'
+
+
+def tar_compress_args():
+    """
+    Return tar options for gzip compression of the archive.
+    """
+    return ['--use-compress-program', gzip_program()]
+
+
+def file_checksum(filename, bufsize=1024 * 1024):
+    h = hashlib.sha256()
+    with open(filename, 'rb') as f:
+        while True:
+            data = f.read(bufsize)
+            if not data:
+                break
+            h.update(data)
+    return h.hexdigest()
+
+
+def write_manifest(directory):
+    """
+    Write checksums of all files in `directory` to the MANIFEST file in it.
+    """
+    lines = []
+    for root, _dirs, files in os.walk(directory):
+        for name in files:
+            path = os.path.join(root, name)
+            relpath = os.path.relpath(path, directory)
+            if relpath == MANIFEST:
+                continue
+            lines.append('%s  %s\n' % (file_checksum(path), relpath))
+
+    with open(os.path.join(directory, MANIFEST), 'w') as f:
+        f.writelines(sorted(lines, key=lambda l: l.split('  ', 1)[1]))
+
+
+def verify_manifest(directory):
+    """
+    Verify checksums of files listed in the MANIFEST file in `directory`.
+
+    Return list of files which are missing or have a different checksum.
+    Backups created before the MANIFEST was introduced are not verified.
+    """
+    manifest = os.path.join(directory, MANIFEST)
+    if not os.path.exists(manifest):
+        return []
+
+    failed = []
+    with open(manifest) as f:
+        for line in f:
+            checksum, relpath = line.rstrip('\n').split('  ', 1)
+            path = os.path.join(directory, relpath)
+            if (not os.path.isfile(path) or
+                    file_checksum(path) != checksum):
+                failed.append(relpath)
+
+    return failed
+
+
 class Backup(admintool.AdminTool):
     command_name = 'ipa-backup'
     log_file_name = paths.IPABACKUP_LOG
@@ -230,6 +384,10 @@ class Backup(admintool.AdminTool):
             default=False, help="Include log files in backup")
         parser.add_option("--online", dest="online", action="store_true",
             default=False, help="Perform the LDAP backups online, for data only.")
+        parser.add_option("--incremental", dest="incremental",
+            action="store_true", default=False,
+            help="Back up only data changed since the last backup, "
+                 "implies --online")
 
 
     def setup_logging(self, log_file_mode='a'):
@@ -251,6 +409,12 @@ class Backup(admintool.AdminTool):
             self.option_parser.error("You cannot specify --online "
                 "without --data")
 
+        if options.incremental:
+            if not options.data_only:
+                self.option_parser.error("You cannot specify --incremental "
+                    "without --data")
+            options.online = True
+
         if options.gpg:
             tmpfd = write_tmp_file('encryptme')
             newfile = encrypt_file(tmpfd.name, options.gpg_keyring, False)
@@ -293,7 +457,11 @@ class Backup(admintool.AdminTool):
 
             self.get_connection()
 
-            self.create_header(options.data_only)
+            base_backup = None
+            if options.incremental:
+                base_backup = self.find_base_backup()
+
+            self.create_header(options.data_only, base_backup)
             if options.data_only:
                 if not options.online:
                     self.log.info('Stopping Directory Server')
@@ -305,11 +473,17 @@ class Backup(admintool.AdminTool):
             instance = installutils.realm_to_serverid(api.env.realm)
             if os.path.exists(paths.VAR_LIB_SLAPD_INSTANCE_DIR_TEMPLATE %
                               instance):
+                backends = ['userRoot']
                 if os.path.exists(paths.SLAPD_INSTANCE_DB_DIR_TEMPLATE %
                                   (instance, 'ipaca')):
-                    self.db2ldif(instance, 'ipaca', online=options.online)
-                self.db2ldif(instance, 'userRoot', online=options.online)
-                self.db2bak(instance, online=options.online)
+                    backends.insert(0, 'ipaca')
+                if base_backup is not None:
+                    self.export_backends(instance, backends,
+                                         base_backup[1], options.online)
+                else:
+                    self.export_backends(instance, backends, None,
+                                         options.online)
+                    self.db2bak(instance, online=options.online)
             if not options.data_only:
                 # create backup of auth configuration
                 auth_backup_path = os.path.join(paths.VAR_LIB_IPA, 'auth_backup')
@@ -387,7 +561,9 @@ class Backup(admintool.AdminTool):
         '''
         self.log.info('Backing up %s in %s to LDIF' % (backend, instance))
 
-        cn = time.strftime('export_%Y_%m_%d_%H_%M_%S')
+        # backends may be exported concurrently, include the backend name
+        # to make the task name unique
+        cn = time.strftime('export_%Y_%m_%d_%H_%M_%S') + '_' + backend
         dn = DN(('cn', cn), ('cn', 'export'), ('cn', 'tasks'), ('cn', 'config'))
 
         ldifname = '%s-%s.ldif' % (instance, backend)
@@ -431,6 +607,122 @@ class Backup(admintool.AdminTool):
         shutil.move(ldiffile, os.path.join(self.dir, ldifname))
 
 
+    def export_backends(self, instance, backends, since_usn, online=True):
+        '''
+        Export the backends, all changes since since_usn if it is not None.
+
+        Online exports run as separate server tasks and are executed
+        concurrently. Offline db2ldif locks the database of the instance so
+        the backends are exported one after another.
+        '''
+        scheduler = StepScheduler(max_workers=len(backends) if online else 1)
+        for backend in backends:
+            if since_usn is not None:
+                scheduler.step(backend, self.usn2ldif, instance, backend,
+                               since_usn)
+            else:
+                scheduler.step(backend, self.db2ldif, instance, backend,
+                               online=online)
+        scheduler.run()
+        for backend in backends:
+            self.log.debug('Export of %s took %.3f seconds',
+                           backend, scheduler.timings[backend])
+
+
+    def usn2ldif(self, instance, backend, since_usn):
+        '''
+        Create a LDIF backup of entries of the backend changed since the
+        given entry USN together with a list of entries deleted since then.
+        '''
+        self.log.info('Backing up changes of %s in %s since USN %d' %
+                      (backend, instance, since_usn))
+
+        conn = self.get_connection()
+        # tombstones are returned only if they are requested explicitly
+        filter = ('(|(entryusn>=%(usn)d)'
+                  '(&(objectclass=nsTombstone)(entryusn>=%(usn)d)))' %
+                  dict(usn=since_usn + 1))
+        try:
+            entries, _truncated = conn.find_entries(
+                filter, ['*', 'nsuniqueid'], backend_suffix(backend),
+                time_limit=0, size_limit=0, paged_search=True)
+        except errors.EmptyResult:
+            entries = []
+
+        # parents are stored before their children so that the LDIF can be
+        # applied in order
+        entries.sort(key=lambda e: len(e.dn))
+        changed = 0
+        deleted = []
+
+        # nsuniqueid is kept in the LDIF, entries renamed or moved since the
+        # base backup are found by it on restore, there is no tombstone for
+        # their old DN
+        ldifname = INCREMENTAL_LDIF % (instance, backend)
+        with open(os.path.join(self.dir, ldifname), 'w') as f:
+            writer = ldif.LDIFWriter(f)
+            for entry in entries:
+                objectclasses = [oc.lower()
+                                 for oc in entry.get('objectclass', [])]
+                if 'nstombstone' in objectclasses:
+                    uniqueid = entry.single_value.get('nsuniqueid')
+                    if uniqueid and uniqueid.lower() != RUV_UNIQUEID:
+                        deleted.append(tombstone_dn(entry.dn))
+                    continue
+                writer.unparse(str(entry.dn), dict(entry.raw))
+                changed += 1
+
+        with open(os.path.join(self.dir, INCREMENTAL_DELETED %
+                               (instance, backend)), 'w') as f:
+            for dn in deleted:
+                f.write('%s\n' % dn)
+
+        self.log.info('Backed up %d changed and %d deleted entries' %
+                      (changed, len(deleted)))
+
+
+    def get_last_usn(self):
+        '''
+        Return the last entry USN assigned by the server, IPA enables the
+        USN plugin in global mode so there is a single counter for all
+        backends.
+        '''
+        conn = self.get_connection()
+        try:
+            entry = conn.get_entry(DN(), ['lastusn'])
+            return int(entry.single_value['lastusn'])
+        except Exception as e:
+            self.log.debug('Unable to read lastusn: %s', e)
+            return None
+
+
+    def find_base_backup(self):
+        '''
+        Find the most recent backup of this host which records the last
+        entry USN and return its directory name and the USN.
+        '''
+        candidates = []
+        for name in os.listdir(paths.IPA_BACKUP_DIR):
+            try:
+                config = read_header(os.path.join(paths.IPA_BACKUP_DIR, name))
+                if (config.get('ipa', 'host') != api.env.host or
+                        not config.has_option('ipa', 'lastusn')):
+                    continue
+                candidates.append((config.get('ipa', 'time'), name,
+                                   int(config.get('ipa', 'lastusn'))))
+            except Exception as e:
+                self.log.debug('Skipping %s: %s', name, e)
+
+        if not candidates:
+            raise admintool.ScriptError(
+                'No previous backup to base the incremental backup on, '
+                'perform a full or data backup first')
+
+        _time, name, usn = max(candidates)
+        self.log.info('Creating incremental backup based on %s' % name)
+        return name, usn
+
+
     def db2bak(self, instance, online=True):
         '''
         Create a BAK backup of the data and changelog in this instance.
@@ -474,72 +766,47 @@ class Backup(admintool.AdminTool):
 
 
     def file_backup(self, options):
-
-        def verify_directories(dirs):
-            return [s for s in dirs if os.path.exists(s)]
-
         tarfile = os.path.join(self.dir, 'files.tar')
 
         self.log.info("Backing up files")
-        args = ['tar',
-                '--exclude=/var/lib/ipa/backup',
-                '--xattrs',
-                '--selinux',
-                '-cf',
-                tarfile
-               ]
-
-        args.extend(verify_directories(self.dirs))
-        args.extend(verify_directories(self.files))
-
+        names = self.dirs + self.files
         if options.logs:
-            args.extend(verify_directories(self.logs))
+            names.extend(self.logs)
+        # Directories are expanded here and tar runs with --no-recursion, so
+        # that the directory structure is stored by the same tar call, also
+        # with tar older than 1.29 which does not support --no-recursion
+        # for a part of the names only. The archive is not compressed, the
+        # whole backup is compressed once by finalize_backup().
+        members = archive_members(names, self.required_dirs,
+                                  exclude=(paths.IPA_BACKUP_DIR,))
+
+        with tempfile.NamedTemporaryFile('w') as filelist:
+            filelist.write(''.join('%s\0' % name for name in members))
+            filelist.flush()
 
-        result = run(args, raiseonerr=False)
-        if result.returncode != 0:
-            raise admintool.ScriptError('tar returned non-zero code %d: %s' %
-                                        (result.returncode, result.error_log))
-
-        # Backup the necessary directory structure. This is a separate
-        # call since we are using the '--no-recursion' flag to store
-        # the directory structure only, no files.
-        missing_directories = verify_directories(self.required_dirs)
-
-        if missing_directories:
             args = ['tar',
-                    '--exclude=/var/lib/ipa/backup',
                     '--xattrs',
                     '--selinux',
                     '--no-recursion',
-                    '-rf',  # -r appends to an existing archive
+                    '-cf',
                     tarfile,
+                    '--null',
+                    '-T',
+                    filelist.name,
                    ]
-            args.extend(missing_directories)
-
             result = run(args, raiseonerr=False)
-            if result.returncode != 0:
-                raise admintool.ScriptError(
-                    'tar returned non-zero code %d '
-                    'when adding directory structure: %s' %
-                    (result.returncode, result.error_log))
-
-        # Compress the archive. This is done separately, since 'tar' cannot
-        # append to a compressed archive.
-        result = run(['gzip', tarfile], raiseonerr=False)
         if result.returncode != 0:
-            raise admintool.ScriptError(
-                'gzip returned non-zero code %d '
-                'when compressing the backup: %s' %
-                (result.returncode, result.error_log))
-
-        # Rename the archive back to files.tar to preserve compatibility
-        os.rename(os.path.join(self.dir, 'files.tar.gz'), tarfile)
+            raise admintool.ScriptError('tar returned non-zero code %d: %s' %
+                                        (result.returncode, result.error_log))
 
 
-    def create_header(self, data_only):
+    def create_header(self, data_only, base_backup=None):
         '''
         Create the backup file header that contains the meta data about
         this particular backup.
+
+        base_backup is a tuple of directory name and last USN of the
+        backup an incremental backup is based on.
         '''
         config = SafeConfigParser()
         config.add_section("ipa")
@@ -552,6 +819,14 @@ class Backup(admintool.AdminTool):
         config.set('ipa', 'ipa_version', str(version.VERSION))
         config.set('ipa', 'version', '1')
 
+        # read the USN before the data are exported, changes done during
+        # an online export are backed up again by the next incremental backup
+        last_usn = self.get_last_usn()
+        if last_usn is not None:
+            config.set('ipa', 'lastusn', str(last_usn))
+        if base_backup is not None:
+            config.set('ipa', 'base', base_backup[0])
+
         dn = DN(('cn', api.env.host), ('cn', 'masters'), ('cn', 'ipa'), ('cn', 'etc'), api.env.basedn)
         services_cns = []
         try:
@@ -595,23 +870,68 @@ class Backup(admintool.AdminTool):
         os.chmod(backup_dir, 0o700)
 
         os.chdir(self.dir)
+        write_manifest(self.dir)
+
         args = ['tar',
                 '--xattrs',
                 '--selinux',
-                '-czf',
-                filename,
-                '.'
                ]
-        result = run(args, raiseonerr=False)
-        if result.returncode != 0:
-            raise admintool.ScriptError(
-                'tar returned non-zero code %s: %s' %
-                (result.returncode, result.error_log))
+        args.extend(tar_compress_args())
 
         if encrypt:
+            # Stream the archive to gpg so that it is written only once
+            filename += '.gpg'
             self.log.info('Encrypting %s' % filename)
-            filename = encrypt_file(filename, keyring)
+            args.extend(['-cf', '-', '.'])
+            self.pipe_archive(args, gpg_encrypt_args(filename, keyring))
+        else:
+            args.extend(['-cf', filename, '.'])
+            result = run(args, raiseonerr=False)
+            if result.returncode != 0:
+                raise admintool.ScriptError(
+                    'tar returned non-zero code %s: %s' %
+                    (result.returncode, result.error_log))
 
         shutil.move(self.header, backup_dir)
 
         self.log.info('Backed up to %s', backup_dir)
+
+
+    def pipe_archive(self, tar_args, filter_args):
+        '''
+        Run tar and pipe the archive it writes to standard output through
+        the filter command.
+        '''
+        self.log.debug('Starting external process')
+        self.log.debug('args=%s | %s', ' '.join(tar_args),
+                       ' '.join(filter_args))
+
+        tar_err = tempfile.TemporaryFile()
+        filter_err = tempfile.TemporaryFile()
+        try:
+            tar = subprocess.Popen(tar_args, stdout=subprocess.PIPE,
+                                   stderr=tar_err, close_fds=True)
+            try:
+                filter_proc = subprocess.Popen(
+                    filter_args, stdin=tar.stdout, stderr=filter_err,
+                    close_fds=True)
+            finally:
+                # the filter holds its own copy of the pipe, closing ours
+                # lets tar get SIGPIPE if the filter exits early
+                tar.stdout.close()
+            filter_proc.wait()
+            tar.wait()
+
+            for name, proc, err in (('tar', tar, tar_err),
+                                    (filter_args[0], filter_proc, filter_err)):
+                err.seek(0)
+                error_log = err.read().decode('utf-8', 'replace')
+                self.log.debug('%s process exited with code %d: %s',
+                               name, proc.returncode, error_log)
+                if proc.returncode != 0:
+                    raise admintool.ScriptError(
+                        '%s returned non-zero code %s: %s' %
+                        (name, proc.returncode, error_log))
+        finally:
+            tar_err.close()
+            filter_err.close()
@@ -17,6 +17,7 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 #
 
+import io
 import os
 import shutil
 import tempfile
@@ -26,6 +27,7 @@ import ldif
 import itertools
 
 # pylint: disable=import-error
+from six.moves import configparser
 from six.moves.configparser import SafeConfigParser
 # pylint: enable=import-error
 
@@ -33,10 +35,14 @@ from ipaclient.install.client import update_ipa_nssdb
 from ipalib import api, errors
 from ipalib.constants import FQDN
 from ipapython import version, ipautil
-from ipapython.ipautil import run, user_input
+from ipapython.ipautil import run, user_input, CIDict
 from ipapython import admintool
 from ipapython.dn import DN
 from ipaserver.install.dsinstance import create_ds_user
+from ipaserver.install.ipa_backup import (
+    verify_manifest, backend_suffix, read_header, INCREMENTAL_LDIF,
+    INCREMENTAL_DELETED, RUV_UNIQUEID)
+from ipaserver.install.scheduler import StepScheduler
 from ipaserver.install.cainstance import create_ca_user
 from ipaserver.install.replication import (wait_for_task, ReplicationManager,
                                            get_cs_replication_manager)
@@ -98,30 +104,208 @@ def decrypt_file(tmpdir, filename, keyring):
     return dest
 
 
-class RemoveRUVParser(ldif.LDIFParser):
-    def __init__(self, input_file, writer, logger):
-        ldif.LDIFParser.__init__(self, input_file)
-        self.writer = writer
-        self.log = logger
+# the RUV unique ID as it appears in raw LDIF data, in both letter cases
+_RUV_UNIQUEID_BYTES = (RUV_UNIQUEID.encode('ascii'),
+                       RUV_UNIQUEID.upper().encode('ascii'))
 
-    def handle(self, dn, entry):
+
+def _is_ruv(record, logger):
+    """
+    Return True if the LDIF record is a RUV tombstone entry.
+
+    Only records which contain the RUV unique ID are parsed, all other
+    records are rejected by a substring search.
+    """
+    if not any(uniqueid in record for uniqueid in _RUV_UNIQUEID_BYTES):
+        return False
+
+    parser = ldif.LDIFRecordList(io.BytesIO(record))
+    parser.parse()
+
+    for dn, entry in parser.all_records:
         objectclass = None
         nsuniqueid = None
 
         for name, value in entry.items():
             name = name.lower()
             if name == 'objectclass':
-                objectclass = [x.lower() for x in value]
+                objectclass = [x.decode('utf-8').lower() for x in value]
             elif name == 'nsuniqueid':
-                nsuniqueid = [x.lower() for x in value]
+                nsuniqueid = [x.decode('utf-8').lower() for x in value]
 
         if (objectclass and nsuniqueid and
             'nstombstone' in objectclass and
-            'ffffffff-ffffffff-ffffffff-ffffffff' in nsuniqueid):
-            self.log.debug("Removing RUV entry %s", dn)
-            return
+            RUV_UNIQUEID in nsuniqueid):
+            logger.debug("Removing RUV entry %s", dn)
+            return True
+
+    return False
+
+
+def remove_ruv(in_file, out_file, logger, bufsize=1024 * 1024):
+    """
+    Copy LDIF from in_file to out_file leaving out RUV tombstone entries.
+
+    The input is processed in blocks of complete records, records are
+    separated by an empty line. Blocks which do not contain the RUV unique
+    ID are copied as they are, only records which could be a RUV entry are
+    parsed. All other records are copied byte-for-byte.
+    """
+    pending = b''
+    separator = b''
+    while True:
+        data = in_file.read(bufsize)
+        if not data:
+            break
+
+        pending += data
+        end = pending.rfind(b'\n\n')
+        if end == -1:
+            continue
+
+        separator = _remove_ruv_block(pending[:end + 1], out_file, separator,
+                                      logger)
+        pending = pending[end + 2:]
+
+    if pending:
+        _remove_ruv_block(pending, out_file, separator, logger)
+    else:
+        out_file.write(separator)
+
+
+def _remove_ruv_block(block, out_file, separator, logger):
+    """
+    Copy records of block to out_file, separator is written before the
+    first copied record. Return the separator of the next record.
+    """
+    if not any(uniqueid in block for uniqueid in _RUV_UNIQUEID_BYTES):
+        out_file.write(separator + block)
+        return b'\n'
+
+    records = block.split(b'\n\n')
+    for i, record in enumerate(records):
+        if i < len(records) - 1:
+            record += b'\n'
+        if _is_ruv(record, logger):
+            if record.startswith(b'version:'):
+                # keep the version line of the LDIF file, the next record
+                # follows it directly
+                out_file.write(separator + record[:record.index(b'\n') + 1])
+                separator = b''
+            continue
+        out_file.write(separator + record)
+        separator = b'\n'
+
+    return separator
+
+
+def backup_chain(backup_dir):
+    """
+    Return the backups needed to restore ``backup_dir``.
+
+    The first one is the full or data backup, it is followed by the
+    incremental backups based on it, ``backup_dir`` is the last one.
+    """
+    chain = [backup_dir]
+    while True:
+        try:
+            config = read_header(chain[0])
+        except (IOError, configparser.Error) as e:
+            raise admintool.ScriptError(
+                "Cannot read metadata of backup %s: %s" % (chain[0], e))
+        if not config.has_option('ipa', 'base'):
+            return chain
+        base = os.path.join(paths.IPA_BACKUP_DIR, config.get('ipa', 'base'))
+        if base in chain:
+            raise admintool.ScriptError(
+                "Backup %s is based on itself" % chain[0])
+        chain.insert(0, base)
+
+
+class ApplyIncrementalParser(ldif.LDIFParser):
+    """
+    Add or update entries of an incremental backup LDIF in the directory
+
+    Entries are matched by their nsuniqueid when the LDIF records it, so
+    that entries renamed or moved since the previous backup are moved to
+    their new DN instead of being added next to the old entry.
+    """
+    def __init__(self, input_file, conn, logger, base_dn=None):
+        ldif.LDIFParser.__init__(self, input_file)
+        self.conn = conn
+        self.log = logger
+        self.base_dn = base_dn
+        self.count = 0
+        self.renamed = 0
+
+    def _find_by_uniqueid(self, uniqueid):
+        try:
+            entries, _truncated = self.conn.find_entries(
+                self.conn.make_filter_from_attr('nsuniqueid', uniqueid),
+                ['*', 'nsuniqueid'], self.base_dn)
+        except errors.NotFound:
+            return None
+        return entries[0]
+
+    def _get_current(self, dn, uniqueid):
+        """
+        Return the entry the backed up entry ``dn`` is applied to or None
+        """
+        try:
+            current = self.conn.get_entry(dn, ['*', 'nsuniqueid'])
+        except errors.NotFound:
+            current = None
+
+        if uniqueid is None:
+            return current
+        if (current is not None and
+                current.single_value.get('nsuniqueid', u'').lower() ==
+                uniqueid):
+            return current
+
+        old = self._find_by_uniqueid(uniqueid)
+        if old is None:
+            return current
+
+        if current is None:
+            self.log.debug("Moving %s to %s", old.dn, dn)
+            self.conn.move_entry(old.dn, dn)
+            current = self.conn.get_entry(dn, ['*', 'nsuniqueid'])
+        else:
+            # the entry was moved to a DN which is still taken by another
+            # entry, keep just one entry at the DN
+            self.log.debug("Removing %s moved to %s", old.dn, dn)
+            self.conn.delete_entry(old.dn)
+        self.renamed += 1
+        return current
+
+    def handle(self, dn, entry):
+        dn = DN(dn)
+        entry = CIDict(entry)
+        uniqueid = entry.pop('nsuniqueid', None)
+        if uniqueid:
+            uniqueid = uniqueid[0].decode('utf-8').lower()
+
+        current = self._get_current(dn, uniqueid)
+        if current is None:
+            current = self.conn.make_entry(dn)
+            for name, values in entry.items():
+                current.raw[name] = values
+            self.conn.add_entry(current)
+        else:
+            for name in list(current):
+                if name.lower() == 'nsuniqueid':
+                    continue
+                if name not in entry:
+                    current.raw[name] = []
+            for name, values in entry.items():
+                current.raw[name] = values
+            try:
+                self.conn.update_entry(current)
+            except errors.EmptyModlist:
+                pass
 
-        self.writer.unparse(dn, entry)
+        self.count += 1
 
 
 class Restore(admintool.AdminTool):
@@ -220,8 +404,15 @@ class Restore(admintool.AdminTool):
         self.log.info("Preparing restore from %s on %s",
                       self.backup_dir, FQDN)
 
-        self.header = os.path.join(self.backup_dir, 'header')
+        # An incremental backup is restored by restoring the backup it is
+        # based on and applying all incremental backups in the chain
+        chain = backup_chain(self.backup_dir)
+        self.backup_dir = chain[0]
+        self.incremental_backups = chain[1:]
+        if self.incremental_backups:
+            self.log.info("Backup is based on %s", self.backup_dir)
 
+        self.header = os.path.join(self.backup_dir, 'header')
         try:
             self.read_header()
         except IOError as e:
@@ -390,9 +581,16 @@ class Restore(admintool.AdminTool):
                     httpinstance.create_kdcproxy_user()
 
             # Always restore the data from ldif
-            # We need to restore both userRoot and ipaca.
+            # We need to restore both userRoot and ipaca. Online imports run
+            # as separate server tasks and are executed concurrently, offline
+            # ldif2db locks the database so the backends are imported one
+            # after another.
+            scheduler = StepScheduler(
+                max_workers=len(databases) if options.online else 1)
             for instance, backend in databases:
-                self.ldif2db(instance, backend, online=options.online)
+                scheduler.step('%s-%s' % (instance, backend), self.ldif2db,
+                               instance, backend, online=options.online)
+            scheduler.run()
 
             if restore_type != 'FULL':
                 if not options.online:
@@ -416,6 +614,10 @@ class Restore(admintool.AdminTool):
                 http.remove_httpd_ccaches()
                 # have the daemons pick up their restored configs
                 run([paths.SYSTEMCTL, "--system", "daemon-reload"])
+
+            for backup_dir in self.incremental_backups:
+                self.restore_incremental(backup_dir, databases,
+                                         options.gpg_keyring)
         finally:
             try:
                 os.chdir(cwd)
@@ -523,7 +725,9 @@ class Restore(admintool.AdminTool):
         '''
         self.log.info('Restoring from %s in %s' % (backend, instance))
 
-        cn = time.strftime('import_%Y_%m_%d_%H_%M_%S')
+        # backends may be imported concurrently, include the backend name
+        # to make the task name unique
+        cn = time.strftime('import_%Y_%m_%d_%H_%M_%S') + '_' + backend
         dn = DN(('cn', cn), ('cn', 'import'), ('cn', 'tasks'), ('cn', 'config'))
 
         ldifdir = paths.SLAPD_INSTANCE_LDIF_DIR_TEMPLATE % instance
@@ -539,10 +743,8 @@ class Restore(admintool.AdminTool):
 
         ipautil.backup_file(ldiffile)
         with open(ldiffile, 'wb') as out_file:
-            ldif_writer = ldif.LDIFWriter(out_file)
             with open(srcldiffile, 'rb') as in_file:
-                ldif_parser = RemoveRUVParser(in_file, ldif_writer, self.log)
-                ldif_parser.parse()
+                remove_ruv(in_file, out_file, self.log)
 
         if online:
             conn = self.get_connection()
@@ -647,7 +849,7 @@ class Restore(admintool.AdminTool):
         args = ['tar',
                 '--xattrs',
                 '--selinux',
-                '-xzf',
+                '-xf',
                 os.path.join(self.dir, 'files.tar'),
                 paths.IPA_DEFAULT_CONF[1:],
                ]
@@ -688,10 +890,11 @@ class Restore(admintool.AdminTool):
         self.log.info("Restoring files")
         cwd = os.getcwd()
         os.chdir('/')
+        # files.tar of older backups is compressed, tar detects that
         args = ['tar',
                 '--xattrs',
                 '--selinux',
-                '-xzf',
+                '-xf',
                 os.path.join(self.dir, 'files.tar')
                ]
         if nologs:
@@ -720,32 +923,46 @@ class Restore(admintool.AdminTool):
         self.backup_ipa_version = config.get('ipa', 'ipa_version')
         self.backup_version = config.get('ipa', 'version')
         self.backup_services = config.get('ipa', 'services').split(',')
+        if config.has_option('ipa', 'base'):
+            self.backup_base = config.get('ipa', 'base')
+        else:
+            self.backup_base = None
 
 
-    def extract_backup(self, keyring=None):
+    def extract_backup(self, keyring=None, backup_dir=None, backup_type=None,
+                       dest=None):
         '''
         Extract the contents of the tarball backup into a temporary location,
         decrypting if necessary.
+
+        The backup being restored is extracted into self.dir unless other
+        backup_dir and dest are given.
         '''
+        if backup_dir is None:
+            backup_dir = self.backup_dir
+        if backup_type is None:
+            backup_type = self.backup_type
+        if dest is None:
+            dest = self.dir
 
         encrypt = False
         filename = None
-        if self.backup_type == 'FULL':
-            filename = os.path.join(self.backup_dir, 'ipa-full.tar')
+        if backup_type == 'FULL':
+            filename = os.path.join(backup_dir, 'ipa-full.tar')
         else:
-            filename = os.path.join(self.backup_dir, 'ipa-data.tar')
+            filename = os.path.join(backup_dir, 'ipa-data.tar')
         if not os.path.exists(filename):
             if not os.path.exists(filename + '.gpg'):
-                raise admintool.ScriptError('Unable to find backup file in %s' % self.backup_dir)
+                raise admintool.ScriptError('Unable to find backup file in %s' % backup_dir)
             else:
                 filename = filename + '.gpg'
                 encrypt = True
 
         if encrypt:
             self.log.info('Decrypting %s' % filename)
-            filename = decrypt_file(self.dir, filename, keyring)
+            filename = decrypt_file(dest, filename, keyring)
 
-        os.chdir(self.dir)
+        os.chdir(dest)
 
         args = ['tar',
                 '--xattrs',
@@ -756,14 +973,59 @@ class Restore(admintool.AdminTool):
                ]
         run(args)
 
-        pent = pwd.getpwnam(constants.DS_USER)
-        os.chown(self.top_dir, pent.pw_uid, pent.pw_gid)
-        recursive_chown(self.dir, pent.pw_uid, pent.pw_gid)
-
         if encrypt:
             # We can remove the decoded tarball
             os.unlink(filename)
 
+        corrupted = verify_manifest(dest)
+        if corrupted:
+            raise admintool.ScriptError(
+                'Backup is corrupted, checksum mismatch: %s' %
+                ', '.join(corrupted))
+
+        pent = pwd.getpwnam(constants.DS_USER)
+        os.chown(self.top_dir, pent.pw_uid, pent.pw_gid)
+        recursive_chown(dest, pent.pw_uid, pent.pw_gid)
+
+    def restore_incremental(self, backup_dir, databases, keyring=None):
+        '''
+        Apply changes stored in an incremental backup to the running
+        directory server.
+
+        Entries deleted since the base backup are removed first, deepest
+        first, then changed entries are added or updated, parents first.
+        '''
+        self.log.info("Applying incremental backup %s", backup_dir)
+
+        dest = tempfile.mkdtemp(dir=self.top_dir)
+        self.extract_backup(keyring, backup_dir, 'DATA', dest)
+
+        conn = self.get_connection()
+        for database in databases:
+            deletedfile = os.path.join(dest, INCREMENTAL_DELETED % database)
+            if os.path.exists(deletedfile):
+                with open(deletedfile) as f:
+                    deleted = [DN(line.rstrip('\n')) for line in f
+                               if line.strip()]
+                deleted.sort(key=len, reverse=True)
+                for dn in deleted:
+                    try:
+                        conn.delete_entry(dn)
+                    except errors.NotFound:
+                        pass
+                self.log.info("Removed %d entries from %s in %s",
+                              len(deleted), database[1], database[0])
+
+            ldiffile = os.path.join(dest, INCREMENTAL_LDIF % database)
+            if os.path.exists(ldiffile):
+                with open(ldiffile, 'rb') as f:
+                    parser = ApplyIncrementalParser(
+                        f, conn, self.log, backend_suffix(database[1]))
+                    parser.parse()
+                self.log.info("Restored %d changed entries, %d of them "
+                              "renamed, to %s in %s", parser.count,
+                              parser.renamed, database[1], database[0])
+
     def __create_dogtag_log_dirs(self):
         """
         If we are doing a full restore and the dogtag log directories do
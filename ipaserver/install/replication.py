@@ -47,6 +47,9 @@ IPA_USER_CONTAINER = DN(('cn', 'users'), ('cn', 'accounts'))
 PORT = 636
 DEFAULT_PORT = 389
 TIMEOUT = 120
+# bounds of the interval in seconds between checks of an agreement status
+REPL_POLL_MIN_INTERVAL = 0.1
+REPL_POLL_MAX_INTERVAL = 1
 REPL_MAN_DN = DN(('cn', 'replication manager'), ('cn', 'config'))
 DNA_DN = DN(('cn', 'Posix IDs'), ('cn', 'Distributed Numeric Assignment Plugin'), ('cn', 'plugins'), ('cn', 'config'))
 REPL_MANAGERS_CN = DN(('cn', 'replication managers'))
@@ -155,21 +158,50 @@ def wait_for_task(conn, dn):
     return exit_code
 
 
+def _watch_for_entry(connection, dn, filter, attrlist, deadline):
+    """
+    Wait for entry dn matching filter using a persistent search on its
+    parent, returns None when the search could not be used or timed out
+    """
+    rdn = dn[0]
+    search_filter = connection.combine_filters(
+        [connection.make_filter_from_attr(rdn.attr, rdn.value), filter],
+        rules=connection.MATCH_ALL)
+    try:
+        for entry in connection.persistent_search(
+                search_filter, attrlist, dn[1:], ldap.SCOPE_ONELEVEL,
+                timeout=deadline - time.time()):
+            if entry.dn == dn:
+                return entry
+    except (errors.NotFound, errors.DatabaseTimeout):
+        pass
+    return None
+
+
 def wait_for_entry(connection, dn, timeout=7200, attr='', quiet=True):
-    """Wait for entry and/or attr to show up"""
+    """Wait for entry and/or attr to show up
+
+    When the server supports persistent searches, the entry is reported by
+    the server as soon as it is added or replicated, otherwise it is polled
+    every second.
+    """
 
     filter = "(objectclass=*)"
     attrlist = []
     if attr:
         filter = "(%s=*)" % attr
         attrlist.append(attr)
-    timeout += int(time.time())
+    deadline = time.time() + timeout
 
     if not quiet:
         sys.stdout.write("Waiting for %s %s:%s " % (connection, dn, attr))
         sys.stdout.flush()
     entry = None
-    while not entry and int(time.time()) < timeout:
+    if (len(dn) > 1 and ipaldap.PERSISTENT_SEARCH_OID in
+            connection.get_supported_controls()):
+        entry = _watch_for_entry(connection, dn, filter, attrlist, deadline)
+
+    while not entry and time.time() < deadline:
         try:
             [entry] = connection.get_entries(
                 dn, ldap.SCOPE_BASE, filter, attrlist)
@@ -184,13 +216,66 @@ def wait_for_entry(connection, dn, timeout=7200, attr='', quiet=True):
                 sys.stdout.flush()
             time.sleep(1)
 
-    if not entry and int(time.time()) > timeout:
+    if not entry:
         raise errors.NotFound(
             reason="wait_for_entry timeout for %s for %s" % (connection, dn))
-    elif entry and not quiet:
+    elif not quiet:
         root_logger.error("The waited for entry is: %s", entry)
 
 
+class ReplicationProgress(object):
+    """
+    Progress of a replication update reported to progress callbacks
+
+    :param elapsed: seconds since the wait for the update started
+    :param status: last status reported by the agreement
+    :param sent: number of changes sent by the agreement since the wait
+        started, None if it is not known. Entries sent by a total update
+        are not counted by the server.
+    """
+    def __init__(self, elapsed, status=None, sent=None):
+        self.elapsed = elapsed
+        self.status = status
+        self.sent = sent
+
+    @property
+    def rate(self):
+        """Changes sent per second or None"""
+        if not self.sent or self.elapsed <= 0:
+            return None
+        return self.sent / float(self.elapsed)
+
+
+def print_progress(progress):
+    """Default progress callback printing the progress on a single line"""
+    msg = "Update in progress, %d seconds elapsed" % int(progress.elapsed)
+    if progress.sent is not None:
+        msg += ", %d changes sent" % progress.sent
+        if progress.rate is not None:
+            msg += " (%.1f/s)" % progress.rate
+    sys.stdout.write('\r')
+    sys.stdout.write(msg)
+    sys.stdout.flush()
+
+
+def _get_changes_sent(entry):
+    """
+    Sum the changes sent by an agreement from its
+    nsds5replicaChangesSentSinceStartup value ("rid:sent/skipped ...")
+    """
+    value = entry.single_value.get('nsds5replicaChangesSentSinceStartup')
+    if not value:
+        return None
+    sent = 0
+    try:
+        for counter in value.split():
+            _rid, counts = counter.split(':', 1)
+            sent += int(counts.split('/', 1)[0])
+    except ValueError:
+        return None
+    return sent
+
+
 class ReplicationManager(object):
     """Manage replication agreements between DS servers, and sync
     agreements with Windows servers"""
@@ -890,7 +975,15 @@ class ReplicationManager(object):
         except Exception as e:
             root_logger.debug("Failed to remove referral value: %s" % str(e))
 
-    def check_repl_init(self, conn, agmtdn, start):
+    def _get_changes_sent(self, conn, agmtdn):
+        try:
+            entry = conn.get_entry(
+                agmtdn, ['nsds5replicaChangesSentSinceStartup'])
+        except errors.NotFound:
+            return None
+        return _get_changes_sent(entry)
+
+    def check_repl_init(self, conn, agmtdn, start, progress=None):
         done = False
         hasError = 0
         attrlist = ['cn', 'nsds5BeginReplicaRefresh',
@@ -927,19 +1020,21 @@ class ReplicationManager(object):
             else:
                 now = datetime.datetime.now()
                 d = now - start
-                sys.stdout.write('\r')
-                sys.stdout.write("Update in progress, %d seconds elapsed" % int(d.total_seconds()))
-                sys.stdout.flush()
+                if progress is None:
+                    progress = print_progress
+                progress(ReplicationProgress(d.total_seconds(), status))
 
         return done, hasError
 
-    def check_repl_update(self, conn, agmtdn):
+    def check_repl_update(self, conn, agmtdn, progress=None, wait_start=None,
+                          sent_base=0):
         done = False
         hasError = 0
         error_message = ''
         attrlist = ['cn', 'nsds5replicaUpdateInProgress',
                     'nsds5ReplicaLastUpdateStatus', 'nsds5ReplicaLastUpdateStart',
-                    'nsds5ReplicaLastUpdateEnd']
+                    'nsds5ReplicaLastUpdateEnd',
+                    'nsds5replicaChangesSentSinceStartup']
         entry = conn.get_entry(agmtdn, attrlist)
         if not entry:
             print("Error reading status from agreement", agmtdn)
@@ -967,28 +1062,67 @@ class ReplicationManager(object):
                     hasError = 1
                     error_message = msg
                     done = True
+            if progress is not None and not done:
+                sent = _get_changes_sent(entry)
+                if sent is not None:
+                    sent = max(sent - sent_base, 0)
+                if wait_start is None:
+                    elapsed = 0
+                else:
+                    elapsed = time.time() - wait_start
+                progress(ReplicationProgress(elapsed, status, sent))
 
         return done, hasError, error_message
 
-    def wait_for_repl_init(self, conn, agmtdn):
+    def wait_for_repl_init(self, conn, agmtdn, progress=None):
+        """
+        Wait for the total update of agreement agmtdn to finish
+
+        The agreement is checked in short, growing intervals so that the
+        end of the update is noticed quickly.
+
+        :param progress: callable receiving a `ReplicationProgress` while
+            the update is in progress, `print_progress` by default
+        """
         done = False
         haserror = 0
         start = datetime.datetime.now()
+        interval = REPL_POLL_MIN_INTERVAL
         while not done and not haserror:
-            time.sleep(1)  # give it a few seconds to get going
-            done, haserror = self.check_repl_init(conn, agmtdn, start)
+            time.sleep(interval)
+            interval = min(interval * 2, REPL_POLL_MAX_INTERVAL)
+            done, haserror = self.check_repl_init(
+                conn, agmtdn, start, progress)
         print("")
         return haserror
 
-    def wait_for_repl_update(self, conn, agmtdn, maxtries=600):
+    def wait_for_repl_update(self, conn, agmtdn, maxtries=600,
+                             progress=None):
+        """
+        Wait at most maxtries seconds for the incremental update of
+        agreement agmtdn to finish
+
+        :param progress: callable receiving a `ReplicationProgress` while
+            the update is in progress
+        """
         done = False
         haserror = 0
         error_message = ''
-        while not done and not haserror and maxtries > 0:
-            time.sleep(1)  # give it a few seconds to get going
-            done, haserror, error_message = self.check_repl_update(conn, agmtdn)
-            maxtries -= 1
-        if maxtries == 0: # too many tries
+        wait_start = time.time()
+        deadline = wait_start + maxtries
+        sent_base = self._get_changes_sent(conn, agmtdn) or 0
+        # give it a second to get going, the agreement reports the previous
+        # update as done until then
+        time.sleep(1)
+        interval = REPL_POLL_MIN_INTERVAL
+        while True:
+            done, haserror, error_message = self.check_repl_update(
+                conn, agmtdn, progress, wait_start, sent_base)
+            if done or haserror or time.time() >= deadline:
+                break
+            time.sleep(interval)
+            interval = min(interval * 2, REPL_POLL_MAX_INTERVAL)
+        if not done and not haserror: # too many tries
             print("Error: timeout: could not determine agreement status: please check your directory server logs for possible errors")
             haserror = 1
         return haserror, error_message
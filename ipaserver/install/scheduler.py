@@ -0,0 +1,273 @@
+#
+# Copyright (C) 2017  FreeIPA Contributors see COPYING for license
+#
+
+"""
+Scheduler for independent installer and upgrade steps
+
+Steps are declared with their prerequisites and with the resources they
+lock (configuration files, LDAP entries, ...).  Steps sharing a resource
+are always executed in the order in which they were added, all other steps
+whose prerequisites are met are executed concurrently by a bounded pool of
+worker threads.
+
+A step may also declare services which have to be restarted when the step
+reports a change.  Restarts requested by several steps are collapsed into
+a single restart per service which is performed after all steps finished.
+"""
+
+import sys
+import threading
+import time
+
+import six
+# pylint: disable=import-error
+from six.moves import queue
+# pylint: enable=import-error
+
+from ipapython.graph import Graph
+from ipapython.ipa_log_manager import root_logger
+
+DEFAULT_MAX_WORKERS = 4
+
+
+class Step(object):
+    """
+    A single unit of work executed by the `StepScheduler`
+
+    :param name: unique name of the step
+    :param func: callable executing the step
+    :param args: positional arguments for `func`
+    :param kwargs: keyword arguments for `func`
+    :param requires: names of steps which have to finish first
+    :param locks: names of resources the step modifies
+    :param restarts: names of services to restart if `func` returns a true
+        value
+    """
+    def __init__(self, name, func, args=(), kwargs=None, requires=(),
+                 locks=(), restarts=()):
+        self.name = name
+        self.func = func
+        self.args = tuple(args)
+        self.kwargs = dict(kwargs or {})
+        self.requires = tuple(requires)
+        self.locks = frozenset(locks)
+        self.restarts = tuple(restarts)
+
+    def __repr__(self):
+        return '<{} {}>'.format(self.__class__.__name__, self.name)
+
+    def __call__(self):
+        return self.func(*self.args, **self.kwargs)
+
+
+class StepScheduler(object):
+    """
+    Execute `Step` objects concurrently honoring their dependencies
+
+    :param max_workers: maximal number of steps executed at the same time,
+        with 1 or less all steps are executed serially in the calling thread
+    :param thread_setup: callable executed in every worker thread before it
+        executes its first step, e.g. to open a thread-local LDAP connection
+    :param thread_teardown: callable executed in every worker thread before
+        it exits
+    """
+    def __init__(self, max_workers=DEFAULT_MAX_WORKERS, thread_setup=None,
+                 thread_teardown=None):
+        self.max_workers = max_workers
+        self.thread_setup = thread_setup
+        self.thread_teardown = thread_teardown
+        self.steps = []
+        self.results = {}
+        self.timings = {}
+        self._restart_handlers = {}
+        self._restart_requests = []
+        self._names = set()
+
+    def add(self, step):
+        if step.name in self._names:
+            raise ValueError("duplicate step: %s" % step.name)
+        for name in step.requires:
+            if name not in self._names:
+                raise ValueError(
+                    "step %s requires unknown step %s" % (step.name, name))
+        self._names.add(step.name)
+        self.steps.append(step)
+        return step
+
+    def step(self, name, func, *args, **kwargs):
+        """
+        Shortcut for ``add(Step(name, func, args, ...))``
+
+        The keyword arguments ``requires``, ``locks`` and ``restarts`` are
+        passed to `Step`, all other keyword arguments are passed to `func`.
+        """
+        options = {}
+        for key in ('requires', 'locks', 'restarts'):
+            if key in kwargs:
+                options[key] = kwargs.pop(key)
+        return self.add(Step(name, func, args, kwargs, **options))
+
+    def add_restart_handler(self, service, handler):
+        """
+        Register `handler` which restarts `service`
+        """
+        self._restart_handlers[service] = handler
+
+    def request_restart(self, service):
+        if service not in self._restart_handlers:
+            raise ValueError("no restart handler for service %s" % service)
+        if service not in self._restart_requests:
+            self._restart_requests.append(service)
+
+    def _build_graph(self):
+        graph = Graph()
+        for step in self.steps:
+            graph.add_vertex(step.name)
+
+        last_locked = {}
+        for step in self.steps:
+            tails = set(step.requires)
+            for lock in step.locks:
+                if lock in last_locked:
+                    tails.add(last_locked[lock])
+                last_locked[lock] = step.name
+            for tail in tails:
+                graph.add_edge(tail, step.name)
+
+        return graph
+
+    def _execute(self, step):
+        root_logger.debug("Starting step %s", step.name)
+        start = time.time()
+        try:
+            result = step()
+        except BaseException:
+            exc_info = sys.exc_info()
+            result = None
+        else:
+            exc_info = None
+        elapsed = time.time() - start
+        return step, result, exc_info, elapsed
+
+    def _worker(self, jobs, done):
+        setup_exc_info = None
+        if self.thread_setup is not None:
+            try:
+                self.thread_setup()
+            except BaseException:
+                root_logger.debug("Worker thread setup failed", exc_info=True)
+                setup_exc_info = sys.exc_info()
+        try:
+            while True:
+                step = jobs.get()
+                if step is None:
+                    break
+                if setup_exc_info is not None:
+                    # answer every job so that run() does not wait forever
+                    # and fails with the setup error
+                    done.put((step, None, setup_exc_info, 0.0))
+                else:
+                    done.put(self._execute(step))
+        finally:
+            if self.thread_teardown is not None and setup_exc_info is None:
+                self.thread_teardown()
+
+    def _finish(self, step, result, exc_info, elapsed):
+        self.timings[step.name] = elapsed
+        if exc_info is not None:
+            root_logger.debug("Step %s failed after %.3f seconds",
+                              step.name, elapsed)
+            return
+        self.results[step.name] = result
+        root_logger.debug("Step %s finished in %.3f seconds",
+                          step.name, elapsed)
+        if result:
+            for service in step.restarts:
+                self.request_restart(service)
+
+    def run(self):
+        """
+        Execute all steps and then restart services whose restart was
+        requested
+
+        When a step fails, no further steps are started, the steps which are
+        already running are waited for and the first exception is re-raised.
+
+        :returns: dictionary mapping step names to values they returned
+        """
+        graph = self._build_graph()
+        steps = {step.name: step for step in self.steps}
+        pending = {
+            step.name: len(graph.get_tails(step.name)) for step in self.steps
+        }
+        order = [step.name for step in self.steps]
+        ready = [name for name in order if pending[name] == 0]
+        exc_info = None
+
+        workers = []
+        jobs = queue.Queue()
+        done = queue.Queue()
+        if self.max_workers > 1:
+            for _i in range(min(self.max_workers, len(self.steps))):
+                t = threading.Thread(target=self._worker, args=(jobs, done))
+                t.daemon = True
+                t.start()
+                workers.append(t)
+
+        running = 0
+        try:
+            while ready or running:
+                while ready and exc_info is None:
+                    step = steps[ready.pop(0)]
+                    if workers:
+                        jobs.put(step)
+                    else:
+                        done.put(self._execute(step))
+                    running += 1
+
+                if not running:
+                    break
+
+                step, result, step_exc_info, elapsed = done.get()
+                running -= 1
+                self._finish(step, result, step_exc_info, elapsed)
+                if step_exc_info is not None:
+                    if exc_info is None:
+                        exc_info = step_exc_info
+                    ready = []
+                    continue
+                if exc_info is not None:
+                    continue
+
+                for head in graph.get_heads(step.name):
+                    pending[head] -= 1
+                    if pending[head] == 0:
+                        ready.append(head)
+                ready.sort(key=order.index)
+        finally:
+            for _t in workers:
+                jobs.put(None)
+            for t in workers:
+                t.join()
+
+        if exc_info is not None:
+            six.reraise(*exc_info)
+
+        total = sum(self.timings.values())
+        root_logger.debug("Executed %d steps, %.3f seconds of work",
+                          len(self.timings), total)
+
+        self.restart_services()
+        return self.results
+
+    def restart_services(self):
+        """
+        Restart every service whose restart has been requested, once
+        """
+        requests, self._restart_requests = self._restart_requests, []
+        for service in requests:
+            start = time.time()
+            self._restart_handlers[service]()
+            root_logger.debug("Restart of %s finished in %.3f seconds",
+                              service, time.time() - start)
@@ -35,7 +35,7 @@ from ipaserver.install import (
     adtrust, bindinstance, ca, dns, dsinstance,
     httpinstance, installutils, kra, krbinstance,
     ntpinstance, otpdinstance, custodiainstance, replication, service,
-    sysupgrade)
+    sysupgrade, timing)
 from ipaserver.install.installutils import (
     IPA_MODULES, BadHostError, get_fqdn, get_server_ip_address,
     is_ipa_configured, load_pkcs12, read_password, verify_fqdn,
@@ -895,6 +895,8 @@ def install(installer):
     # Everything installed properly, activate ipa service.
     services.knownservices.ipa.enable()
 
+    timing.write_summary(paths.IPASERVER_INSTALL_TIMINGS, 'ipa-server-install')
+
     print("======================================="
           "=======================================")
     print("Setup complete")
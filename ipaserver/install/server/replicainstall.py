@@ -13,6 +13,7 @@ import os
 import shutil
 import socket
 import tempfile
+import time
 import traceback
 
 from pkg_resources import parse_version
@@ -40,7 +41,7 @@ from ipaclient.install.client import configure_krb5_conf, purge_host_keytab
 from ipaserver.install import (
     adtrust, bindinstance, ca, certs, dns, dsinstance, httpinstance,
     installutils, kra, krbinstance,
-    ntpinstance, otpdinstance, custodiainstance, service)
+    ntpinstance, otpdinstance, custodiainstance, service, timing)
 from ipaserver.install.installutils import (
     create_replica_config, ReplicaConfig, load_pkcs12, is_ipa_configured,
     create_ipaapi_user)
@@ -160,6 +161,24 @@ def install_ca_cert(ldap, base_dn, realm, cafile, destfile=paths.IPA_CA_CRT):
     return destfile
 
 
+@contextlib.contextmanager
+def install_phase(name):
+    """
+    Context manager recording the wall clock time of a replica install
+    phase. The steps of the services are timed on their own.
+    """
+    start = time.time()
+    failed = True
+    try:
+        yield
+        failed = False
+    finally:
+        elapsed = time.time() - start
+        root_logger.debug('Replica install phase %s took %.3f seconds',
+                          name, elapsed)
+        timing.record('replica-install', name, elapsed, failed=failed)
+
+
 def install_http(config, auto_redirect, ca_is_configured, ca_file,
                  promote=False,
                  pkcs12_info=None):
@@ -1444,41 +1463,47 @@ def install(installer):
     print("Restarting directory server to enable password extension plugin")
     ds.restart()
 
-    install_http(
-        config,
-        auto_redirect=not options.no_ui_redirect,
-        promote=promote,
-        pkcs12_info=http_pkcs12_info,
-        ca_is_configured=ca_enabled,
-        ca_file=cafile)
-
-    otpd = otpdinstance.OtpdInstance()
-    otpd.create_instance('OTPD', config.host_name,
-                         ipautil.realm_to_suffix(config.realm_name))
-
-    custodia = custodiainstance.CustodiaInstance(config.host_name,
-                                                 config.realm_name)
-    if promote:
-        custodia.create_replica(config.master_host_name)
-    else:
-        custodia.create_instance()
+    with install_phase('http'):
+        install_http(
+            config,
+            auto_redirect=not options.no_ui_redirect,
+            promote=promote,
+            pkcs12_info=http_pkcs12_info,
+            ca_is_configured=ca_enabled,
+            ca_file=cafile)
+
+    with install_phase('otpd'):
+        otpd = otpdinstance.OtpdInstance()
+        otpd.create_instance('OTPD', config.host_name,
+                             ipautil.realm_to_suffix(config.realm_name))
+
+    with install_phase('custodia'):
+        custodia = custodiainstance.CustodiaInstance(config.host_name,
+                                                     config.realm_name)
+        if promote:
+            custodia.create_replica(config.master_host_name)
+        else:
+            custodia.create_instance()
 
     if ca_enabled:
         options.realm_name = config.realm_name
         options.domain_name = config.domain_name
         options.host_name = config.host_name
         options.dm_password = config.dirman_password
-        ca.install(False, config, options)
+        with install_phase('ca'):
+            ca.install(False, config, options)
 
     # configure PKINIT now that all required services are in place
     krb.enable_ssl()
 
     # Apply any LDAP updates. Needs to be done after the replica is synced-up
     service.print_msg("Applying LDAP updates")
-    ds.apply_updates()
+    with install_phase('updates'):
+        ds.apply_updates()
 
     if kra_enabled:
-        kra.install(api, config, options)
+        with install_phase('kra'):
+            kra.install(api, config, options)
 
     service.print_msg("Restarting the KDC")
     krb.restart()
@@ -1528,6 +1553,9 @@ def install(installer):
     # Everything installed properly, activate ipa service.
     services.knownservices.ipa.enable()
 
+    timing.write_summary(paths.IPAREPLICA_INSTALL_TIMINGS,
+                         'ipa-replica-install')
+
 
 def init(installer):
     installer.unattended = not installer.interactive
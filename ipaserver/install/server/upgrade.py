@@ -48,6 +48,8 @@ from ipaserver.install import dnskeysyncinstance
 from ipaserver.install import dogtaginstance
 from ipaserver.install import krbinstance
 from ipaserver.install import adtrustinstance
+from ipaserver.install import timing
+from ipaserver.install.scheduler import StepScheduler
 from ipaserver.install.upgradeinstance import IPAUpgrade
 from ipaserver.install.ldapupdate import BadSyntax
 
@@ -1536,6 +1538,16 @@ def disable_httpd_system_trust(http):
             db.add_cert(cert, nickname, trust_flags)
 
 
+def _upgrade_thread_setup():
+    # LDAP connections are thread-local, each scheduler worker needs its own
+    api.Backend.ldap2.connect()
+
+
+def _upgrade_thread_teardown():
+    if api.Backend.ldap2.isconnected():
+        api.Backend.ldap2.disconnect()
+
+
 def upgrade_configuration():
     """
     Execute configuration upgrade of the IPA services
@@ -1718,25 +1730,14 @@ def upgrade_configuration():
 
     add_ca_dns_records()
 
-    # Any of the following functions returns True iff the named.conf file
-    # has been altered
-    named_conf_changes = (
-                          named_remove_deprecated_options(),
-                          named_set_minimum_connections(),
-                          named_update_gssapi_configuration(),
-                          named_update_pid_file(),
-                          named_enable_dnssec(),
-                          named_validate_dnssec(),
-                          named_bindkey_file_option(),
-                          named_managed_keys_dir_option(),
-                          named_root_key_include(),
-                          named_update_global_forwarder_policy(),
-                          mask_named_regular(),
-                          fix_dyndb_ldap_workdir_permissions(),
-                          named_add_server_id(),
-                         )
-
-    if any(named_conf_changes):
+    # Steps touching different configuration are independent and are
+    # executed concurrently, steps locking the same resource run in the
+    # order in which they are listed. Any of the steps returns True iff the
+    # configuration has been altered and the service needs to be restarted.
+    scheduler = StepScheduler(thread_setup=_upgrade_thread_setup,
+                              thread_teardown=_upgrade_thread_teardown)
+
+    def restart_named():
         # configuration has changed, restart the name server
         root_logger.info('Changes to named.conf have been made, restart named')
         bind = bindinstance.BindInstance(fstore)
@@ -1746,25 +1747,7 @@ def upgrade_configuration():
         except ipautil.CalledProcessError as e:
             root_logger.error("Failed to restart %s: %s", bind.service_name, e)
 
-    if bind_started:
-        bind.stop()
-
-    custodia = custodiainstance.CustodiaInstance(api.env.host, api.env.realm)
-    custodia.upgrade_instance()
-
-    ca_restart = any([
-        ca_restart,
-        ca_upgrade_schema(ca),
-        upgrade_ca_audit_cert_validity(ca),
-        certificate_renewal_update(ca, ds, http),
-        ca_enable_pkix(ca),
-        ca_configure_profiles_acl(ca),
-        ca_configure_lightweight_ca_acls(ca),
-        ca_ensure_lightweight_cas_container(ca),
-        ca_add_default_ocsp_uri(ca),
-    ])
-
-    if ca_restart:
+    def restart_pki_tomcat():
         root_logger.info(
             'pki-tomcat configuration changed, restart pki-tomcat')
         try:
@@ -1772,6 +1755,65 @@ def upgrade_configuration():
         except ipautil.CalledProcessError as e:
             root_logger.error("Failed to restart %s: %s", ca.service_name, e)
 
+    scheduler.add_restart_handler('named', restart_named)
+    scheduler.add_restart_handler('pki-tomcat', restart_pki_tomcat)
+
+    for step in (named_remove_deprecated_options,
+                 named_set_minimum_connections,
+                 named_update_gssapi_configuration,
+                 named_update_pid_file,
+                 named_enable_dnssec,
+                 named_validate_dnssec,
+                 named_bindkey_file_option,
+                 named_managed_keys_dir_option,
+                 named_root_key_include,
+                 named_update_global_forwarder_policy,
+                 mask_named_regular,
+                 fix_dyndb_ldap_workdir_permissions,
+                 named_add_server_id):
+        scheduler.step(step.__name__, step,
+                       locks=['named.conf'], restarts=['named'])
+
+    custodia = custodiainstance.CustodiaInstance(api.env.host, api.env.realm)
+    scheduler.step('custodia_upgrade_instance', custodia.upgrade_instance,
+                   locks=['custodia'])
+
+    if ca_restart:
+        scheduler.request_restart('pki-tomcat')
+
+    scheduler.step('ca_upgrade_schema', ca_upgrade_schema, ca,
+                   locks=['cn=schema'], restarts=['pki-tomcat'])
+    scheduler.step('upgrade_ca_audit_cert_validity',
+                   upgrade_ca_audit_cert_validity, ca,
+                   locks=['CS.cfg'], restarts=['pki-tomcat'])
+    scheduler.step('certificate_renewal_update',
+                   certificate_renewal_update, ca, ds, http,
+                   locks=['CS.cfg', 'certmonger'], restarts=['pki-tomcat'])
+    scheduler.step('ca_enable_pkix', ca_enable_pkix, ca,
+                   locks=['CS.cfg'], restarts=['pki-tomcat'])
+    scheduler.step('ca_configure_profiles_acl', ca_configure_profiles_acl, ca,
+                   requires=['ca_upgrade_schema'],
+                   locks=['o=ipaca'], restarts=['pki-tomcat'])
+    scheduler.step('ca_configure_lightweight_ca_acls',
+                   ca_configure_lightweight_ca_acls, ca,
+                   requires=['ca_upgrade_schema'],
+                   locks=['o=ipaca'], restarts=['pki-tomcat'])
+    scheduler.step('ca_ensure_lightweight_cas_container',
+                   ca_ensure_lightweight_cas_container, ca,
+                   requires=['ca_upgrade_schema'],
+                   locks=['o=ipaca'], restarts=['pki-tomcat'])
+    scheduler.step('ca_add_default_ocsp_uri', ca_add_default_ocsp_uri, ca,
+                   locks=['CS.cfg'], restarts=['pki-tomcat'])
+
+    scheduler.run()
+    for name, elapsed in sorted(scheduler.timings.items(),
+                                key=lambda t: t[1], reverse=True):
+        root_logger.debug('Upgrade step %s took %.3f seconds', name, elapsed)
+        timing.record('upgrade', name, elapsed)
+
+    if bind_started:
+        bind.stop()
+
     ca_enable_ldap_profile_subsystem(ca)
 
     # This step MUST be done after ca_enable_ldap_profile_subsystem and
@@ -1883,3 +1925,5 @@ def upgrade():
     root_logger.info('Upgrading the configuration of the IPA services')
     upgrade_configuration()
     root_logger.info('The IPA services were upgraded')
+
+    timing.write_summary(paths.IPAUPGRADE_TIMINGS, 'ipa-server-upgrade')
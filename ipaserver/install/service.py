@@ -21,7 +21,6 @@ import sys
 import os
 import pwd
 import socket
-import datetime
 import traceback
 import tempfile
 
@@ -35,6 +34,7 @@ from ipapython import kerberos
 from ipalib import api, errors
 from ipaplatform import services
 from ipaplatform.paths import paths
+from ipaserver.install import timing
 
 
 if six.PY3:
@@ -59,6 +59,23 @@ SERVICE_LIST = {
     'DNSKeySync': ('ipa-dnskeysyncd', 110),
 }
 
+# Services which have to be running before a service is started, all
+# services require the directory server. Services which do not depend on
+# each other are started and stopped concurrently by ipactl.
+SERVICE_DEPENDENCIES = {
+    'kadmin': ('krb5kdc',),
+    'named': ('krb5kdc',),
+    'httpd': ('krb5kdc',),
+    'ipa-custodia': ('krb5kdc',),
+    'pki-tomcatd': ('krb5kdc',),
+    'smb': ('krb5kdc',),
+    'winbind': ('smb',),
+    'ipa-otpd': ('krb5kdc',),
+    'ipa-ods-exporter': ('krb5kdc',),
+    'ods-enforcerd': ('ipa-ods-exporter',),
+    'ipa-dnskeysyncd': ('named', 'ods-enforcerd'),
+}
+
 def print_msg(message, output_fd=sys.stdout):
     root_logger.debug(message)
     output_fd.write(message)
@@ -409,11 +426,8 @@ class Service(object):
 
         def run_step(message, method):
             self.print_msg(message)
-            s = datetime.datetime.now()
-            method()
-            e = datetime.datetime.now()
-            d = e - s
-            root_logger.debug("  duration: %d seconds" % d.seconds)
+            with timing.timed_step(self.service_name, message.strip()):
+                method()
 
         step = 0
         steps_iter = iter(self.steps)
@@ -0,0 +1,200 @@
+#
+# Copyright (C) 2017  FreeIPA Contributors see COPYING for license
+#
+
+"""
+Timing and profiling of installer and upgrade steps
+
+Every step executed by `Service.start_creation` is timed.  The wall clock
+time, the CPU time of the thread executing the step and the CPU time of the
+subprocesses it waited for are recorded and written as a JSON summary at
+the end of the installation or upgrade.
+
+Steps executed by a `StepScheduler` worker run concurrently with other
+steps.  The CPU time of subprocesses can only be measured for the whole
+process, so it is not recorded for them, and neither is the CPU time of
+the step unless the platform measures it per thread.
+
+When the IPA_STEP_PROFILE environment variable names a directory, each step
+is also profiled with cProfile and its statistics are stored in that
+directory, one file per step.
+"""
+
+import contextlib
+import cProfile
+import json
+import os
+import re
+import resource
+import threading
+import time
+
+import six
+
+from ipapython.ipa_log_manager import root_logger
+from ipapython.version import VERSION
+
+PROFILE_ENV = 'IPA_STEP_PROFILE'
+
+# not available in Python 2 and on platforms other than Linux
+_RUSAGE_THREAD = getattr(resource, 'RUSAGE_THREAD', None)
+
+_lock = threading.Lock()
+_timings = []
+_start = time.time()
+
+
+class StepTiming(object):
+    """
+    Resources consumed by a single step
+
+    :param service: name of the service the step belongs to
+    :param step: description of the step
+    :param wall: wall clock time in seconds
+    :param cpu: CPU time of the thread executing the step in seconds
+    :param subprocess_cpu: CPU time of finished subprocesses in seconds
+    :param failed: whether the step raised an exception
+    """
+    def __init__(self, service, step, wall, cpu=None, subprocess_cpu=None,
+                 failed=False):
+        self.service = service
+        self.step = step
+        self.wall = wall
+        self.cpu = cpu
+        self.subprocess_cpu = subprocess_cpu
+        self.failed = failed
+
+    def as_dict(self):
+        return dict(
+            service=self.service,
+            step=self.step,
+            wall=round(self.wall, 3),
+            cpu=None if self.cpu is None else round(self.cpu, 3),
+            subprocess_cpu=(None if self.subprocess_cpu is None
+                            else round(self.subprocess_cpu, 3)),
+            failed=self.failed,
+        )
+
+
+def record(service, step, wall, cpu=None, subprocess_cpu=None,
+           failed=False):
+    timing = StepTiming(service, step, wall, cpu, subprocess_cpu, failed)
+    with _lock:
+        _timings.append(timing)
+    return timing
+
+
+def get_timings():
+    with _lock:
+        return list(_timings)
+
+
+def _in_main_thread():
+    if six.PY2:
+        return isinstance(threading.current_thread(), threading._MainThread)
+    return threading.current_thread() is threading.main_thread()
+
+
+def _cpu_times():
+    """
+    Return CPU time of the calling thread and CPU time of finished
+    subprocesses, either is None when it can't be attributed to the thread
+    """
+    main_thread = _in_main_thread()
+    if _RUSAGE_THREAD is not None:
+        usage = resource.getrusage(_RUSAGE_THREAD)
+        cpu = usage.ru_utime + usage.ru_stime
+    elif main_thread:
+        cpu = sum(os.times()[:2])
+    else:
+        cpu = None
+    if main_thread:
+        usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+        subprocess_cpu = usage.ru_utime + usage.ru_stime
+    else:
+        subprocess_cpu = None
+    return cpu, subprocess_cpu
+
+
+def _elapsed(start, end):
+    if start is None or end is None:
+        return None
+    return end - start
+
+
+def _format_seconds(seconds):
+    if seconds is None:
+        return 'n/a'
+    return '%.3f' % seconds
+
+
+def _profile_filename(directory, service, step):
+    with _lock:
+        index = len(_timings) + 1
+    name = re.sub(r'[^A-Za-z0-9_.-]+', '_', '%s-%s' % (service, step))
+    return os.path.join(directory, '%03d-%s.prof' % (index, name[:100]))
+
+
+@contextlib.contextmanager
+def timed_step(service, step):
+    """
+    Time the code executed in the context and record it as a step
+    """
+    profile_dir = os.environ.get(PROFILE_ENV)
+    profiler = None
+    if profile_dir:
+        profiler = cProfile.Profile()
+
+    start_wall = time.time()
+    start_cpu, start_subprocess_cpu = _cpu_times()
+    failed = True
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield
+        failed = False
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        end_cpu, end_subprocess_cpu = _cpu_times()
+        wall = time.time() - start_wall
+        cpu = _elapsed(start_cpu, end_cpu)
+        subprocess_cpu = _elapsed(start_subprocess_cpu, end_subprocess_cpu)
+
+        if profiler is not None:
+            filename = _profile_filename(profile_dir, service, step)
+            try:
+                profiler.dump_stats(filename)
+            except (IOError, OSError) as e:
+                root_logger.debug("Failed to write profile %s: %s",
+                                  filename, e)
+
+        record(service, step, wall, cpu, subprocess_cpu, failed)
+        root_logger.debug("  duration: %d seconds (cpu %s, subprocesses %s)",
+                          wall, _format_seconds(cpu),
+                          _format_seconds(subprocess_cpu))
+
+
+def write_summary(filename, command):
+    """
+    Write the recorded step timings as JSON to filename
+    """
+    timings = get_timings()
+    summary = dict(
+        command=command,
+        version=VERSION,
+        start=_start,
+        wall=round(time.time() - _start, 3),
+        steps=[t.as_dict() for t in timings],
+    )
+
+    try:
+        with open(filename, 'w') as f:
+            json.dump(summary, f, indent=2, sort_keys=True)
+    except (IOError, OSError) as e:
+        root_logger.warning("Failed to write step timings to %s: %s",
+                            filename, e)
+        return
+
+    root_logger.debug("Step timings of %d steps written to %s",
+                      len(timings), filename)
@@ -30,6 +30,7 @@ import six
 from ipalib import api, crud, errors
 from ipalib import Method, Object
 from ipalib import Flag, Int, Str
+from ipalib.parameters import Dict
 from ipalib.cli import to_cli
 from ipalib import output
 from ipalib.text import _
@@ -1138,6 +1139,57 @@ class LDAPCreate(BaseLDAPCommand, crud.Create):
     def execute(self, *keys, **options):
         ldap = self.obj.backend
 
+        entry_attrs, attrs_list = self._prepare_entry(ldap, *keys, **options)
+
+        try:
+            self._exc_wrapper(keys, options, ldap.add_entry)(entry_attrs)
+        except (errors.NotFound, errors.DuplicateEntry) as e:
+            self._handle_add_error(e, *keys)
+
+        try:
+            if self.obj.rdn_attribute:
+                # make sure objectclass is either set or None
+                if self.obj.object_class:
+                    object_class = self.obj.object_class
+                else:
+                    object_class = None
+                entry_attrs = self._exc_wrapper(keys, options, ldap.find_entry_by_attr)(
+                    self.obj.primary_key.name, keys[-1], object_class, attrs_list,
+                    DN(self.obj.container_dn, api.env.basedn)
+                )
+            else:
+                entry_attrs = self._exc_wrapper(keys, options, ldap.get_entry)(
+                    entry_attrs.dn, attrs_list)
+        except errors.NotFound:
+            self.obj.handle_not_found(*keys)
+
+        self.obj.get_indirect_members(entry_attrs, attrs_list)
+
+        for callback in self.get_callbacks('post'):
+            entry_attrs.dn = callback(
+                self, ldap, entry_attrs.dn, entry_attrs, *keys, **options)
+
+        self.obj.convert_attribute_members(entry_attrs, *keys, **options)
+
+        dn = entry_attrs.dn
+        entry_attrs = entry_to_dict(entry_attrs, **options)
+        entry_attrs['dn'] = dn
+
+        if self.obj.primary_key:
+            pkey = keys[-1]
+        else:
+            pkey = None
+
+        return dict(result=entry_attrs, value=pkey_to_value(pkey, options))
+
+    def _prepare_entry(self, ldap, *keys, **options):
+        """
+        Build the entry to be created from keys and options and call the pre
+        callbacks.
+
+        Return the entry and the list of attributes to retrieve once it was
+        added.
+        """
         dn = self.obj.get_dn(*keys, **options)
         entry_attrs = ldap.make_entry(
             dn, self.args_options_2_entry(*keys, **options))
@@ -1184,9 +1236,13 @@ class LDAPCreate(BaseLDAPCommand, crud.Create):
         _check_limit_object_class(self.api.Backend.ldap2.schema.attribute_types(self.obj.limit_object_classes), list(entry_attrs), allow_only=True)
         _check_limit_object_class(self.api.Backend.ldap2.schema.attribute_types(self.obj.disallow_object_classes), list(entry_attrs), allow_only=False)
 
-        try:
-            self._exc_wrapper(keys, options, ldap.add_entry)(entry_attrs)
-        except errors.NotFound:
+        return entry_attrs, attrs_list
+
+    def _handle_add_error(self, error, *keys):
+        """
+        Raise the error to report when adding the entry failed with error
+        """
+        if isinstance(error, errors.NotFound):
             parent = self.obj.parent_object
             if parent:
                 raise errors.NotFound(
@@ -1200,55 +1256,253 @@ class LDAPCreate(BaseLDAPCommand, crud.Create):
                     'container': self.obj.container_dn,
                 }
             )
-        except errors.DuplicateEntry:
+        if isinstance(error, errors.DuplicateEntry):
             self.obj.handle_duplicate_entry(*keys)
+        raise error
 
-        try:
-            if self.obj.rdn_attribute:
-                # make sure objectclass is either set or None
-                if self.obj.object_class:
-                    object_class = self.obj.object_class
-                else:
-                    object_class = None
-                entry_attrs = self._exc_wrapper(keys, options, ldap.find_entry_by_attr)(
-                    self.obj.primary_key.name, keys[-1], object_class, attrs_list,
-                    DN(self.obj.container_dn, api.env.basedn)
-                )
-            else:
-                entry_attrs = self._exc_wrapper(keys, options, ldap.get_entry)(
-                    entry_attrs.dn, attrs_list)
-        except errors.NotFound:
-            self.obj.handle_not_found(*keys)
+    def pre_callback(self, ldap, dn, entry_attrs, attrs_list, *keys, **options):
+        assert isinstance(dn, DN)
+        return dn
 
-        self.obj.get_indirect_members(entry_attrs, attrs_list)
+    def post_callback(self, ldap, dn, entry_attrs, *keys, **options):
+        assert isinstance(dn, DN)
+        return dn
+
+    def exc_callback(self, keys, options, exc, call_func, *call_args, **call_kwargs):
+        raise exc
+
+
+class BulkItem(object):
+    """
+    A single entry handled by `LDAPBulkCreate` or `LDAPBulkDelete`
+    """
+    def __init__(self, keys, options, dn, result, entry_attrs=None):
+        self.keys = keys
+        self.options = options
+        self.dn = dn
+        self.result = result
+        self.entry_attrs = entry_attrs
+
+
+class LDAPBulkCommand(BaseLDAPCommand):
+    """
+    Base class for commands which handle many entries at once.
+
+    The result holds the status of every entry, the failure of one entry
+    does not stop the others from being processed.
+    """
+    NO_CLI = True
+
+    def _set_error(self, result, error):
+        if not isinstance(error, errors.PublicError):
+            self.log.error('%s: %s: %s', self.name, type(error).__name__,
+                           error)
+            error = errors.InternalError()
+        result.update(
+            error=error.strerror,
+            error_code=error.errno,
+            error_name=unicode(type(error).__name__),
+            error_kw=error.kw,
+        )
+
+
+class LDAPBulkCreate(LDAPBulkCommand):
+    """
+    Create many new entries in LDAP at once.
+
+    Every item of the entries argument holds the arguments and options of
+    create_command for a single entry. All items are validated and their
+    entries built before any of them is added, the entries are then added
+    with pipelined LDAP requests. The added entries are not read back, the
+    result holds the primary key and the DN of every entry or the error
+    which prevented it from being added.
+
+    The post_callback of create_command is replaced by the post callbacks
+    of the bulk command, which get all the added entries at once. Other
+    post callbacks registered on create_command are then called for every
+    added entry.
+    """
+    create_command = None
+    add_window = 100
+
+    takes_args = (
+        Dict('entries+',
+            doc=_('Arguments and options of the entries to add'),
+        ),
+    )
+
+    has_output = (
+        output.Output('count', int, doc=_('Number of entries added')),
+        output.Output('results', (list, tuple), doc=_('Status of every entry')),
+    )
+
+    def _prepare_item(self, command, item, version):
+        """
+        Convert and validate the arguments and options of a single item
+        the same way as when command is called
+        """
+        options = dict((str(k), v) for k, v in item.items())
+        args = [options.pop(arg.name, None) for arg in command.args()]
+        options.setdefault('version', version)
+        params = command.args_options_2_params(*args, **options)
+        params.update(command.get_default(**params))
+        params = command.normalize(**params)
+        params = command.convert(**params)
+        command.validate(**params)
+        return command.params_2_args_options(**params)
+
+    def execute(self, entries, **options):
+        ldap = self.obj.backend
+        command = self.api.Command[self.create_command]
+
+        results = []
+        items = []
+        for item in entries:
+            result = dict(value=None, dn=None, error=None)
+            results.append(result)
+            try:
+                keys, item_options = self._prepare_item(
+                    command, item, options['version'])
+                result['value'] = pkey_to_unicode(keys[-1])
+                entry_attrs, _attrs_list = command._prepare_entry(
+                    ldap, *keys, **item_options)
+            except Exception as e:
+                self._set_error(result, e)
+                continue
+            result['dn'] = unicode(entry_attrs.dn)
+            items.append(BulkItem(keys, item_options, entry_attrs.dn, result,
+                                  entry_attrs))
+
+        failures = ldap.add_entries([item.entry_attrs for item in items],
+                                    window=self.add_window)
+        added = []
+        for item, error in zip(items, failures):
+            if error is None:
+                added.append(item)
+                continue
+            try:
+                command._handle_add_error(error, *item.keys)
+            except Exception as e:
+                self._set_error(item.result, e)
 
         for callback in self.get_callbacks('post'):
-            entry_attrs.dn = callback(
-                self, ldap, entry_attrs.dn, entry_attrs, *keys, **options)
+            callback(self, ldap, added, **options)
 
-        self.obj.convert_attribute_members(entry_attrs, *keys, **options)
+        own_callback = getattr(type(command), 'post_callback', None)
+        callbacks = [callback for callback in command.get_callbacks('post')
+                     if callback != own_callback]
+        if callbacks:
+            for item in added:
+                try:
+                    for callback in callbacks:
+                        item.dn = callback(
+                            command, ldap, item.dn, item.entry_attrs,
+                            *item.keys, **item.options)
+                except Exception as e:
+                    self._set_error(item.result, e)
 
-        dn = entry_attrs.dn
-        entry_attrs = entry_to_dict(entry_attrs, **options)
-        entry_attrs['dn'] = dn
+        return dict(count=len(added), results=results)
+
+    def post_callback(self, ldap, added, **options):
+        """
+        Finish the creation of the added entries, a list of `BulkItem`
+        """
+
+
+class LDAPBulkDelete(LDAPBulkCommand):
+    """
+    Delete many LDAP entries at once.
+
+    The pre callbacks get all the entries to delete as a list of `BulkItem`
+    so that their dependent objects can be looked up and cleaned up with
+    bulk queries. Items with an error set in their result by a pre callback
+    are not deleted. The remaining entries are deleted with pipelined LDAP
+    requests, the result holds the primary key and the DN of every entry
+    or the error which prevented it from being deleted.
+    """
+    delete_window = 100
 
+    has_output = (
+        output.Output('count', int, doc=_('Number of entries deleted')),
+        output.Output('results', (list, tuple), doc=_('Status of every entry')),
+    )
+
+    def get_args(self):
+        for key in self.obj.get_ancestor_primary_keys():
+            yield key
         if self.obj.primary_key:
-            pkey = keys[-1]
-        else:
-            pkey = None
+            # Don't enforce rules on the primary key so we can reference
+            # any stored entry, legal or not
+            yield self.obj.primary_key.clone(attribute=True, query=True,
+                                             multivalue=True)
+        for arg in super(LDAPBulkDelete, self).get_args():
+            yield arg
 
-        return dict(result=entry_attrs, value=pkey_to_value(pkey, options))
+    def get_item_dn(self, *keys, **options):
+        """
+        Return the DN of the entry with the given keys
+        """
+        return self.obj.get_dn(*keys, **options)
 
-    def pre_callback(self, ldap, dn, entry_attrs, attrs_list, *keys, **options):
-        assert isinstance(dn, DN)
-        return dn
+    def execute(self, *keys, **options):
+        ldap = self.obj.backend
 
-    def post_callback(self, ldap, dn, entry_attrs, *keys, **options):
-        assert isinstance(dn, DN)
-        return dn
+        results = []
+        items = []
+        for pkey in keys[-1]:
+            nkeys = keys[:-1] + (pkey, )
+            result = dict(value=pkey_to_unicode(pkey), dn=None, error=None)
+            results.append(result)
+            try:
+                dn = self.get_item_dn(*nkeys, **options)
+            except Exception as e:
+                self._set_error(result, e)
+                continue
+            assert isinstance(dn, DN)
+            result['dn'] = unicode(dn)
+            items.append(BulkItem(nkeys, options, dn, result))
 
-    def exc_callback(self, keys, options, exc, call_func, *call_args, **call_kwargs):
-        raise exc
+        for callback in self.get_callbacks('pre'):
+            callback(self, ldap, items, **options)
+        items = [item for item in items if item.result['error'] is None]
+
+        failures = ldap.delete_entries([item.dn for item in items],
+                                       window=self.delete_window)
+        deleted = []
+        for item, error in zip(items, failures):
+            if isinstance(error, errors.NotAllowedOnNonLeaf):
+                # this entry is not a leaf entry, delete all child nodes
+                try:
+                    ldap.delete_subtree(item.dn)
+                except errors.PublicError as e:
+                    error = e
+                else:
+                    error = None
+            if error is None:
+                deleted.append(item)
+                continue
+            try:
+                if isinstance(error, errors.NotFound):
+                    self.obj.handle_not_found(*item.keys)
+                raise error
+            except Exception as e:
+                self._set_error(item.result, e)
+
+        for callback in self.get_callbacks('post'):
+            callback(self, ldap, deleted, **options)
+
+        return dict(count=len(deleted), results=results)
+
+    def pre_callback(self, ldap, items, **options):
+        """
+        Prepare the deletion of items, a list of `BulkItem`. Set an error
+        in the result of an item to keep its entry from being deleted.
+        """
+
+    def post_callback(self, ldap, deleted, **options):
+        """
+        Finish the deletion of the deleted entries, a list of `BulkItem`
+        """
 
 
 class LDAPQuery(BaseLDAPCommand, crud.PKQuery):
@@ -1532,24 +1786,6 @@ class LDAPDelete(LDAPMultiQuery):
                 dn = callback(self, ldap, dn, *nkeys, **options)
                 assert isinstance(dn, DN)
 
-            def delete_subtree(base_dn):
-                assert isinstance(base_dn, DN)
-                truncated = True
-                while truncated:
-                    try:
-                        (subentries, truncated) = ldap.find_entries(
-                            None, [''], base_dn, ldap.SCOPE_ONELEVEL
-                        )
-                    except errors.NotFound:
-                        break
-                    else:
-                        for entry_attrs in subentries:
-                            delete_subtree(entry_attrs.dn)
-                try:
-                    self._exc_wrapper(nkeys, options, ldap.delete_entry)(base_dn)
-                except errors.NotFound:
-                    self.obj.handle_not_found(*nkeys)
-
             try:
                 self._exc_wrapper(nkeys, options, ldap.delete_entry)(dn)
             except errors.NotFound:
@@ -1558,7 +1794,10 @@ class LDAPDelete(LDAPMultiQuery):
                 if not self.subtree_delete:
                     raise
                 # this entry is not a leaf entry, delete all child nodes
-                delete_subtree(dn)
+                try:
+                    self._exc_wrapper(nkeys, options, ldap.delete_subtree)(dn)
+                except errors.NotFound:
+                    self.obj.handle_not_found(*nkeys)
 
             for callback in self.get_callbacks('post'):
                 result = callback(self, ldap, dn, *nkeys, **options)
@@ -1681,20 +1920,22 @@ class LDAPAddMember(LDAPModMember):
         completed = 0
         for (attr, objs) in member_dns.items():
             for ldap_obj_name in objs:
+                m_dns = []
                 for m_dn in member_dns[attr][ldap_obj_name]:
                     assert isinstance(m_dn, DN)
-                    if not m_dn:
-                        continue
-                    try:
-                        ldap.add_entry_to_group(m_dn, dn, attr, allow_same=self.allow_same)
-                    except errors.PublicError as e:
-                        ldap_obj = self.api.Object[ldap_obj_name]
-                        failed[attr][ldap_obj_name].append((
-                            ldap_obj.get_primary_key_from_dn(m_dn),
-                            unicode(e),)
-                        )
-                    else:
-                        completed += 1
+                    if m_dn:
+                        m_dns.append(m_dn)
+                if not m_dns:
+                    continue
+                ldap_obj = self.api.Object[ldap_obj_name]
+                errs = ldap.add_entries_to_group(
+                    m_dns, dn, attr, allow_same=self.allow_same)
+                for m_dn, e in errs:
+                    failed[attr][ldap_obj_name].append((
+                        ldap_obj.get_primary_key_from_dn(m_dn),
+                        unicode(e),)
+                    )
+                completed += len(m_dns) - len(errs)
 
         if options.get('all', False):
             attrs_list = ['*'] + self.obj.default_attributes
@@ -1781,18 +2022,17 @@ class LDAPRemoveMember(LDAPModMember):
             for ldap_obj_name, m_dns in objs.items():
                 for m_dn in m_dns:
                     assert isinstance(m_dn, DN)
-                    if not m_dn:
-                        continue
-                    try:
-                        ldap.remove_entry_from_group(m_dn, dn, attr)
-                    except errors.PublicError as e:
-                        ldap_obj = self.api.Object[ldap_obj_name]
-                        failed[attr][ldap_obj_name].append((
-                            ldap_obj.get_primary_key_from_dn(m_dn),
-                            unicode(e),)
-                        )
-                    else:
-                        completed += 1
+                m_dns = [m_dn for m_dn in m_dns if m_dn]
+                if not m_dns:
+                    continue
+                ldap_obj = self.api.Object[ldap_obj_name]
+                errs = ldap.remove_entries_from_group(m_dns, dn, attr)
+                for m_dn, e in errs:
+                    failed[attr][ldap_obj_name].append((
+                        ldap_obj.get_primary_key_from_dn(m_dn),
+                        unicode(e),)
+                    )
+                completed += len(m_dns) - len(errs)
 
         if options.get('all', False):
             attrs_list = ['*'] + self.obj.default_attributes
@@ -53,7 +53,7 @@ from ipalib.frontend import Local
 from ipalib.parameters import Str, Dict
 from ipalib.output import Output
 from ipalib.text import _
-from ipalib.request import context
+from ipalib.request import context, params_record
 from ipalib.plugable import Registry
 from ipapython.version import API_VERSION
 
@@ -110,21 +110,34 @@ class batch(Command):
                 # to the client
                 try:
                     a, kw = arg['params']
+                    a = tuple(a)
                     newkw = dict((str(k), v) for k, v in kw.items())
-                    params = api.Command[name].args_options_2_params(
-                        *a, **newkw)
                 except (AttributeError, ValueError, TypeError):
                     raise errors.ConversionError(
                         name='params',
                         error=_(u'must contain a tuple (list, dict)'))
                 newkw.setdefault('version', options['version'])
 
-                result = api.Command[name](*a, **newkw)
+                # the params converted by the command are reused for logging
+                with params_record() as record:
+                    try:
+                        result = api.Command[name](*a, **newkw)
+                    finally:
+                        params = record.params
+                        if params is None:
+                            # the command failed before converting its
+                            # params, e.g. when checking the version
+                            command = api.Command[name]
+                            try:
+                                params = command.args_options_2_params(
+                                    *a, **newkw)
+                            except Exception:
+                                params = dict()
                 self.info(
                     '%s: batch: %s(%s): SUCCESS',
                     getattr(context, 'principal', 'UNKNOWN'),
                     name,
-                    ', '.join(api.Command[name]._repr_iter(**params))
+                    api.Command[name]._repr_params(params)
                 )
                 result['error']=None
             except Exception as e:
@@ -139,7 +152,7 @@ class batch(Command):
                     self.info(
                         '%s: batch: %s(%s): %s',
                         context.principal, name,  # pylint: disable=no-member
-                        ', '.join(api.Command[name]._repr_iter(**params)),
+                        api.Command[name]._repr_params(params),
                         e.__class__.__name__
                     )
                 if isinstance(e, errors.PublicError):
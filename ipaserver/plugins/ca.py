@@ -3,6 +3,9 @@
 #
 
 import base64
+import calendar
+import threading
+import time
 
 from ipalib import api, errors, output, Bytes, DNParam, Flag, Str
 from ipalib.constants import IPA_CA_CN
@@ -159,6 +162,50 @@ class ca(LDAPObject):
     }
 
 
+# Certificates and chains of CAs read from Dogtag, keyed by CA id and kind
+# ('cert' or 'chain'). They only change when a CA certificate is renewed,
+# which may happen in another process, so they are kept for at most
+# CA_CERT_CACHE_TTL seconds and never after a certificate expired. ca-mod and
+# ca-del drop the cached certificate and chain of the CA.
+CA_CERT_CACHE_TTL = 600
+_ca_cert_cache = {}
+_ca_cert_cache_lock = threading.Lock()
+
+
+def _get_cached_ca_data(ca_id, kind):
+    with _ca_cert_cache_lock:
+        try:
+            data, valid_until = _ca_cert_cache[ca_id, kind]
+        except KeyError:
+            return None
+        if time.time() >= valid_until:
+            del _ca_cert_cache[ca_id, kind]
+            return None
+        return data
+
+
+def _cache_ca_data(ca_id, kind, data, ders):
+    valid_until = time.time() + CA_CERT_CACHE_TTL
+    for der in ders:
+        cert = x509.load_certificate(der, x509.DER)
+        valid_until = min(
+            valid_until, calendar.timegm(cert.not_valid_after.utctimetuple()))
+    with _ca_cert_cache_lock:
+        _ca_cert_cache[ca_id, kind] = (data, valid_until)
+
+
+def invalidate_ca_cache(ca_id=None):
+    """
+    Forget the cached certificate and chain of CA ca_id or of all CAs
+    """
+    with _ca_cert_cache_lock:
+        if ca_id is None:
+            _ca_cert_cache.clear()
+        else:
+            _ca_cert_cache.pop((ca_id, 'cert'), None)
+            _ca_cert_cache.pop((ca_id, 'chain'), None)
+
+
 def set_certificate_attrs(entry, options, want_cert=True):
     try:
         ca_id = entry['ipacaid'][0]
@@ -171,16 +218,30 @@ def set_certificate_attrs(entry, options, want_cert=True):
     if not want_data:
         return
 
-    with api.Backend.ra_lightweight_ca as ca_api:
-        if want_cert or full:
-            der = ca_api.read_ca_cert(ca_id)
-            entry['certificate'] = base64.b64encode(der).decode('ascii')
+    der = ders = None
+    if want_cert or full:
+        der = _get_cached_ca_data(ca_id, 'cert')
+    if want_chain or full:
+        ders = _get_cached_ca_data(ca_id, 'chain')
+    read_cert = (want_cert or full) and der is None
+    read_chain = (want_chain or full) and ders is None
+
+    if read_cert or read_chain:
+        with api.Backend.ra_lightweight_ca as ca_api:
+            if read_cert:
+                der = ca_api.read_ca_cert(ca_id)
+                _cache_ca_data(ca_id, 'cert', der, [der])
+
+            if read_chain:
+                pkcs7_der = ca_api.read_ca_chain(ca_id)
+                pems = x509.pkcs7_to_pems(pkcs7_der, x509.DER)
+                ders = [x509.normalize_certificate(pem) for pem in pems]
+                _cache_ca_data(ca_id, 'chain', ders, ders)
 
-        if want_chain or full:
-            pkcs7_der = ca_api.read_ca_chain(ca_id)
-            pems = x509.pkcs7_to_pems(pkcs7_der, x509.DER)
-            ders = [x509.normalize_certificate(pem) for pem in pems]
-            entry['certificate_chain'] = ders
+    if der is not None:
+        entry['certificate'] = base64.b64encode(der).decode('ascii')
+    if ders is not None:
+        entry['certificate_chain'] = list(ders)
 
 
 @register()
@@ -292,6 +353,7 @@ class ca_del(LDAPDelete):
         with self.api.Backend.ra_lightweight_ca as ca_api:
             ca_api.disable_ca(ca_id)
             ca_api.delete_ca(ca_id)
+        invalidate_ca_cache(ca_id)
 
         return dn
 
@@ -313,6 +375,11 @@ class ca_mod(LDAPUpdate):
 
         return dn
 
+    def post_callback(self, ldap, dn, entry_attrs, *keys, **options):
+        # read the certificate from Dogtag again, e.g. after it was renewed
+        invalidate_ca_cache(entry_attrs.get('ipacaid', [None])[0])
+        return dn
+
 
 class CAQuery(LDAPQuery):
     has_output = output.standard_value
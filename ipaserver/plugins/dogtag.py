@@ -1742,6 +1742,68 @@ class ra(rabase.rabase, RestClient):
 
         return cmd_result
 
+    def revoke_certificates(self, serial_numbers, revocation_reason=0):
+        """
+        :param serial_numbers: List of certificate serial numbers, string
+                               values as for `revoke_certificate`.
+        :param revocation_reason: Integer code of revocation reason.
+
+        Revoke all valid certificates with the given serial numbers in a
+        single request. Certificates which are already revoked or expired
+        are left alone.
+
+        The command returns a dict with these possible key/value pairs.
+        Some key/value pairs may be absent.
+
+        +---------------+---------------+---------------+
+        |result name    |result type    |comments       |
+        +===============+===============+===============+
+        |revoked        |bool           |               |
+        +---------------+---------------+---------------+
+
+        """
+        self.debug('%s.revoke_certificates()', type(self).__name__)
+        if type(revocation_reason) is not int:
+            raise TypeError(TYPE_ERROR % ('revocation_reason', int, revocation_reason, type(revocation_reason)))
+
+        serial_numbers = [int(serial_number, 0)
+                          for serial_number in serial_numbers]
+        if not serial_numbers:
+            return dict(revoked=False)
+
+        record_filter = ''.join('(certRecordId=%s)' % str(serial_number)
+                                for serial_number in serial_numbers)
+        revoke_filter = '(&(certStatus=VALID)(|%s))' % record_filter
+
+        # Call CMS
+        http_status, _http_headers, http_body = \
+            self._sslget('/ca/agent/ca/doRevoke',
+                         self.env.ca_agent_port,
+                         op='revoke',
+                         revocationReason=revocation_reason,
+                         revokeAll=revoke_filter,
+                         totalRecordCount=len(serial_numbers),
+                         xml='true')
+
+        # Parse and handle errors
+        if http_status != 200:
+            self.raise_certificate_operation_error('revoke_certificates',
+                                                   detail=http_status)
+
+        parse_result = self.get_parse_result_xml(http_body, parse_revoke_cert_xml)
+        request_status = parse_result['request_status']
+        if request_status != CMS_STATUS_SUCCESS:
+            self.raise_certificate_operation_error('revoke_certificates',
+                                                   cms_request_status_to_string(request_status),
+                                                   parse_result.get('error_string'))
+
+        # Return command result
+        cmd_result = {}
+
+        cmd_result['revoked'] = parse_result.get('revoked') == 'yes'
+
+        return cmd_result
+
     def take_certificate_off_hold(self, serial_number):
         """
         :param serial_number: Certificate serial number. Must be a string value
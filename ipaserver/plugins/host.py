@@ -29,8 +29,9 @@ from ipalib import messages
 from ipalib import Str, Flag, Bytes
 from ipalib.parameters import Principal
 from ipalib.plugable import Registry
-from .baseldap import (LDAPQuery, LDAPObject, LDAPCreate,
-                                     LDAPDelete, LDAPUpdate, LDAPSearch,
+from .baseldap import (LDAPQuery, LDAPObject, LDAPBulkCreate, LDAPCreate,
+                                     LDAPBulkDelete, LDAPDelete,
+                                     LDAPUpdate, LDAPSearch,
                                      LDAPRetrieve, LDAPAddMember,
                                      LDAPRemoveMember, host_is_master,
                                      pkey_to_value, add_missing_object_class,
@@ -275,6 +276,8 @@ class host(LDAPObject):
         'userclass', 'ipaallowedtoperform', 'ipaassignedidview', 'krbprincipalauthind'
     ]
     uuid_attribute = 'ipauniqueid'
+    # number of hosts whose managed hosts are looked up in a single search
+    managed_hosts_chunk_size = 100
     attribute_members = {
         'enrolledby': ['user'],
         'memberof': ['hostgroup', 'netgroup', 'role', 'hbacrule', 'sudorule'],
@@ -590,27 +593,60 @@ class host(LDAPObject):
         return dn
 
     def get_managed_hosts(self, dn):
-        host_filter = 'managedBy=%s' % dn
-        host_attrs = ['fqdn']
+        return self.get_managed_hosts_map([dn])[dn]
+
+    def get_managed_hosts_map(self, dns):
+        """
+        Return a dict mapping every DN in dns to the list of hosts it
+        manages. The hosts are retrieved with one search per chunk of
+        managed_hosts_chunk_size DNs.
+        """
         ldap = self.api.Backend.ldap2
-        managed_hosts = []
+        managed_hosts = dict((dn, []) for dn in dns)
+        dns = list(managed_hosts)
 
-        try:
-            (hosts, _truncated) = ldap.find_entries(
-                base_dn=DN(self.container_dn, api.env.basedn),
-                filter=host_filter, attrs_list=host_attrs)
+        for i in range(0, len(dns), self.managed_hosts_chunk_size):
+            chunk = dns[i:i + self.managed_hosts_chunk_size]
+            host_filter = ldap.make_filter_from_attr(
+                'managedby', chunk, ldap.MATCH_ANY)
+            try:
+                (hosts, _truncated) = ldap.find_entries(
+                    base_dn=DN(self.container_dn, api.env.basedn),
+                    filter=host_filter, attrs_list=['managedby'],
+                    size_limit=-1)
+            except errors.NotFound:
+                continue
 
             for host in hosts:
-                managed_hosts.append(host.dn)
-        except errors.NotFound:
-            return []
+                for manager in host.get('managedby', []):
+                    if manager in managed_hosts:
+                        managed_hosts[manager].append(host.dn)
 
         return managed_hosts
 
-    def suppress_netgroup_memberof(self, ldap, entry_attrs):
+    def get_managed_netgroups(self, ldap):
+        """
+        Return the set of DNs of netgroups managed by the Managed Entries
+        plugin.
+        """
+        ng_container = DN(api.env.container_netgroup, api.env.basedn)
+        filter = ldap.make_filter({'objectclass': 'mepmanagedentry'})
+        try:
+            netgroups, _truncated = ldap.find_entries(
+                filter, [''], ng_container, ldap.SCOPE_ONELEVEL,
+                size_limit=-1)
+        except errors.NotFound:
+            return set()
+        return set(ng.dn for ng in netgroups)
+
+    def suppress_netgroup_memberof(self, ldap, entry_attrs,
+                                   managed_netgroups=None):
         """
         We don't want to show managed netgroups so remove them from the
         memberofindirect list.
+
+        managed_netgroups is the set returned by get_managed_netgroups(),
+        it is looked up only when needed if not given.
         """
         ng_container = DN(api.env.container_netgroup, api.env.basedn)
         for member in list(entry_attrs.get('memberofindirect', [])):
@@ -618,12 +654,9 @@ class host(LDAPObject):
             if not memberdn.endswith(ng_container):
                 continue
 
-            filter = ldap.make_filter({'objectclass': 'mepmanagedentry'})
-            try:
-                ldap.get_entries(memberdn, ldap.SCOPE_BASE, filter, [''])
-            except errors.NotFound:
-                pass
-            else:
+            if managed_netgroups is None:
+                managed_netgroups = self.get_managed_netgroups(ldap)
+            if memberdn in managed_netgroups:
                 entry_attrs['memberofindirect'].remove(member)
 
 
@@ -747,6 +780,47 @@ class host_add(LDAPCreate):
         return dn
 
 
+@register()
+class host_add_bulk(LDAPBulkCreate):
+    __doc__ = _('Add many new hosts.')
+
+    create_command = 'host_add'
+
+    def post_callback(self, ldap, added, **options):
+        if not added:
+            return
+
+        dns_enabled = dns_container_exists(ldap)
+        for item in added:
+            fqdn = item.keys[-1]
+            entry_attrs = item.entry_attrs
+            if dns_enabled:
+                try:
+                    parts = fqdn.split('.')
+                    host = parts[0]
+                    domain = unicode('.'.join(parts[1:]))
+
+                    if item.options.get('ip_address'):
+                        add_reverse = not item.options.get('no_reverse',
+                                                           False)
+                        add_records_for_host(DNSName(host),
+                                             DNSName(domain).make_absolute(),
+                                             item.options['ip_address'],
+                                             add_forward=True,
+                                             add_reverse=add_reverse)
+
+                    update_sshfp_record(domain, unicode(host), entry_attrs)
+                except Exception as e:
+                    self._set_error(item.result, errors.NonFatalError(
+                        reason=_('The host was added but the DNS update '
+                                 'failed with: %(exc)s') % dict(exc=e)))
+
+            if item.options.get('random', False):
+                password = entry_attrs.single_value.get('userpassword')
+                if password is not None:
+                    item.result['randompassword'] = unicode(password)
+
+
 @register()
 class host_del(LDAPDelete):
     __doc__ = _('Delete a host.')
@@ -844,6 +918,278 @@ class host_del(LDAPDelete):
         return dn
 
 
+@register()
+class host_del_bulk(LDAPBulkDelete):
+    __doc__ = _('Delete many hosts.')
+
+    takes_options = (
+        Flag('updatedns?',
+            doc=_('Remove A, AAAA, SSHFP and PTR records of the hosts '
+                  'managed by IPA DNS'),
+            default=False,
+        ),
+    )
+
+    # number of hosts handled by a single search or revocation request
+    chunk_size = 100
+
+    def get_item_dn(self, *keys, **options):
+        if hostname_validator(None, keys[-1]) is not None:
+            # not a fqdn, find it
+            return self.obj.get_dn(*keys, **options)
+        return super(host, self.obj).get_dn(*keys, **options)
+
+    def _find_entries(self, ldap, attr, values, attrs_list, base_dn,
+                      scope=None, exact=True):
+        """
+        Find the entries whose attr matches any of values, with one search
+        per chunk of chunk_size values.
+        """
+        if scope is None:
+            scope = ldap.SCOPE_SUBTREE
+        entries = []
+        for i in range(0, len(values), self.chunk_size):
+            chunk = values[i:i + self.chunk_size]
+            filter = ldap.make_filter_from_attr(
+                attr, chunk, ldap.MATCH_ANY, exact=exact)
+            try:
+                result, _truncated = ldap.find_entries(
+                    filter, attrs_list, base_dn, scope, size_limit=-1)
+            except errors.NotFound:
+                continue
+            entries.extend(result)
+        return entries
+
+    def _pending(self, hosts):
+        return [fqdn for fqdn, item in hosts.items()
+                if item.result['error'] is None]
+
+    def _check_masters(self, ldap, hosts):
+        masters_dn = DN(api.env.container_masters, api.env.basedn)
+        try:
+            masters, _truncated = ldap.find_entries(
+                '(objectclass=*)', ['cn'], masters_dn, ldap.SCOPE_ONELEVEL,
+                size_limit=-1)
+        except errors.NotFound:
+            return
+        for master in masters:
+            item = hosts.get(master.single_value['cn'].lower())
+            if item is not None:
+                self._set_error(item.result, errors.ValidationError(
+                    name='hostname',
+                    error=_('An IPA master host cannot be deleted or '
+                            'disabled')))
+
+    def _get_services(self, ldap, hosts):
+        """
+        Return a dict mapping the fqdn of every host to the list of its
+        service entries.
+        """
+        services = {}
+        entries = self._find_entries(
+            ldap, 'krbprincipalname',
+            [u'/%s@' % fqdn for fqdn in self._pending(hosts)],
+            ['krbprincipalname', 'usercertificate'],
+            DN(api.env.container_service, api.env.basedn),
+            exact=False)
+        for entry in entries:
+            principal = kerberos.Principal(entry['krbprincipalname'][0])
+            fqdn = principal.hostname.lower()
+            if fqdn in hosts:
+                services.setdefault(fqdn, []).append(entry)
+        return services
+
+    def _get_certificates(self, ldap, hosts, services):
+        """
+        Return a dict mapping the fqdn of every host to the list of the
+        serial numbers and CA names of the certificates of the host and
+        its services. Certificates which were not issued by an IPA CA are
+        left out, they cannot be revoked by IPA.
+        """
+        cas = {}
+        try:
+            ca_entries, _truncated = ldap.find_entries(
+                '(objectclass=ipaca)', ['cn', 'ipacasubjectdn'],
+                DN(api.env.container_ca, api.env.basedn),
+                ldap.SCOPE_ONELEVEL, size_limit=-1)
+        except errors.NotFound:
+            ca_entries = []
+        for entry in ca_entries:
+            cas[DN(entry.single_value['ipacasubjectdn'])] = (
+                entry.single_value['cn'])
+
+        entries = self._find_entries(
+            ldap, 'fqdn', self._pending(hosts), ['fqdn', 'usercertificate'],
+            DN(self.obj.container_dn, api.env.basedn))
+        owners = [(entry.single_value['fqdn'].lower(), entry)
+                  for entry in entries]
+        for fqdn, fqdn_services in services.items():
+            owners.extend((fqdn, entry) for entry in fqdn_services)
+
+        certs = {}
+        for fqdn, entry in owners:
+            for attr in ('usercertificate', 'usercertificate;binary'):
+                for cert in entry.get(attr, []):
+                    try:
+                        cert = x509.load_certificate(cert, x509.DER)
+                    except ValueError:
+                        continue
+                    cacn = cas.get(DN(cert.issuer))
+                    if cacn is None:
+                        continue
+                    certs.setdefault(fqdn, []).append(
+                        (cert.serial_number, cacn))
+        return certs
+
+    def _revoke_certificates(self, ldap, hosts, certs):
+        """
+        Revoke the certificates of the hosts and their services, with one
+        Dogtag request per chunk of chunk_size hosts. Callers which may
+        only revoke the certificates of the hosts they manage are not
+        allowed to revoke certificates in bulk, their certificates are
+        revoked one by one.
+        """
+        try:
+            self.api.Command.cert_revoke.check_access()
+        except errors.ACIError:
+            chunk_size = 1
+        else:
+            chunk_size = self.chunk_size
+
+        fqdns = [fqdn for fqdn in self._pending(hosts) if fqdn in certs]
+        for i in range(0, len(fqdns), chunk_size):
+            chunk = fqdns[i:i + chunk_size]
+            try:
+                if chunk_size > 1:
+                    self.api.Backend.ra.revoke_certificates(
+                        [str(serial) for fqdn in chunk
+                         for serial, _cacn in certs[fqdn]],
+                        revocation_reason=4)
+                else:
+                    revoke_certs(
+                        [self.api.Command.cert_show(
+                            unicode(serial), cacn=cacn)['result']
+                         for serial, cacn in certs[chunk[0]]])
+            except errors.NotImplementedError:
+                # some CA's might not implement revoke
+                pass
+            except Exception as e:
+                for fqdn in chunk:
+                    self._set_error(hosts[fqdn].result, e)
+
+    def _delete_services(self, ldap, hosts, services):
+        fqdns = [fqdn for fqdn in self._pending(hosts) if fqdn in services]
+        entries = [(fqdn, entry) for fqdn in fqdns
+                   for entry in services[fqdn]]
+        failures = ldap.delete_entries([entry.dn for _fqdn, entry in entries],
+                                       window=self.delete_window)
+        for (fqdn, _entry), error in zip(entries, failures):
+            if error is None or isinstance(error, errors.NotFound):
+                continue
+            if hosts[fqdn].result['error'] is None:
+                self._set_error(hosts[fqdn].result, error)
+
+    def _remove_dns_records(self, ldap, hosts):
+        """
+        Remove A, AAAA, SSHFP and PTR records of the hosts. The records of
+        all the hosts in a zone are looked up with bulk searches.
+        """
+        try:
+            zone_entries, _truncated = ldap.find_entries(
+                '(objectclass=idnszone)', ['idnsname'],
+                DN(api.env.container_dns, api.env.basedn),
+                ldap.SCOPE_ONELEVEL, size_limit=-1)
+        except errors.NotFound:
+            zone_entries = []
+        zones = dict((entry.single_value['idnsname'], entry.dn)
+                     for entry in zone_entries)
+
+        names = {}
+        for fqdn in self._pending(hosts):
+            fqdn_dnsname = DNSName(fqdn).make_absolute()
+            matches = [z for z in zones if fqdn_dnsname.is_subdomain(z)]
+            if not matches:
+                names.setdefault(None, {})[fqdn_dnsname] = fqdn
+                continue
+            zone = max(matches, key=len)
+            names.setdefault(zone, {})[fqdn_dnsname.relativize(zone)] = fqdn
+
+        for zone, zone_names in names.items():
+            records = {}
+            if zone is not None:
+                entries = self._find_entries(
+                    ldap, 'idnsname',
+                    [unicode(name.to_text()) for name in zone_names],
+                    ['idnsname', 'arecord', 'aaaarecord', 'sshfprecord'],
+                    zones[zone], scope=ldap.SCOPE_ONELEVEL)
+                for entry in entries:
+                    records[entry.single_value['idnsname']] = entry
+
+            for name, fqdn in zone_names.items():
+                record = records.get(name)
+                rec_removed = False
+                if record is not None:
+                    try:
+                        rec_removed = self._remove_host_records(
+                            zone, record, DNSName(fqdn).make_absolute())
+                    except Exception as e:
+                        self._set_error(hosts[fqdn].result, e)
+                        continue
+
+                if not rec_removed:
+                    self.add_message(
+                        messages.FailedToRemoveHostDNSRecords(
+                            host=fqdn,
+                            reason=_("No A, AAAA, SSHFP or PTR records "
+                                     "found.")
+                        )
+                    )
+
+    def _remove_host_records(self, zone, record, fqdn_dnsname):
+        rec_removed = False
+        # remove PTR records first
+        for attr in ('arecord', 'aaaarecord'):
+            for val in record.get(attr, []):
+                rec_removed = (
+                    remove_ptr_rec(val, fqdn_dnsname) or
+                    rec_removed
+                )
+        if any(record.get(attr) for attr in
+               ('arecord', 'aaaarecord', 'sshfprecord')):
+            # remove all A, AAAA, SSHFP records of the host
+            api.Command['dnsrecord_mod'](
+                zone,
+                record.single_value['idnsname'],
+                arecord=[],
+                aaaarecord=[],
+                sshfprecord=[]
+                )
+            rec_removed = True
+        return rec_removed
+
+    def pre_callback(self, ldap, items, **options):
+        hosts = dict((item.dn[0].value.lower(), item) for item in items)
+        if not hosts:
+            return
+
+        self._check_masters(ldap, hosts)
+        services = self._get_services(ldap, hosts)
+        if self.api.Command.ca_is_enabled()['result']:
+            certs = self._get_certificates(ldap, hosts, services)
+            self._revoke_certificates(ldap, hosts, certs)
+        self._delete_services(ldap, hosts, services)
+
+        updatedns = options.get('updatedns', False)
+        if updatedns:
+            try:
+                updatedns = dns_container_exists(ldap)
+            except errors.NotFound:
+                updatedns = False
+
+        if updatedns:
+            self._remove_dns_records(ldap, hosts)
+
+
 @register()
 class host_mod(LDAPUpdate):
     __doc__ = _('Modify information about a host.')
@@ -1057,6 +1403,21 @@ class host_find(LDAPSearch):
     def post_callback(self, ldap, entries, truncated, *args, **options):
         if options.get('pkey_only', False):
             return truncated
+
+        # resolve netgroups and managed hosts for all entries at once
+        # instead of searching for them entry by entry
+        managed_netgroups = None
+        ng_container = DN(api.env.container_netgroup, api.env.basedn)
+        for entry_attrs in entries:
+            if any(DN(member).endswith(ng_container)
+                   for member in entry_attrs.get('memberofindirect', [])):
+                managed_netgroups = self.obj.get_managed_netgroups(ldap)
+                break
+
+        if options.get('all', False):
+            managed_hosts = self.obj.get_managed_hosts_map(
+                [entry_attrs.dn for entry_attrs in entries])
+
         for entry_attrs in entries:
             hostname = entry_attrs['fqdn']
             if isinstance(hostname, (tuple, list)):
@@ -1075,10 +1436,11 @@ class host_find(LDAPSearch):
 
             set_kerberos_attrs(entry_attrs, options)
             rename_ipaallowedtoperform_from_ldap(entry_attrs, options)
-            self.obj.suppress_netgroup_memberof(ldap, entry_attrs)
+            self.obj.suppress_netgroup_memberof(
+                ldap, entry_attrs, managed_netgroups or set())
 
             if options.get('all', False):
-                entry_attrs['managing'] = self.obj.get_managed_hosts(entry_attrs.dn)
+                entry_attrs['managing'] = managed_hosts[entry_attrs.dn]
 
             convert_sshpubkey_post(entry_attrs)
             convert_ipaassignedidview_post(entry_attrs, options)
@@ -67,6 +67,10 @@ class ldap2(CrudBackend, LDAPClient):
     LDAP Backend Take 2.
     """
 
+    # maximal number of values added to or removed from a member attribute
+    # in a single modify operation
+    member_chunk_size = 1000
+
     def __init__(self, api, ldap_uri=None):
         if ldap_uri is None:
             ldap_uri = api.env.ldap_uri
@@ -447,6 +451,156 @@ class ldap2(CrudBackend, LDAPClient):
         except errors.MidairCollision:
             raise errors.NotGroupMember()
 
+    def _get_existing_entries(self, dns):
+        """
+        Return the subset of dns which designate existing entries.
+
+        Entries are looked up with a single one-level search per parent
+        entry and chunk of dns instead of one search per dn.
+        """
+        by_parent = {}
+        existing = set()
+        for dn in dns:
+            if len(dn) < 2 or len(dn[0]) != 1:
+                # multi-valued RDN, look it up separately
+                try:
+                    existing.add(self.get_entry(dn, ['']).dn)
+                except errors.NotFound:
+                    pass
+                continue
+            by_parent.setdefault(dn[1:], []).append(dn)
+
+        for parent_dn, child_dns in by_parent.items():
+            for i in range(0, len(child_dns), self.member_chunk_size):
+                chunk = child_dns[i:i + self.member_chunk_size]
+                filters = [
+                    self.make_filter_from_attr(dn[0].attr, dn[0].value)
+                    for dn in chunk
+                ]
+                try:
+                    entries = self.get_entries(
+                        parent_dn, self.SCOPE_ONELEVEL,
+                        self.combine_filters(filters, self.MATCH_ANY), [''],
+                        size_limit=-1, time_limit=-1)
+                except errors.NotFound:
+                    continue
+                existing.update(entry.dn for entry in entries)
+
+        return existing
+
+    def _get_group_members(self, group_dn, member_attr):
+        try:
+            entry = self.get_entry(group_dn, [member_attr])
+        except errors.NotFound:
+            return None
+        return set(entry.get(member_attr, []))
+
+    def add_entries_to_group(self, dns, group_dn, member_attr='member',
+                             allow_same=False):
+        """
+        Add entries designated by dns to group group_dn in the member
+        attribute member_attr.
+
+        This is equivalent to calling add_entry_to_group() for every dn,
+        except that the existence of the entries is checked in bulk and the
+        group is updated with a single modify operation per chunk of
+        member_chunk_size entries.
+
+        Return list of (dn, error) tuples for entries which could not be
+        added, in the order in which they were passed.
+        """
+        assert isinstance(group_dn, DN)
+
+        self.log.debug(
+            "add_entries_to_group: %d entries group_dn=%s member_attr=%s",
+            len(dns), group_dn, member_attr)
+
+        existing = self._get_existing_entries(set(dns))
+        members = self._get_group_members(group_dn, member_attr)
+
+        failed = []
+        to_add = []
+        seen = set()
+        for i, dn in enumerate(dns):
+            assert isinstance(dn, DN)
+            if dn not in existing:
+                failed.append(
+                    (i, dn, errors.NotFound(reason='no such entry')))
+            elif dn == group_dn and not allow_same:
+                failed.append((i, dn, errors.SameGroupError()))
+            elif dn in seen or (members is not None and dn in members):
+                failed.append((i, dn, errors.AlreadyGroupMember()))
+            else:
+                seen.add(dn)
+                to_add.append((i, dn))
+
+        for start in range(0, len(to_add), self.member_chunk_size):
+            chunk = to_add[start:start + self.member_chunk_size]
+            try:
+                with self.error_handler():
+                    modlist = [(_ldap.MOD_ADD, member_attr,
+                                self.encode([dn for _i, dn in chunk]))]
+                    self.conn.modify_s(str(group_dn), modlist)
+            except errors.PublicError:
+                # report the exact error for each entry
+                for i, dn in chunk:
+                    try:
+                        self.add_entry_to_group(dn, group_dn, member_attr,
+                                                allow_same=allow_same)
+                    except errors.PublicError as e:
+                        failed.append((i, dn, e))
+
+        failed.sort(key=lambda f: f[0])
+        return [(dn, e) for _i, dn, e in failed]
+
+    def remove_entries_from_group(self, dns, group_dn, member_attr='member'):
+        """
+        Remove entries designated by dns from group group_dn.
+
+        This is equivalent to calling remove_entry_from_group() for every
+        dn, except that the group is updated with a single modify operation
+        per chunk of member_chunk_size entries.
+
+        Return list of (dn, error) tuples for entries which could not be
+        removed, in the order in which they were passed.
+        """
+        assert isinstance(group_dn, DN)
+
+        self.log.debug(
+            "remove_entries_from_group: %d entries group_dn=%s member_attr=%s",
+            len(dns), group_dn, member_attr)
+
+        members = self._get_group_members(group_dn, member_attr)
+
+        failed = []
+        to_remove = []
+        seen = set()
+        for i, dn in enumerate(dns):
+            assert isinstance(dn, DN)
+            if dn in seen or (members is not None and dn not in members):
+                failed.append((i, dn, errors.NotGroupMember()))
+            else:
+                seen.add(dn)
+                to_remove.append((i, dn))
+
+        for start in range(0, len(to_remove), self.member_chunk_size):
+            chunk = to_remove[start:start + self.member_chunk_size]
+            try:
+                with self.error_handler():
+                    modlist = [(_ldap.MOD_DELETE, member_attr,
+                                self.encode([dn for _i, dn in chunk]))]
+                    self.conn.modify_s(str(group_dn), modlist)
+            except errors.PublicError:
+                # report the exact error for each entry
+                for i, dn in chunk:
+                    try:
+                        self.remove_entry_from_group(dn, group_dn, member_attr)
+                    except errors.PublicError as e:
+                        failed.append((i, dn, e))
+
+        failed.sort(key=lambda f: f[0])
+        return [(dn, e) for _i, dn, e in failed]
+
     def set_entry_active(self, dn, active):
         """Mark entry active/inactive."""
 
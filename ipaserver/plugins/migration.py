@@ -17,16 +17,24 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import hashlib
+import io
+import os
 import re
+import threading
 from ldap import MOD_ADD
 from ldap import SCOPE_BASE, SCOPE_ONELEVEL, SCOPE_SUBTREE
 
 import six
+# pylint: disable=import-error
+from six.moves import queue
+# pylint: enable=import-error
 
 from ipalib import api, errors, output
 from ipalib import Command, Password, Str, Flag, StrEnum, DNParam, Bool
 from ipalib.cli import to_cli
 from ipalib.plugable import Registry
+from ipalib.request import context
 from .user import NO_UPG_MAGIC
 if api.env.in_server and api.env.context in ['lite', 'server']:
     try:
@@ -89,6 +97,11 @@ mode for every 100 users. As a result there will be a window in which
 users will be added to IPA but will not be members of the default
 user group.
 
+Entries are read from the remote server page by page and added to IPA
+over several LDAP connections in parallel. Objects which were migrated
+are recorded, so when a migration fails or is interrupted, running the
+same migration again skips the objects which were already migrated.
+
 EXAMPLES:
 
  The simplest migration, accepting all defaults:
@@ -152,6 +165,11 @@ _supported_schemas = (u'RFC2307bis', u'RFC2307')
 _supported_scopes = {u'base': SCOPE_BASE, u'onelevel': SCOPE_ONELEVEL, u'subtree': SCOPE_SUBTREE}
 _default_scope = u'onelevel'
 
+# number of parallel LDAP connections used to migrate entries
+_migration_workers = 4
+# number of entries retrieved from the remote server in a single page
+_migration_page_size = 1000
+
 
 def _create_kerberos_principals(ldap, pkey, entry_attrs, failed):
     """
@@ -264,9 +282,16 @@ def _pre_migrate_user(ldap, pkey, dn, entry_attrs, failed, config, ctx, **kwargs
                             'in attribute %s which could not be converted to DN: %s',
                                 pkey, value, type(value), attr, e)
                         continue
+                remote_entries = ctx.setdefault('remote_entries', {})
                 try:
-                    remote_entry = ds_ldap.get_entry(value, [api.Object.user.primary_key.name, api.Object.group.primary_key.name])
-                except errors.NotFound:
+                    remote_entry = remote_entries[value]
+                except KeyError:
+                    try:
+                        remote_entry = ds_ldap.get_entry(value, [api.Object.user.primary_key.name, api.Object.group.primary_key.name])
+                    except errors.NotFound:
+                        remote_entry = None
+                    remote_entries[value] = remote_entry
+                if remote_entry is None:
                     api.log.warning('%s: attribute %s refers to non-existent entry %s' % (pkey, attr, value))
                     continue
                 if value.endswith(search_bases['user']):
@@ -312,30 +337,37 @@ def _update_default_group(ldap, ctx, force):
     # Purposely let this fire when migrate_cnt == 0 so on re-running migration
     # it can catch any users migrated but not added to the default group.
     if force or migrate_cnt % 100 == 0:
-        s = datetime.datetime.now()
-        searchfilter = "(&(objectclass=posixAccount)(!(memberof=%s)))" % group_dn
-        try:
-            result, _truncated = ldap.find_entries(
-                searchfilter, [''], DN(api.env.container_user, api.env.basedn),
-                scope=ldap.SCOPE_SUBTREE, time_limit=-1, size_limit=-1)
-        except errors.NotFound:
-            api.log.debug('All users have default group set')
-            return
+        # users are migrated in parallel, make sure the same users are not
+        # added to the group twice
+        with ctx['def_group_lock']:
+            _add_to_default_group(ldap, group_dn, force)
 
-        member_dns = [m.dn for m in result]
-        modlist = [(MOD_ADD, 'member', ldap.encode(member_dns))]
-        try:
-            with ldap.error_handler():
-                ldap.conn.modify_s(str(group_dn), modlist)
-        except errors.DatabaseError as e:
-            api.log.error('Adding new members to default group failed: %s \n'
-                          'members: %s', e, ','.join(member_dns))
 
-        e = datetime.datetime.now()
-        d = e - s
-        mode = " (forced)" if force else ""
-        api.log.info('Adding %d users to group%s duration %s',
-                      len(member_dns), mode, d)
+def _add_to_default_group(ldap, group_dn, force):
+    s = datetime.datetime.now()
+    searchfilter = "(&(objectclass=posixAccount)(!(memberof=%s)))" % group_dn
+    try:
+        result, _truncated = ldap.find_entries(
+            searchfilter, [''], DN(api.env.container_user, api.env.basedn),
+            scope=ldap.SCOPE_SUBTREE, time_limit=-1, size_limit=-1)
+    except errors.NotFound:
+        api.log.debug('All users have default group set')
+        return
+
+    member_dns = [m.dn for m in result]
+    modlist = [(MOD_ADD, 'member', ldap.encode(member_dns))]
+    try:
+        with ldap.error_handler():
+            ldap.conn.modify_s(str(group_dn), modlist)
+    except errors.DatabaseError as e:
+        api.log.error('Adding new members to default group failed: %s \n'
+                      'members: %s', e, ','.join(member_dns))
+
+    e = datetime.datetime.now()
+    d = e - s
+    mode = " (forced)" if force else ""
+    api.log.info('Adding %d users to group%s duration %s',
+                  len(member_dns), mode, d)
 
 # GROUP MIGRATION CALLBACKS AND VARS
 
@@ -449,6 +481,80 @@ def _group_exc_callback(ldap, dn, entry_attrs, exc, options):
 
     raise exc
 
+# MIGRATION CHECKPOINTS
+
+class MigrationCheckpoint(object):
+    """
+    Record of objects migrated from a remote server.
+
+    The primary keys of migrated objects are appended to a file identified
+    by the remote server and search bases. A migration which failed or was
+    interrupted skips the recorded objects when it is run again with the
+    same options. The file is removed when the migration finishes.
+
+    ``options`` are the values of options which select the migrated objects
+    or change their content, values of multi-valued options are compared
+    regardless of their order and case.
+    """
+    def __init__(self, ldapuri, ds_base_dn, search_bases, options=None):
+        key_parts = [ldapuri, unicode(ds_base_dn)]
+        key_parts.extend(
+            u'%s=%s' % (k, v) for k, v in sorted(search_bases.items()))
+        for name, value in sorted((options or {}).items()):
+            if isinstance(value, (list, tuple)):
+                value = u','.join(sorted(unicode(v).lower() for v in value))
+            key_parts.append(u'%s=%s' % (name, value))
+        key = u'\n'.join(key_parts)
+        self.filename = os.path.join(
+            paths.IPA_MIGRATION_DIR,
+            hashlib.sha256(key.encode('utf-8')).hexdigest())
+        self.migrated = {}
+        self._lock = threading.Lock()
+        self._file = None
+
+    def load(self):
+        try:
+            with io.open(self.filename, encoding='utf-8') as f:
+                for line in f:
+                    ldap_obj_name, _sep, pkey = line.rstrip(u'\n').partition(
+                        u'\t')
+                    self.migrated.setdefault(ldap_obj_name, set()).add(pkey)
+        except IOError:
+            pass
+
+        try:
+            self._file = io.open(self.filename, 'a', encoding='utf-8')
+        except IOError as e:
+            api.log.warning('Unable to record migration progress in %s: %s',
+                            self.filename, e)
+
+        return self.migrated
+
+    def is_migrated(self, ldap_obj_name, pkey):
+        return pkey in self.migrated.get(ldap_obj_name, ())
+
+    def add(self, ldap_obj_name, pkey):
+        if self._file is None:
+            return
+        line = u'%s\t%s\n' % (ldap_obj_name, pkey)
+        with self._lock:
+            # the object already is in IPA, record it right away so that
+            # a resumed migration does not report it as a duplicate
+            self._file.write(line)
+            self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def remove(self):
+        self.close()
+        try:
+            os.unlink(self.filename)
+        except OSError:
+            pass
+
 # DS MIGRATION PLUGIN
 
 def construct_filter(template, oc_list):
@@ -702,6 +808,18 @@ migration process might be incomplete\n''')
             else:
                 options[name] = tuple()
 
+    def _get_checkpoint_options(self, options):
+        """
+        Return values of options which select the migrated objects or change
+        their content, a checkpoint is resumed only with the same values.
+        """
+        names = ['userobjectclass', 'groupobjectclass',
+                 'userignoreobjectclass', 'userignoreattribute',
+                 'groupignoreobjectclass', 'groupignoreattribute',
+                 'groupoverwritegid', 'schema', 'scope', 'use_def_group']
+        names.extend('exclude_%ss' % to_cli(n) for n in self.migrate_objects)
+        return {name: options.get(name) for name in names}
+
     def _get_search_bases(self, options, ds_base_dn, migrate_order):
         search_bases = dict()
         for ldap_obj_name in migrate_order:
@@ -717,9 +835,145 @@ migration process might be incomplete\n''')
             search_bases[ldap_obj_name] = search_base
         return search_bases
 
-    def migrate(self, ldap, config, ds_ldap, ds_base_dn, options):
+    def _migrate_entry(self, ldap, ldap_obj_name, entry_attrs, config,
+                       context, options, state):
+        """
+        Migrate a single object, return its primary key if it was migrated.
+        """
+        ldap_obj = self.api.Object[ldap_obj_name]
+        failed = state['failed']
+
+        ava = entry_attrs.dn[0][0]
+        if ava.attr == ldap_obj.primary_key.name:
+            # In case if pkey attribute is in the migrated object DN
+            # and the original LDAP is multivalued, make sure that
+            # we pick the correct value (the unique one stored in DN)
+            pkey = ava.value.lower()
+        else:
+            pkey = entry_attrs[ldap_obj.primary_key.name][0].lower()
+
+        if pkey in state['exclude']:
+            return None
+
+        if state['checkpoint'].is_migrated(ldap_obj_name, pkey):
+            # migrated by a previous run which did not finish
+            return pkey
+
+        entry_attrs.dn = ldap_obj.get_dn(pkey)
+        entry_attrs['objectclass'] = list(
+            set(
+                config.get(
+                    ldap_obj.object_class_config, ldap_obj.object_class
+                ) + [o.lower() for o in entry_attrs['objectclass']]
+            )
+        )
+        entry_attrs[ldap_obj.primary_key.name][0] = entry_attrs[ldap_obj.primary_key.name][0].lower()
+
+        callback = self.migrate_objects[ldap_obj_name]['pre_callback']
+        if callable(callback):
+            try:
+                entry_attrs.dn = callback(
+                    ldap, pkey, entry_attrs.dn, entry_attrs,
+                    failed, config, context,
+                    schema=options['schema'],
+                    search_bases=state['search_bases'],
+                    valid_gids=state['valid_gids'],
+                    invalid_gids=state['invalid_gids'],
+                    **state['blacklists']
+                )
+                if not entry_attrs.dn:
+                    return None
+            except errors.NotFound as e:
+                failed[pkey] = unicode(e.reason)
+                return None
+
+        try:
+            ldap.add_entry(entry_attrs)
+        except errors.ExecutionError as e:
+            callback = self.migrate_objects[ldap_obj_name]['exc_callback']
+            if callable(callback):
+                try:
+                    callback(
+                        ldap, entry_attrs.dn, entry_attrs, e, options)
+                except errors.ExecutionError as e:
+                    failed[pkey] = unicode(e)
+                    return None
+            else:
+                failed[pkey] = unicode(e)
+                return None
+
+        state['checkpoint'].add(ldap_obj_name, pkey)
+
+        context['migrate_cnt'] += 1
+        callback = self.migrate_objects[ldap_obj_name]['post_callback']
+        if callable(callback):
+            callback(
+                ldap, pkey, entry_attrs.dn, entry_attrs,
+                failed, config, context)
+
+        return pkey
+
+    def _migrate_worker(self, ldap, ldap_obj_name, entries, config, context,
+                        options, state, connect):
+        """
+        Migrate objects from the entries queue until None is received.
+
+        Every worker uses its own LDAP connections and its own copy of the
+        context, caches in the context are shared.
+        """
+        context = dict(context, migrate_cnt=0)
+        connected = False
+        try:
+            if connect is not None:
+                connect()
+                connected = True
+            while True:
+                entry_attrs = entries.get()
+                if entry_attrs is None:
+                    break
+                if state['error'] is not None:
+                    continue
+                self._migrate_entry_logged(
+                    ldap, ldap_obj_name, entry_attrs, config, context,
+                    options, state)
+        except Exception as e:
+            state['error'] = e
+            # drain the queue so that the producer is not blocked
+            while entries.get() is not None:
+                pass
+        finally:
+            if connected:
+                context['ds_ldap'].disconnect()
+                ldap.disconnect()
+
+    def _migrate_entry_logged(self, ldap, ldap_obj_name, entry_attrs, config,
+                              context, options, state):
+        s = datetime.datetime.now()
+        pkey = self._migrate_entry(
+            ldap, ldap_obj_name, entry_attrs, config, context, options, state)
+        if pkey is None:
+            return
+
+        with state['lock']:
+            state['migrated'].append(pkey)
+            migrate_cnt = len(state['migrated'])
+
+        e = datetime.datetime.now()
+        d = e - s
+        total_dur = e - state['migration_start']
+        if migrate_cnt > 0 and migrate_cnt % 100 == 0:
+            api.log.info("%d %ss migrated. %s elapsed." % (migrate_cnt, ldap_obj_name, total_dur))
+        api.log.debug("%d %ss migrated, duration: %s (total %s)" % (migrate_cnt, ldap_obj_name, d, total_dur))
+
+    def migrate(self, ldap, config, ds_ldap, ds_base_dn, options,
+                ds_connect=None, checkpoint=None):
         """
         Migrate objects from DS to LDAP.
+
+        Objects are read from DS page by page. When ds_connect is given,
+        objects are migrated by a pool of worker threads each of which
+        connects to IPA and calls ds_connect() to connect to DS, otherwise
+        they are migrated in the calling thread.
         """
         assert isinstance(ds_base_dn, DN)
         migrated = {} # {'OBJ': ['PKEY1', 'PKEY2', ...], ...}
@@ -729,6 +983,29 @@ migration process might be incomplete\n''')
 
         scope = _supported_scopes[options.get('scope')]
 
+        if checkpoint is None:
+            checkpoint = MigrationCheckpoint(
+                options['ldapuri'], ds_base_dn, search_bases,
+                self._get_checkpoint_options(options))
+            checkpoint.load()
+
+        if ds_connect is not None:
+            ccache_name = getattr(context, 'ccache_name',
+                                  os.environ.get('KRB5CCNAME'))
+
+            def connect():
+                ldap.connect(ccache=ccache_name)
+                ds_connect()
+
+            workers = _migration_workers
+        else:
+            connect = None
+            workers = 0
+
+        # caches shared by all workers
+        migrate_ctx = dict(ds_ldap=ds_ldap, remote_entries={},
+                           def_group_lock=threading.Lock())
+
         for ldap_obj_name in self.migrate_order:
             ldap_obj = self.api.Object[ldap_obj_name]
 
@@ -736,38 +1013,9 @@ migration process might be incomplete\n''')
             oc_list = options[to_cli(self.migrate_objects[ldap_obj_name]['oc_option'])]
             search_filter = construct_filter(template, oc_list)
 
-            exclude = options['exclude_%ss' % to_cli(ldap_obj_name)]
-            context = dict(ds_ldap = ds_ldap)
-
             migrated[ldap_obj_name] = []
             failed[ldap_obj_name] = {}
 
-            try:
-                entries, truncated = ds_ldap.find_entries(
-                    search_filter, ['*'], search_bases[ldap_obj_name],
-                    scope,
-                    time_limit=0, size_limit=-1
-                )
-            except errors.NotFound:
-                if not options.get('continue',False):
-                    raise errors.NotFound(
-                        reason=_('%(container)s LDAP search did not return any result '
-                                 '(search base: %(search_base)s, '
-                                 'objectclass: %(objectclass)s)')
-                                 % {'container': ldap_obj_name,
-                                    'search_base': search_bases[ldap_obj_name],
-                                    'objectclass': ', '.join(oc_list)}
-                    )
-                else:
-                    truncated = False
-                    entries = []
-            if truncated:
-                self.log.error(
-                    '%s: %s' % (
-                        ldap_obj.name, self.truncated_err_msg
-                    )
-                )
-
             blacklists = {}
             for blacklist in ('oc_blacklist', 'attr_blacklist'):
                 blacklist_option = self.migrate_objects[ldap_obj_name][blacklist+'_option']
@@ -777,97 +1025,92 @@ migration process might be incomplete\n''')
                     blacklists[blacklist] = tuple()
 
             # get default primary group for new users
-            if 'def_group_dn' not in context and options.get('use_def_group'):
+            if ('def_group_dn' not in migrate_ctx and
+                    options.get('use_def_group')):
                 def_group = config.get('ipadefaultprimarygroup')
-                context['def_group_dn'] = api.Object.group.get_dn(def_group)
+                migrate_ctx['def_group_dn'] = api.Object.group.get_dn(
+                    def_group)
                 try:
-                    ldap.get_entry(context['def_group_dn'], ['gidnumber', 'cn'])
+                    ldap.get_entry(migrate_ctx['def_group_dn'],
+                                   ['gidnumber', 'cn'])
                 except errors.NotFound:
                     error_msg = _('Default group for new users not found')
                     raise errors.NotFound(reason=error_msg)
 
-            context['has_upg'] = ldap.has_upg()
-
-            valid_gids = set()
-            invalid_gids = set()
-            migrate_cnt = 0
-            context['migrate_cnt'] = 0
-            for entry_attrs in entries:
-                context['migrate_cnt'] = migrate_cnt
-                s = datetime.datetime.now()
-
-                ava = entry_attrs.dn[0][0]
-                if ava.attr == ldap_obj.primary_key.name:
-                    # In case if pkey attribute is in the migrated object DN
-                    # and the original LDAP is multivalued, make sure that
-                    # we pick the correct value (the unique one stored in DN)
-                    pkey = ava.value.lower()
-                else:
-                    pkey = entry_attrs[ldap_obj.primary_key.name][0].lower()
-
-                if pkey in exclude:
-                    continue
+            migrate_ctx['has_upg'] = ldap.has_upg()
+            migrate_ctx['migrate_cnt'] = 0
+
+            state = dict(
+                exclude=options['exclude_%ss' % to_cli(ldap_obj_name)],
+                blacklists=blacklists,
+                search_bases=search_bases,
+                valid_gids=set(),
+                invalid_gids=set(),
+                migrated=migrated[ldap_obj_name],
+                failed=failed[ldap_obj_name],
+                checkpoint=checkpoint,
+                migration_start=migration_start,
+                lock=threading.Lock(),
+                error=None,
+            )
 
-                entry_attrs.dn = ldap_obj.get_dn(pkey)
-                entry_attrs['objectclass'] = list(
-                    set(
-                        config.get(
-                            ldap_obj.object_class_config, ldap_obj.object_class
-                        ) + [o.lower() for o in entry_attrs['objectclass']]
+            entries = queue.Queue(maxsize=_migration_page_size)
+            threads = []
+            for _i in range(workers):
+                t = threading.Thread(
+                    target=self._migrate_worker,
+                    args=(ldap, ldap_obj_name, entries, config, migrate_ctx,
+                          options, state, connect))
+                t.daemon = True
+                t.start()
+                threads.append(t)
+
+            found = False
+            try:
+                for entry_attrs in ds_ldap.iter_entries(
+                        search_filter, ['*'], search_bases[ldap_obj_name],
+                        scope, time_limit=0,
+                        page_size=_migration_page_size):
+                    found = True
+                    if state['error'] is not None:
+                        break
+                    if threads:
+                        entries.put(entry_attrs)
+                    else:
+                        self._migrate_entry_logged(
+                            ldap, ldap_obj_name, entry_attrs, config,
+                            migrate_ctx, options, state)
+            except errors.NotFound:
+                pass
+            except errors.LimitsExceeded:
+                self.log.error(
+                    '%s: %s' % (
+                        ldap_obj.name, self.truncated_err_msg
                     )
                 )
-                entry_attrs[ldap_obj.primary_key.name][0] = entry_attrs[ldap_obj.primary_key.name][0].lower()
-
-                callback = self.migrate_objects[ldap_obj_name]['pre_callback']
-                if callable(callback):
-                    try:
-                        entry_attrs.dn = callback(
-                            ldap, pkey, entry_attrs.dn, entry_attrs,
-                            failed[ldap_obj_name], config, context,
-                            schema=options['schema'],
-                            search_bases=search_bases,
-                            valid_gids=valid_gids,
-                            invalid_gids=invalid_gids,
-                            **blacklists
-                        )
-                        if not entry_attrs.dn:
-                            continue
-                    except errors.NotFound as e:
-                        failed[ldap_obj_name][pkey] = unicode(e.reason)
-                        continue
-
-                try:
-                    ldap.add_entry(entry_attrs)
-                except errors.ExecutionError as e:
-                    callback = self.migrate_objects[ldap_obj_name]['exc_callback']
-                    if callable(callback):
-                        try:
-                            callback(
-                                ldap, entry_attrs.dn, entry_attrs, e, options)
-                        except errors.ExecutionError as e:
-                            failed[ldap_obj_name][pkey] = unicode(e)
-                            continue
-                    else:
-                        failed[ldap_obj_name][pkey] = unicode(e)
-                        continue
+            finally:
+                for _t in threads:
+                    entries.put(None)
+                for t in threads:
+                    t.join()
+
+            if state['error'] is not None:
+                raise state['error']
+
+            if not found and not options.get('continue', False):
+                raise errors.NotFound(
+                    reason=_('%(container)s LDAP search did not return any result '
+                             '(search base: %(search_base)s, '
+                             'objectclass: %(objectclass)s)')
+                             % {'container': ldap_obj_name,
+                                'search_base': search_bases[ldap_obj_name],
+                                'objectclass': ', '.join(oc_list)}
+                )
 
-                migrated[ldap_obj_name].append(pkey)
+        if 'def_group_dn' in migrate_ctx:
+            _update_default_group(ldap, migrate_ctx, True)
 
-                callback = self.migrate_objects[ldap_obj_name]['post_callback']
-                if callable(callback):
-                    callback(
-                        ldap, pkey, entry_attrs.dn, entry_attrs,
-                        failed[ldap_obj_name], config, context)
-                e = datetime.datetime.now()
-                d = e - s
-                total_dur = e - migration_start
-                migrate_cnt += 1
-                if migrate_cnt > 0 and migrate_cnt % 100 == 0:
-                    api.log.info("%d %ss migrated. %s elapsed." % (migrate_cnt, ldap_obj_name, total_dur))
-                api.log.debug("%d %ss migrated, duration: %s (total %s)" % (migrate_cnt, ldap_obj_name, d, total_dur))
-
-        if 'def_group_dn' in context:
-            _update_default_group(ldap, context, True)
+        checkpoint.remove()
 
         return (migrated, failed)
 
@@ -887,19 +1130,27 @@ migration process might be incomplete\n''')
         # connect to DS
         ds_ldap = ldap2(self.api, ldap_uri=ldapuri)
 
-        cacert = None
+        tmp_ca_cert_f = None
+        ds_connect_kw = dict(bind_dn=options['binddn'], bind_pw=bindpw)
         if options.get('cacertfile') is not None:
-            # store CA cert into file
+            # store CA cert into file, it is needed as long as new
+            # connections are opened
             tmp_ca_cert_f = write_tmp_file(options['cacertfile'])
-            cacert = tmp_ca_cert_f.name
-
             # start TLS connection
-            ds_ldap.connect(bind_dn=options['binddn'], bind_pw=bindpw,
-                            cacert=cacert)
+            ds_connect_kw['cacert'] = tmp_ca_cert_f.name
 
-            tmp_ca_cert_f.close()
-        else:
-            ds_ldap.connect(bind_dn=options['binddn'], bind_pw=bindpw)
+        try:
+            ds_ldap.connect(**ds_connect_kw)
+            return self._execute(ldap, config, ds_ldap, ds_base_dn,
+                                 ds_connect_kw, options)
+        finally:
+            if ds_ldap.isconnected():
+                ds_ldap.disconnect()
+            if tmp_ca_cert_f is not None:
+                tmp_ca_cert_f.close()
+
+    def _execute(self, ldap, config, ds_ldap, ds_base_dn, ds_connect_kw,
+                 options):
 
         # check whether the compat plugin is enabled
         if not options.get('compat'):
@@ -927,7 +1178,8 @@ migration process might be incomplete\n''')
 
         # migrate!
         (migrated, failed) = self.migrate(
-            ldap, config, ds_ldap, ds_base_dn, options
+            ldap, config, ds_ldap, ds_base_dn, options,
+            ds_connect=lambda: ds_ldap.connect(**ds_connect_kw)
         )
 
         return dict(result=migrated, failed=failed, enabled=True, compat=True)
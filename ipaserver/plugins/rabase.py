@@ -105,6 +105,16 @@ class rabase(Backend):
         """
         raise errors.NotImplementedError(name='%s.revoke_certificate' % self.name)
 
+    def revoke_certificates(self, serial_numbers, revocation_reason=0):
+        """
+        Revoke many certificates at once.
+
+        :param serial_numbers: List of certificate serial numbers.
+        :param revocation_reason: Integer code of revocation reason, see
+                                  `revoke_certificate`.
+        """
+        raise errors.NotImplementedError(name='%s.revoke_certificates' % self.name)
+
     def take_certificate_off_hold(self, serial_number):
         """
         Take revoked certificate off hold.
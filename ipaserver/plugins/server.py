@@ -736,7 +736,7 @@ class server_del(LDAPDelete):
     def exc_callback(self, keys, options, exc, call_func, *call_args,
                      **call_kwargs):
         if (options.get('force', False) and isinstance(exc, errors.NotFound)
-                and call_func.__name__ == 'delete_entry'):
+                and call_func.__name__ in ('delete_entry', 'delete_subtree')):
             self.add_message(
                 message=messages.ServerRemovalWarning(
                     message=_("Server has already been deleted")))
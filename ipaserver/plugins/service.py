@@ -31,6 +31,7 @@ from .baseldap import (
     add_missing_object_class,
     pkey_to_value,
     LDAPObject,
+    LDAPBulkCreate,
     LDAPCreate,
     LDAPDelete,
     LDAPUpdate,
@@ -251,6 +252,39 @@ def revoke_certs(certs):
             pass
 
 
+# Attributes decoded from certificates keyed by their DER encoding, so that
+# searches returning the same entries again do not parse them again
+_certificate_attrs_cache = {}
+_CERTIFICATE_ATTRS_CACHE_SIZE = 1024
+
+
+def _get_certificate_attrs(cert):
+    cert = x509.normalize_certificate(cert)
+    try:
+        return _certificate_attrs_cache[cert]
+    except KeyError:
+        pass
+
+    cert_obj = x509.load_certificate(cert, datatype=x509.DER)
+    attrs = dict(
+        subject=unicode(DN(cert_obj.subject)),
+        serial_number=unicode(cert_obj.serial_number),
+        serial_number_hex=u'0x%X' % cert_obj.serial_number,
+        issuer=unicode(DN(cert_obj.issuer)),
+        valid_not_before=x509.format_datetime(cert_obj.not_valid_before),
+        valid_not_after=x509.format_datetime(cert_obj.not_valid_after),
+        sha1_fingerprint=x509.to_hex_with_colons(
+            cert_obj.fingerprint(hashes.SHA1())),
+        sha256_fingerprint=x509.to_hex_with_colons(
+            cert_obj.fingerprint(hashes.SHA256())),
+    )
+
+    if len(_certificate_attrs_cache) >= _CERTIFICATE_ATTRS_CACHE_SIZE:
+        _certificate_attrs_cache.clear()
+    _certificate_attrs_cache[cert] = attrs
+    return attrs
+
+
 def set_certificate_attrs(entry_attrs):
     """
     Set individual attributes from some values from a certificate.
@@ -265,19 +299,8 @@ def set_certificate_attrs(entry_attrs):
         cert = entry_attrs['usercertificate'][0]
     else:
         cert = entry_attrs['usercertificate']
-    cert = x509.normalize_certificate(cert)
-    cert = x509.load_certificate(cert, datatype=x509.DER)
-    entry_attrs['subject'] = unicode(DN(cert.subject))
-    entry_attrs['serial_number'] = unicode(cert.serial_number)
-    entry_attrs['serial_number_hex'] = u'0x%X' % cert.serial_number
-    entry_attrs['issuer'] = unicode(DN(cert.issuer))
-    entry_attrs['valid_not_before'] = x509.format_datetime(
-            cert.not_valid_before)
-    entry_attrs['valid_not_after'] = x509.format_datetime(cert.not_valid_after)
-    entry_attrs['sha1_fingerprint'] = x509.to_hex_with_colons(
-        cert.fingerprint(hashes.SHA1()))
-    entry_attrs['sha256_fingerprint'] = x509.to_hex_with_colons(
-        cert.fingerprint(hashes.SHA256()))
+    for attr, value in _get_certificate_attrs(cert).items():
+        entry_attrs[attr] = value
 
 def check_required_principal(ldap, principal):
     """
@@ -664,6 +687,13 @@ class service_add(LDAPCreate):
 
 
 
+@register()
+class service_add_bulk(LDAPBulkCreate):
+    __doc__ = _('Add many new IPA services.')
+
+    create_command = 'service_add'
+
+
 @register()
 class service_del(LDAPDelete):
     __doc__ = _('Delete an IPA service.')
@@ -53,6 +53,7 @@ from ipalib.plugable import Registry
 from .baseldap import (
     LDAPObject,
     pkey_to_value,
+    LDAPBulkCreate,
     LDAPCreate,
     LDAPSearch,
     LDAPQuery,
@@ -629,6 +630,56 @@ class user_add(baseuser_add):
         return dn
 
 
+@register()
+class user_add_bulk(LDAPBulkCreate):
+    __doc__ = _('Add many new users.')
+
+    create_command = 'user_add'
+
+    def post_callback(self, ldap, added, **options):
+        if not added:
+            return
+
+        # add all the users into the default primary group at once
+        config = ldap.get_ipa_config()
+        def_primary_group = config.get('ipadefaultprimarygroup')
+        group_dn = self.api.Object['group'].get_dn(def_primary_group)
+        failed = ldap.add_entries_to_group(
+            [item.entry_attrs.dn for item in added], group_dn)
+        for dn, error in failed:
+            if not isinstance(error, errors.AlreadyGroupMember):
+                self.log.error("Failed to add %s to the default group: %s",
+                               dn, error)
+
+        command = self.api.Command[self.create_command]
+        for item in added:
+            entry_attrs = item.entry_attrs
+            # delete description attribute NO_UPG_MAGIC if present
+            description = entry_attrs.get('description', [])
+            if NO_UPG_MAGIC in description:
+                entry_attrs['description'] = [
+                    d for d in description if d != NO_UPG_MAGIC]
+                try:
+                    ldap.update_entry(entry_attrs)
+                except (errors.EmptyModlist, errors.NotFound):
+                    pass
+
+            if item.options.get('random', False):
+                password = entry_attrs.single_value.get('userpassword')
+                if password is not None:
+                    entry_attrs['randompassword'] = unicode(password)
+                    item.result['randompassword'] = unicode(password)
+
+            # the post callbacks registered on user_add get the entry in the
+            # same shape as after user_add.post_callback
+            self.obj.get_preserved_attribute(entry_attrs, item.options)
+            try:
+                command.post_common_callback(ldap, item.dn, entry_attrs,
+                                             *item.keys, **item.options)
+            except Exception as e:
+                self._set_error(item.result, e)
+
+
 @register()
 class user_del(baseuser_del):
     __doc__ = _('Delete a user.')
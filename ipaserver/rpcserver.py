@@ -26,6 +26,7 @@ Also see the `ipalib.rpc` module.
 from xml.sax.saxutils import escape
 import os
 import traceback
+import zlib
 
 import gssapi
 import requests
@@ -47,7 +48,7 @@ from ipalib.backend import Executioner
 from ipalib.errors import (PublicError, InternalError, JSONError,
     CCacheError, RefererError, InvalidSessionPassword, NotFound, ACIError,
     ExecutionError, PasswordExpired, KrbPrincipalExpired, UserLocked)
-from ipalib.request import context, destroy_context
+from ipalib.request import context, destroy_context, params_record
 from ipalib.rpc import (xml_dumps, xml_loads,
     json_encode_binary, json_decode_binary)
 from ipapython.dn import DN
@@ -184,6 +185,35 @@ class HTTP_Status(plugable.Plugin):
         output = _unauthorized_template % dict(message=escape(message))
         return [output.encode('utf-8')]
 
+
+def accepts_gzip(environ):
+    """
+    Return True if the client accepts gzip content-encoding.
+    """
+    for coding in environ.get('HTTP_ACCEPT_ENCODING', '').split(','):
+        params = coding.split(';')
+        if params[0].strip().lower() not in ('gzip', 'x-gzip'):
+            continue
+        for param in params[1:]:
+            name, _sep, value = param.partition('=')
+            if name.strip() == 'q':
+                try:
+                    return float(value) > 0
+                except ValueError:
+                    return False
+        return True
+    return False
+
+
+def gzip_compress(data, compresslevel=6):
+    """
+    Compress ``data`` to the gzip format.
+    """
+    compressor = zlib.compressobj(compresslevel, zlib.DEFLATED,
+                                  16 + zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush()
+
+
 def read_input(environ):
     """
     Read the request body from environ['wsgi.input'].
@@ -303,6 +333,9 @@ class WSGIExecutioner(Executioner):
     headers = None
     content_type = None
     key = ''
+    # compress responses of at least this many bytes with gzip if the client
+    # accepts it, None disables compression
+    gzip_min_size = None
 
     _system_commands = {}
 
@@ -336,6 +369,7 @@ class WSGIExecutioner(Executioner):
         args = ()
         options = {}
         command = None
+        record = None
 
         e = None
         if not 'HTTP_REFERER' in environ:
@@ -364,7 +398,8 @@ class WSGIExecutioner(Executioner):
                 result = self._system_commands[name](self, *args, **options)
             else:
                 command = self._get_command(name)
-                result = command(*args, **options)
+                with params_record() as record:
+                    result = command(*args, **options)
         except PublicError as e:
             if self.api.env.debug:
                 self.debug('WSGI wsgi_execute PublicError: %s', traceback.format_exc())
@@ -379,15 +414,18 @@ class WSGIExecutioner(Executioner):
 
         principal = getattr(context, 'principal', 'UNKNOWN')
         if command is not None:
-            try:
-                params = command.args_options_2_params(*args, **options)
-            except Exception as e:
-                self.info(
-                   'exception %s caught when converting options: %s', e.__class__.__name__, str(e)
-                )
-                # get at least some context of what is going on
-                params = options
-                error = e
+            # reuse the params converted when the command was called
+            params = record.params if record is not None else None
+            if params is None:
+                try:
+                    params = command.args_options_2_params(*args, **options)
+                except Exception as e:
+                    self.info(
+                       'exception %s caught when converting options: %s', e.__class__.__name__, str(e)
+                    )
+                    # get at least some context of what is going on
+                    params = options
+                    error = e
             if error:
                 result_string = type(error).__name__
             else:
@@ -396,7 +434,7 @@ class WSGIExecutioner(Executioner):
                       type(self).__name__,
                       principal,
                       name,
-                      ', '.join(command._repr_iter(**params)),
+                      command._repr_params(params),
                       result_string)
         else:
             self.info('[%s] %s: %s: %s',
@@ -427,6 +465,10 @@ class WSGIExecutioner(Executioner):
             else:
                 headers = [('Content-Type',
                             self.content_type + '; charset=utf-8')]
+            if self._use_gzip(environ, response):
+                response = gzip_compress(response)
+                headers = headers + [('Content-Encoding', 'gzip'),
+                                     ('Vary', 'Accept-Encoding')]
         except Exception:
             self.exception('WSGI %s.__call__():', self.name)
             status = HTTP_STATUS_SERVER_ERROR
@@ -440,6 +482,20 @@ class WSGIExecutioner(Executioner):
         start_response(status, headers)
         return [response]
 
+    def _use_gzip(self, environ, response):
+        """
+        Return True if ``response`` should be compressed with gzip.
+
+        Apache compresses the responses itself with mod_deflate, so they are
+        compressed here only when not running in mod_wsgi, e.g. in the lite
+        server.
+        """
+        if self.gzip_min_size is None or len(response) < self.gzip_min_size:
+            return False
+        if 'mod_wsgi.version' in environ:
+            return False
+        return accepts_gzip(environ)
+
     def unmarshal(self, data):
         raise NotImplementedError('%s.unmarshal()' % type(self).__name__)
 
@@ -458,6 +514,7 @@ class jsonserver(WSGIExecutioner, HTTP_Status):
     """
 
     content_type = 'application/json'
+    gzip_min_size = 64 * 1024
 
     def __call__(self, environ, start_response):
         '''
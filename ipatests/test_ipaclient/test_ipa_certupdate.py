@@ -0,0 +1,37 @@
+#
+# Copyright (C) 2017  FreeIPA Contributors see COPYING for license
+#
+
+import threading
+
+import pytest
+
+from ipaclient.install import ipa_certupdate
+
+
+class FailingCertUpdate(ipa_certupdate.CertUpdate):
+    def __init__(self, failing):
+        self.failing = failing
+        self.updated = []
+        self.lock = threading.Lock()
+
+    def update_db(self, path, certs):
+        if path in self.failing:
+            raise RuntimeError('cannot update %s' % path)
+        with self.lock:
+            self.updated.append(path)
+
+
+def test_update_dbs():
+    tool = FailingCertUpdate(failing=())
+    tool.update_dbs(['/db1', '/db2', '/db3'], [])
+    assert sorted(tool.updated) == ['/db1', '/db2', '/db3']
+
+
+def test_update_dbs_error():
+    tool = FailingCertUpdate(failing=('/db2', '/db3'))
+    with pytest.raises(RuntimeError) as e:
+        tool.update_dbs(['/db1', '/db2', '/db3'], [])
+    # the first failure is reported after all databases were processed
+    assert str(e.value) == 'cannot update /db2'
+    assert tool.updated == ['/db1']
@@ -0,0 +1,256 @@
+#
+# Copyright (C) 2017  FreeIPA Contributors see COPYING for license
+#
+
+"""
+Tests for waiting on certmonger requests in `ipalib.install.certmonger`.
+"""
+
+import sys
+import types
+
+import pytest
+
+from ipalib.install import certmonger
+
+pytestmark = pytest.mark.tier0
+
+
+class FakeClock(object):
+    def __init__(self, certmonger):
+        self.now = 1000.0
+        self.certmonger = certmonger
+        self.sleeps = []
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+        self.certmonger.advance()
+
+
+class FakeCertmonger(object):
+    """
+    certmonger whose requests go through the given lists of states, one
+    state per advance() call
+    """
+    def __init__(self, states):
+        self.states = dict((request_id, list(seq))
+                           for request_id, seq in states.items())
+        self.bus = None
+        self.obj_if = self
+
+    def find_request_by_nickname(self, request_id):
+        if request_id in self.states:
+            return '/org/fedorahosted/certmonger/requests/%s' % request_id
+        return ''
+
+    def advance(self):
+        for seq in self.states.values():
+            if len(seq) > 1:
+                seq.pop(0)
+
+    def make_object(self, bus, parent, object_path, object_dbus_interface,
+                    parent_dbus_interface=None, property_interface=False):
+        if object_path == certmonger.DBUS_CM_PATH:
+            self.bus = bus
+            return self
+        return FakeRequest(self, object_path.rsplit('/', 1)[1])
+
+
+class FakeRequest(object):
+    def __init__(self, cm, request_id):
+        self.cm = cm
+        self.request_id = request_id
+        self.prop_if = self
+
+    def Get(self, interface, name):
+        assert (interface, name) == (certmonger.DBUS_CM_REQUEST_IF, 'status')
+        return self.cm.states[self.request_id][0]
+
+
+class FakeMatch(object):
+    removed = False
+
+    def remove(self):
+        self.removed = True
+
+
+class FakeBus(object):
+    def __init__(self, mainloop=None, private=False):
+        assert private
+        self.receivers = []
+        self.match = FakeMatch()
+        self.closed = False
+
+    def get_name_owner(self, name):
+        assert name == certmonger.DBUS_CM_NAME
+
+    def add_signal_receiver(self, handler, **kwargs):
+        self.receivers.append(handler)
+        return self.match
+
+    def close(self):
+        self.closed = True
+
+
+class FakeGLib(object):
+    """
+    GLib main loop; every iteration either emits a PropertiesChanged
+    signal or, when signals are not emitted, fires the timeout
+    """
+    def __init__(self, cm, clock, signals):
+        self.cm = cm
+        self.clock = clock
+        self.signals = signals
+        self.sources = {}
+        self.timeouts = []
+        self.iterations = 0
+        self.bus = None
+
+    def MainLoop(self):
+        return self
+
+    def timeout_add(self, interval, callback):
+        source = len(self.timeouts) + 1
+        self.timeouts.append(interval)
+        self.sources[source] = callback
+        return source
+
+    def source_remove(self, source):
+        del self.sources[source]
+
+    def run(self):
+        self.iterations += 1
+        (callback,) = self.sources.values()
+        if self.signals:
+            self.cm.advance()
+            for receiver in self.bus.receivers:
+                receiver(certmonger.DBUS_CM_REQUEST_IF, {}, [])
+        else:
+            self.clock.now += self.timeouts[-1] / 1000.0
+            self.cm.advance()
+            assert callback()
+
+    def quit(self):
+        pass
+
+
+@pytest.fixture
+def fake_certmonger(monkeypatch):
+    def setup(states):
+        cm = FakeCertmonger(states)
+        clock = FakeClock(cm)
+        monkeypatch.setattr(certmonger, 'time', clock)
+        monkeypatch.setattr(certmonger, '_cm_dbus_object', cm.make_object)
+        monkeypatch.setattr(certmonger, '_certmonger', lambda: cm)
+        return cm, clock
+    return setup
+
+
+@pytest.fixture
+def fake_glib(monkeypatch):
+    def setup(cm, clock, signals=True):
+        glib = FakeGLib(cm, clock, signals)
+
+        def system_bus(**kwargs):
+            glib.bus = FakeBus(**kwargs)
+            return glib.bus
+
+        gi = types.ModuleType('gi')
+        gi.repository = types.ModuleType('gi.repository')
+        gi.repository.GLib = glib
+        mainloop = types.ModuleType('dbus.mainloop.glib')
+        mainloop.DBusGMainLoop = lambda: None
+        monkeypatch.setitem(sys.modules, 'gi', gi)
+        monkeypatch.setitem(sys.modules, 'gi.repository', gi.repository)
+        monkeypatch.setitem(sys.modules, 'dbus.mainloop.glib', mainloop)
+        monkeypatch.setattr(certmonger.dbus, 'SystemBus', system_bus)
+        return glib
+    return setup
+
+
+def test_wait_for_requests_signal(fake_certmonger, fake_glib):
+    cm, clock = fake_certmonger({
+        '1': ['SUBMITTING', 'MONITORING'],
+        '2': ['SUBMITTING', 'SUBMITTING', 'CA_UNREACHABLE'],
+    })
+    glib = fake_glib(cm, clock)
+
+    assert certmonger.wait_for_requests(['1', '2']) == {
+        '1': 'MONITORING',
+        '2': 'CA_UNREACHABLE',
+    }
+    assert glib.iterations == 2
+    assert glib.timeouts == [5000, 5000]
+    assert glib.sources == {}
+    assert clock.sleeps == []
+    assert glib.bus.match.removed
+    assert glib.bus.closed
+
+
+def test_wait_for_requests_signal_missed(fake_certmonger, fake_glib):
+    cm, clock = fake_certmonger({'1': ['SUBMITTING', 'POST_SAVED_CERT',
+                                       'MONITORING']})
+    glib = fake_glib(cm, clock, signals=False)
+
+    assert certmonger.wait_for_requests(['1']) == {'1': 'MONITORING'}
+    assert glib.iterations == 2
+    assert glib.sources == {}
+    assert clock.now == 1010.0
+
+
+def test_wait_for_requests_signal_timeout(fake_certmonger, fake_glib):
+    cm, clock = fake_certmonger({'1': ['MONITORING'],
+                                 '2': ['SUBMITTING']})
+    glib = fake_glib(cm, clock, signals=False)
+
+    with pytest.raises(RuntimeError) as e:
+        certmonger.wait_for_requests(['1', '2'], timeout=7)
+    assert str(e.value) == 'request timed out'
+    assert glib.timeouts == [5000, 2000]
+    assert glib.sources == {}
+    assert glib.bus.match.removed
+    assert glib.bus.closed
+
+
+def test_wait_for_requests_poll(fake_certmonger, monkeypatch):
+    _cm, clock = fake_certmonger({
+        '1': ['SUBMITTING', 'MONITORING'],
+        '2': ['SUBMITTING', 'SUBMITTING', 'SUBMITTING', 'CA_REJECTED'],
+    })
+
+    def system_bus(**kwargs):
+        raise certmonger.dbus.DBusException('no system bus')
+
+    monkeypatch.setattr(certmonger.dbus, 'SystemBus', system_bus)
+
+    assert certmonger.wait_for_requests(['1', '2']) == {
+        '1': 'MONITORING',
+        '2': 'CA_REJECTED',
+    }
+    assert clock.sleeps == [0.5, 1.0, 2.0]
+
+
+def test_wait_for_requests_poll_timeout(fake_certmonger, monkeypatch):
+    _cm, clock = fake_certmonger({'1': ['SUBMITTING']})
+    # the GLib main loop integration is not available
+    monkeypatch.setitem(sys.modules, 'gi', None)
+    monkeypatch.setitem(sys.modules, 'gi.repository', None)
+
+    with pytest.raises(RuntimeError) as e:
+        certmonger.wait_for_requests(['1'], timeout=10)
+    assert str(e.value) == 'request timed out'
+    assert clock.sleeps == [0.5, 1.0, 2.0, 4.0, 2.5]
+
+
+def test_wait_for_requests_not_found(fake_certmonger, fake_glib):
+    cm, clock = fake_certmonger({})
+    glib = fake_glib(cm, clock)
+
+    with pytest.raises(RuntimeError) as e:
+        certmonger.wait_for_requests(['1'])
+    assert 'not found' in str(e.value)
+    assert glib.bus.closed
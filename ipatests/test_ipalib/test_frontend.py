@@ -32,7 +32,7 @@ from ipatests.util import assert_equal
 from ipalib.constants import TYPE_ERROR
 from ipalib.base import NameSpace
 from ipalib import frontend, backend, plugable, errors, parameters, config
-from ipalib import output, messages
+from ipalib import output, messages, request
 from ipalib.parameters import Str
 from ipapython.version import API_VERSION
 
@@ -685,6 +685,29 @@ class test_Command(ClassChecker):
             assert o.run.__func__ is self.cls.run
         assert {'name': 'forward', 'messages': expected} == o.run(*args, **kw)
 
+    def test_params_record(self):
+        """
+        Test that the called command records its params.
+        """
+        class example(self.cls):
+            takes_args = 'key?'
+            takes_options = (parameters.Password('secret?'),)
+
+            def execute(self, *args, **options):
+                return dict(result=None)
+
+        api, _home = create_test_api(in_server=True)
+        api.add_plugin(example)
+        api.finalize()
+        cmd = api.Command.example
+        with request.params_record() as record:
+            cmd(u'var', secret=u'Private!', version=API_VERSION)
+        assert record.params == dict(
+            key=u'var', secret=u'Private!', version=API_VERSION)
+        params_repr = str(cmd._repr_params(record.params))
+        assert params_repr == ', '.join(cmd._repr_iter(**record.params))
+        assert 'Private!' not in params_repr
+
     def test_validate_output_basic(self):
         """
         Test the `ipalib.frontend.Command.validate_output` method.
@@ -438,6 +438,32 @@ class test_Param(ClassChecker):
             assert o.convert([None, value]) == (value,)
             assert o.convert([value, None]) == (value,)
 
+    def test_compile_convert(self):
+        """
+        Test the `ipalib.parameters.Param._compile_convert` method.
+        """
+        values = NULLS + (u'Hello', u'1', b'1', 1, 0, True, False, 4.2,
+                          [u'a', u'b'])
+        params = (
+            self.cls('my_param'),
+            parameters.Str('my_str'),
+            parameters.Str('my_multi', multivalue=True),
+            parameters.Flag('my_flag'),
+            parameters.Int('my_int'),
+            parameters.Bytes('my_bytes'),
+        )
+        for param in params:
+            convert = param._compile_convert()
+            for value in values:
+                try:
+                    expected = param.convert(value)
+                except Exception as e:
+                    raises(type(e), convert, value)
+                else:
+                    converted = convert(value)
+                    assert converted == expected
+                    assert type(converted) is type(expected)
+
     def test_convert_scalar(self):
         """
         Test the `ipalib.parameters.Param._convert_scalar` method.
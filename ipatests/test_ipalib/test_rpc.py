@@ -101,6 +101,25 @@ def test_round_trip():
     assert round_trip(compound) == tuple(compound)
 
 
+def test_json_round_trip():
+    """
+    Test `ipalib.rpc.json_encode_binary` and `ipalib.rpc.json_decode_binary`.
+    """
+    value = dict(
+        result=(dict(cn=(u'one', u'two'), data=binary_bytes,
+                     count=2, flag=True, empty=None),),
+        truncated=False,
+    )
+    dump = rpc.json_encode_binary(value, API_VERSION)
+    assert type(dump) is unicode
+    loaded = rpc.json_decode_binary(dump)
+    assert loaded == value
+    assert type(loaded['result'][0]['data']) is bytes
+    assert rpc.json_decode_binary(
+        rpc.json_encode_binary(value, API_VERSION, pretty_print=True)
+    ) == value
+
+
 def test_xml_wrap():
     """
     Test the `ipalib.rpc.xml_wrap` function.
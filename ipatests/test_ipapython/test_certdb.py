@@ -0,0 +1,201 @@
+#
+# Copyright (C) 2017  FreeIPA Contributors see COPYING for license
+#
+
+"""
+Tests for the batched certutil operations of `ipapython.certdb`.
+"""
+
+import base64
+import shlex
+
+import pytest
+
+from ipapython import certdb, ipautil
+
+pytestmark = pytest.mark.tier0
+
+
+class FakeResult(object):
+    def __init__(self, output):
+        self.output = output
+
+
+class FakeNSSDatabase(certdb.NSSDatabase):
+    """
+    NSSDatabase which runs certutil commands against a dict mapping
+    nicknames to lists of [DER certificate, trust flags] pairs.
+    Adding or deleting nicknames in ``broken`` fails.
+    """
+    def __init__(self, nssdir, certs=(), broken=()):
+        super(FakeNSSDatabase, self).__init__(nssdir)
+        self.certs = {}
+        for cert, nick, flags in certs:
+            self.certs.setdefault(nick, []).append([cert, flags])
+        self.broken = broken
+        self.processes = []
+        self.batches = []
+
+    def run_certutil(self, args, stdin=None, **kwargs):
+        self.processes.append(args)
+        if args[0] == '-B':
+            with open(args[2]) as f:
+                commands = [shlex.split(line) for line in f]
+            self.batches.append(commands)
+            output = []
+            for command in commands:
+                output.append(self._run(command, None))
+            return FakeResult(''.join(output))
+        return FakeResult(self._run(args, stdin))
+
+    def _fail(self, args):
+        raise ipautil.CalledProcessError(255, ' '.join(args))
+
+    def _run(self, args, stdin):
+        opts = dict(zip(args[1::2], args[2::2]))
+        nick = opts.get('-n')
+        if args == ['-L']:
+            return ''.join('%-40s %s\n' % (n, flags)
+                           for n, certs in sorted(self.certs.items())
+                           for _cert, flags in certs)
+        elif args[0] == '-L':
+            if nick not in self.certs:
+                self._fail(args)
+            return ''.join(
+                '-----BEGIN CERTIFICATE-----\n%s\n'
+                '-----END CERTIFICATE-----\n' %
+                base64.b64encode(cert).decode('ascii')
+                for cert, _flags in self.certs[nick])
+        elif args[0] == '-A':
+            if nick in self.broken:
+                self._fail(args)
+            if '-i' in opts:
+                with open(opts['-i'], 'rb') as f:
+                    cert = f.read()
+            else:
+                cert = stdin
+            certs = self.certs.setdefault(nick, [])
+            for pair in certs:
+                if pair[0] == cert:
+                    pair[1] = opts['-t']
+                    break
+            else:
+                certs.append([cert, opts['-t']])
+            return ''
+        elif args[0] == '-D':
+            if nick in self.broken or nick not in self.certs:
+                self._fail(args)
+            del self.certs[nick][0]
+            if not self.certs[nick]:
+                del self.certs[nick]
+            return ''
+        raise AssertionError(args)
+
+
+def test_run_certutil_batch(tmpdir):
+    tmpdir.join('ca.der').write_binary(b'ca')
+    filename = str(tmpdir.join('ca.der'))
+    db = FakeNSSDatabase(str(tmpdir))
+    result = db.run_certutil_batch([
+        ['-A', '-n', 'EXAMPLE.COM IPA CA', '-t', 'CT,C,C', '-i', filename],
+        ['-A', '-n', '', '-t', 'C,,', '-i', filename],
+        ['-L', '-n', 'EXAMPLE.COM IPA CA', '-a'],
+    ])
+
+    assert len(db.processes) == 1
+    assert db.batches == [[
+        ['-A', '-n', 'EXAMPLE.COM IPA CA', '-t', 'CT,C,C', '-i', filename],
+        ['-A', '-n', '', '-t', 'C,,', '-i', filename],
+        ['-L', '-n', 'EXAMPLE.COM IPA CA', '-a'],
+    ]]
+    assert 'BEGIN CERTIFICATE' in result.output
+
+    for arg in ('a "quoted" nickname', 'two\nlines'):
+        with pytest.raises(ValueError):
+            db.run_certutil_batch([['-D', '-n', arg]])
+    assert len(db.processes) == 1
+
+
+def test_add_certs(tmpdir):
+    db = FakeNSSDatabase(str(tmpdir), certs=[
+        (b'ca1', 'CA', 'CT,C,C'),
+        (b'ca2', 'CA', 'CT,C,C'),
+        (b'other', 'Other', 'C,,'),
+    ])
+    failed = db.add_certs([
+        # present
+        (b'ca2', 'CA', 'TC,C,C'),
+        (b'other', 'Other', 'C,,'),
+        # present under another nickname
+        (b'other', 'CA', 'CT,C,C'),
+        # trust flags differ
+        (b'ca1', 'Other', 'CT,C,C'),
+        (b'new', 'New CA', 'CT,C,C'),
+    ])
+
+    assert failed == []
+    assert db.certs == {
+        'CA': [[b'ca1', 'CT,C,C'], [b'ca2', 'CT,C,C'],
+               [b'other', 'CT,C,C']],
+        'Other': [[b'other', 'C,,'], [b'ca1', 'CT,C,C']],
+        'New CA': [[b'new', 'CT,C,C']],
+    }
+    # list, look up the candidates, add in a single process
+    assert len(db.processes) == 3
+    assert db.batches[0] == [['-L', '-n', 'CA', '-a'],
+                             ['-L', '-n', 'Other', '-a']]
+    assert [cmd[:5] for cmd in db.batches[1]] == [
+        ['-A', '-n', 'CA', '-t', 'CT,C,C'],
+        ['-A', '-n', 'Other', '-t', 'CT,C,C'],
+        ['-A', '-n', 'New CA', '-t', 'CT,C,C'],
+    ]
+
+
+def test_add_certs_present(tmpdir):
+    db = FakeNSSDatabase(str(tmpdir), certs=[(b'ca', 'CA', 'CT,C,C')])
+    assert db.add_certs([(b'ca', 'CA', 'CT,C,C')]) == []
+    assert len(db.batches) == 1
+
+
+def test_add_certs_fallback(tmpdir):
+    db = FakeNSSDatabase(str(tmpdir), broken=['Broken'])
+    failed = db.add_certs([
+        (b'ca', 'CA', 'CT,C,C'),
+        (b'broken', 'Broken', 'CT,C,C'),
+        (b'other', 'Other', 'C,,'),
+    ])
+
+    assert [nick for nick, _e in failed] == ['Broken']
+    assert isinstance(failed[0][1], ipautil.CalledProcessError)
+    assert db.certs == {
+        'CA': [[b'ca', 'CT,C,C']],
+        'Other': [[b'other', 'C,,']],
+    }
+
+
+def test_delete_certs(tmpdir):
+    db = FakeNSSDatabase(str(tmpdir), certs=[
+        (b'ca1', 'CA', 'CT,C,C'),
+        (b'ca2', 'CA', 'CT,C,C'),
+        (b'other', 'Other', 'C,,'),
+        (b'kept', 'Kept', 'C,,'),
+    ])
+    assert db.delete_certs(['CA', 'Other', 'Missing']) == []
+
+    assert db.certs == {'Kept': [[b'kept', 'C,,']]}
+    # list and delete in a single process
+    assert len(db.processes) == 2
+    assert db.batches == [[
+        ['-D', '-n', 'CA'], ['-D', '-n', 'CA'], ['-D', '-n', 'Other']]]
+
+
+def test_delete_certs_fallback(tmpdir):
+    db = FakeNSSDatabase(str(tmpdir), certs=[
+        (b'broken', 'Broken', 'C,,'),
+        (b'ca1', 'CA', 'CT,C,C'),
+        (b'ca2', 'CA', 'CT,C,C'),
+    ], broken=['Broken'])
+    failed = db.delete_certs(['Broken', 'CA'])
+
+    assert [nick for nick, _e in failed] == ['Broken']
+    assert db.certs == {'Broken': [[b'broken', 'C,,']]}
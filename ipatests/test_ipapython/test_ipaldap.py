@@ -0,0 +1,165 @@
+#
+# Copyright (C) 2017  FreeIPA Contributors see COPYING for license
+#
+
+"""
+Tests for the `ipapython.ipaldap` module which do not need an LDAP server.
+"""
+
+import itertools
+
+import ldap
+import pytest
+
+from ipalib import errors
+from ipapython.dn import DN
+from ipapython.ipaldap import LDAPClient, TREE_DELETE_OID
+
+pytestmark = pytest.mark.tier0
+
+BASE_DN = DN(('dc', 'example'), ('dc', 'com'))
+TREE_DN = DN(('cn', 'tree'), BASE_DN)
+
+
+class FakeEntry(object):
+    def __init__(self, dn):
+        self.dn = dn
+
+
+class FakeConnection(object):
+    """
+    python-ldap connection deleting entries from a set of DNs
+    """
+    def __init__(self, entries):
+        self.entries = set(entries)
+        self.msgids = itertools.count(1)
+        self.pending = {}
+        self.max_pending = 0
+        self.deleted = []
+        self.tree_deletes = []
+
+    def _subtree(self, dn):
+        return [e for e in self.entries if e.endswith(dn)]
+
+    def delete_ext(self, dn):
+        msgid = next(self.msgids)
+        self.pending[msgid] = DN(dn)
+        self.max_pending = max(self.max_pending, len(self.pending))
+        return msgid
+
+    def result3(self, msgid):
+        dn = self.pending.pop(msgid)
+        if dn not in self.entries:
+            raise ldap.NO_SUCH_OBJECT({'desc': 'No such object'})
+        if len(self._subtree(dn)) > 1:
+            raise ldap.NOT_ALLOWED_ON_NONLEAF(
+                {'desc': 'Operation not allowed on non-leaf'})
+        self.entries.remove(dn)
+        self.deleted.append(dn)
+
+    def delete_ext_s(self, dn, serverctrls=None):
+        assert [c.controlType for c in serverctrls] == [TREE_DELETE_OID]
+        dn = DN(dn)
+        self.tree_deletes.append(dn)
+        self.entries.difference_update(self._subtree(dn))
+
+
+class FakeLDAPClient(LDAPClient):
+    """
+    LDAPClient whose searches return at most size_limit entries of the
+    subtree, ordered by the order function
+    """
+    def __init__(self, entries, controls=(), size_limit=None,
+                 order=len):
+        self.entries = entries
+        super(FakeLDAPClient, self).__init__('ldap://ipa.example.com')
+        self._supported_controls = frozenset(controls)
+        self.size_limit = size_limit
+        self.order = order
+        self.searches = 0
+
+    def _connect(self):
+        return FakeConnection(self.entries)
+
+    def iter_entries(self, filter=None, attrs_list=None, base_dn=None,
+                     scope=ldap.SCOPE_SUBTREE, **kwargs):
+        assert scope == ldap.SCOPE_SUBTREE
+        self.searches += 1
+        if base_dn not in self.conn.entries:
+            raise errors.NotFound(reason='no such entry')
+        dns = sorted(self.conn._subtree(base_dn), key=self.order)
+        for i, dn in enumerate(dns):
+            if i == self.size_limit:
+                raise errors.LimitsExceeded()
+            yield FakeEntry(dn)
+
+
+def make_tree():
+    """
+    Return DNs of a tree of 1 + 3 + 9 entries at TREE_DN, of its parent and
+    of an unrelated entry
+    """
+    entries = [BASE_DN, TREE_DN, DN(('cn', 'other'), BASE_DN)]
+    for i in range(3):
+        child = DN(('cn', 'child%d' % i), TREE_DN)
+        entries.append(child)
+        for j in range(3):
+            entries.append(DN(('cn', 'leaf%d' % j), child))
+    return entries
+
+
+def test_delete_subtree_tree_delete_control():
+    client = FakeLDAPClient(make_tree(), controls=[TREE_DELETE_OID])
+    client.delete_subtree(TREE_DN)
+
+    assert client.conn.tree_deletes == [TREE_DN]
+    assert client.conn.entries == {BASE_DN, DN(('cn', 'other'), BASE_DN)}
+    assert client.searches == 0
+
+
+def test_delete_subtree():
+    client = FakeLDAPClient(make_tree())
+    client.delete_subtree(TREE_DN, window=2)
+
+    assert client.conn.entries == {BASE_DN, DN(('cn', 'other'), BASE_DN)}
+    assert client.searches == 1
+    assert client.conn.max_pending == 2
+    # deepest entries first
+    depths = [len(dn) for dn in client.conn.deleted]
+    assert depths == sorted(depths, reverse=True)
+    assert client.conn.deleted[-1] == TREE_DN
+
+
+def test_delete_subtree_truncated():
+    # every search returns the first leaves, each pass makes progress
+    client = FakeLDAPClient(make_tree(), size_limit=4,
+                            order=lambda dn: -len(dn))
+    client.delete_subtree(TREE_DN)
+
+    assert client.conn.entries == {BASE_DN, DN(('cn', 'other'), BASE_DN)}
+    assert client.searches == 4
+
+
+def test_delete_subtree_truncated_nonleaf():
+    # every search returns only parents of entries which are not found
+    client = FakeLDAPClient(make_tree(), size_limit=4)
+    with pytest.raises(errors.NotAllowedOnNonLeaf):
+        client.delete_subtree(TREE_DN)
+
+    assert client.searches == 1
+    assert len(client.conn.entries) == len(make_tree())
+
+
+def test_delete_subtree_limits_exceeded():
+    client = FakeLDAPClient(make_tree(), size_limit=0)
+    with pytest.raises(errors.LimitsExceeded):
+        client.delete_subtree(TREE_DN)
+
+    assert client.searches == 1
+    assert len(client.conn.entries) == len(make_tree())
+
+
+def test_delete_subtree_not_found():
+    client = FakeLDAPClient(make_tree())
+    with pytest.raises(errors.NotFound):
+        client.delete_subtree(DN(('cn', 'missing'), BASE_DN))
@@ -22,6 +22,9 @@
 Test the `ipapython/ipautil.py` module.
 """
 
+import socket
+import threading
+
 import nose
 import pytest
 import six
@@ -479,3 +482,35 @@ def test_backcompat():
     assert rc is result.returncode
     assert out is result.output
     assert err is result.error_output
+
+
+def test_wait_for_endpoints(tmpdir):
+    listening = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listening.bind(('127.0.0.1', 0))
+    listening.listen(1)
+    port = listening.getsockname()[1]
+
+    socket_name = str(tmpdir.join('socket'))
+    unix = socket.socket(socket.AF_UNIX)
+
+    def open_socket():
+        unix.bind(socket_name)
+        unix.listen(1)
+
+    timer = threading.Timer(0.3, open_socket)
+    timer.start()
+    try:
+        report = ipautil.wait_for_endpoints(
+            [('127.0.0.1', port), socket_name], timeout=10)
+    finally:
+        timer.join()
+        listening.close()
+        unix.close()
+
+    assert set(report) == {('127.0.0.1', port), socket_name}
+    assert report[('127.0.0.1', port)] < report[socket_name]
+
+
+def test_wait_for_open_socket_timeout(tmpdir):
+    with pytest.raises(socket.timeout):
+        ipautil.wait_for_open_socket(str(tmpdir.join('socket')), timeout=0.2)
@@ -0,0 +1,96 @@
+#
+# Copyright (C) 2017  FreeIPA Contributors see COPYING for license
+#
+
+"""
+Tests for the audit logging of the `ipaserver.plugins.batch` module.
+"""
+
+import logging
+
+import pytest
+
+from ipalib import frontend, errors
+from ipalib.request import context
+from ipapython.version import API_VERSION
+from ipaserver.plugins import batch as batch_plugin
+from ipatests.util import create_test_api
+
+pytestmark = pytest.mark.tier0
+
+
+class example(frontend.Command):
+    takes_args = ('key',)
+
+    def execute(self, key, **options):
+        if key == u'fail':
+            raise errors.NotFound(reason=u'no such entry')
+        return dict(result=key)
+
+
+@pytest.fixture
+def api(monkeypatch):
+    api, _home = create_test_api(in_server=True)
+    api.add_plugin(example)
+    api.add_plugin(batch_plugin.batch)
+    api.finalize()
+    monkeypatch.setattr(batch_plugin, 'api', api)
+    monkeypatch.setattr(context, 'principal', u'admin@EXAMPLE.COM',
+                        raising=False)
+    return api
+
+
+class RecordingHandler(logging.Handler):
+    def __init__(self):
+        super(RecordingHandler, self).__init__()
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+@pytest.fixture
+def audit_log(api, monkeypatch):
+    logger = api.Command.batch.info.__self__
+    handler = RecordingHandler()
+    level = logger.level
+    monkeypatch.setattr(logger, 'propagate', False)
+    logger.setLevel(logging.INFO)
+    logger.addHandler(handler)
+    yield handler.messages
+    logger.removeHandler(handler)
+    logger.setLevel(level)
+
+
+def run_batch(api, key, version):
+    result = api.Command.batch(
+        [dict(method=u'example', params=([key], dict(version=version)))],
+        version=API_VERSION)
+    return result['results'][0]
+
+
+def audit_message(key, version, status):
+    return 'admin@EXAMPLE.COM: batch: example(%r, version=%r): %s' % (
+        key, version, status)
+
+
+def test_logged_params(api, audit_log):
+    result = run_batch(api, u'value', API_VERSION)
+
+    assert result['error'] is None
+    assert audit_log == [audit_message(u'value', API_VERSION, 'SUCCESS')]
+
+
+def test_logged_params_failed(api, audit_log):
+    result = run_batch(api, u'fail', API_VERSION)
+
+    assert result['error_name'] == u'NotFound'
+    assert audit_log == [audit_message(u'fail', API_VERSION, 'NotFound')]
+
+
+def test_logged_params_not_converted(api, audit_log):
+    # the version is checked before the params are converted
+    result = run_batch(api, u'value', u'999.0')
+
+    assert result['error_name'] == u'VersionError'
+    assert audit_log == [audit_message(u'value', u'999.0', 'VersionError')]
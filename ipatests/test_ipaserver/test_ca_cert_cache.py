@@ -0,0 +1,224 @@
+#
+# Copyright (C) 2017  FreeIPA Contributors see COPYING for license
+#
+
+"""
+Tests for the cache of CA certificates and chains in `ipaserver.plugins.ca`.
+"""
+
+import datetime
+
+import pytest
+
+from ipapython.dn import DN
+from ipaserver.plugins import ca as ca_plugin
+
+pytestmark = pytest.mark.tier0
+
+CA_ID = u'2ae1d4b1-7b2a-4f5e-9b4f-35f3c16b5c2a'
+OTHER_CA_ID = u'8b1e5e20-1e32-4f8a-9c7c-2b6b6c4b3f1d'
+CA_DN = DN(('cn', 'sub'), ('cn', 'cas'), ('cn', 'ca'), ('dc', 'example'),
+           ('dc', 'com'))
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 1500000000.0
+
+    def time(self):
+        return self.now
+
+
+class FakeCertificate(object):
+    def __init__(self, not_after):
+        self.not_valid_after = datetime.datetime.utcfromtimestamp(not_after)
+
+
+class FakeX509(object):
+    """
+    x509 module whose DER certificates are byte strings with an expiration
+    time looked up in ``not_after`` and whose PKCS#7 chains are lists
+    """
+    DER = 'der'
+
+    def __init__(self):
+        self.not_after = {}
+
+    def load_certificate(self, data, datatype):
+        return FakeCertificate(self.not_after[data])
+
+    def pkcs7_to_pems(self, data, datatype):
+        return list(data)
+
+    def normalize_certificate(self, pem):
+        return pem
+
+
+class FakeDogtag(object):
+    """
+    Lightweight CA backend serving the certificates and chains in ``certs``
+    and ``chains``
+    """
+    def __init__(self):
+        self.certs = {}
+        self.chains = {}
+        self.reads = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        pass
+
+    def read_ca_cert(self, ca_id):
+        self.reads.append((ca_id, 'cert'))
+        return self.certs[ca_id]
+
+    def read_ca_chain(self, ca_id):
+        self.reads.append((ca_id, 'chain'))
+        return self.chains[ca_id]
+
+    def disable_ca(self, ca_id):
+        pass
+
+    def delete_ca(self, ca_id):
+        del self.certs[ca_id]
+
+
+class FakeBackend(object):
+    def __init__(self, dogtag):
+        self.ra_lightweight_ca = dogtag
+
+
+class FakeCommands(object):
+    def ca_is_enabled(self):
+        return dict(result=True)
+
+    def ca_show(self, cn):
+        return dict(result=dict(ipacaid=[CA_ID]))
+
+
+class FakeAPI(object):
+    def __init__(self, dogtag):
+        self.Backend = FakeBackend(dogtag)
+        self.Command = FakeCommands()
+
+
+class FakeLDAP(object):
+    def can_delete(self, dn):
+        return True
+
+
+@pytest.fixture
+def dogtag(monkeypatch):
+    ca_plugin.invalidate_ca_cache()
+    dogtag = FakeDogtag()
+    clock = FakeClock()
+    fake_x509 = FakeX509()
+    monkeypatch.setattr(ca_plugin, 'api', FakeAPI(dogtag))
+    monkeypatch.setattr(ca_plugin, 'time', clock)
+    monkeypatch.setattr(ca_plugin, 'x509', fake_x509)
+
+    def add(ca_id, cert, lifetime=365 * 86400):
+        dogtag.certs[ca_id] = cert
+        dogtag.chains[ca_id] = [cert, b'root']
+        fake_x509.not_after[cert] = clock.now + lifetime
+        fake_x509.not_after[b'root'] = clock.now + 10 * 365 * 86400
+
+    dogtag.add = add
+    dogtag.clock = clock
+    yield dogtag
+    ca_plugin.invalidate_ca_cache()
+
+
+def show(ca_id=CA_ID, **options):
+    entry = dict(ipacaid=[ca_id])
+    ca_plugin.set_certificate_attrs(entry, options)
+    return entry
+
+
+def test_cached(dogtag):
+    dogtag.add(CA_ID, b'cert')
+    for _i in range(3):
+        entry = show(chain=True)
+        assert entry['certificate'] == u'Y2VydA=='
+        assert entry['certificate_chain'] == [b'cert', b'root']
+
+    assert dogtag.reads == [(CA_ID, 'cert'), (CA_ID, 'chain')]
+
+
+def test_cached_per_kind(dogtag):
+    dogtag.add(CA_ID, b'cert')
+    show()
+    show(chain=True)
+    show(all=True)
+
+    # the chain is read when it is asked for the first time
+    assert dogtag.reads == [(CA_ID, 'cert'), (CA_ID, 'chain')]
+
+
+def test_ttl(dogtag):
+    dogtag.add(CA_ID, b'cert')
+    show()
+    dogtag.add(CA_ID, b'renewed')
+
+    # a certificate renewed by certmonger in another process is picked up
+    # once the cached one expires from the cache
+    dogtag.clock.now += ca_plugin.CA_CERT_CACHE_TTL - 1
+    assert show()['certificate'] == u'Y2VydA=='
+    dogtag.clock.now += 1
+    assert show()['certificate'] == u'cmVuZXdlZA=='
+    assert len(dogtag.reads) == 2
+
+
+def test_not_after_certificate_expired(dogtag):
+    dogtag.add(CA_ID, b'cert', lifetime=60)
+    show(chain=True)
+    dogtag.add(CA_ID, b'renewed')
+
+    # the certificate expires before CA_CERT_CACHE_TTL
+    dogtag.clock.now += 60
+    entry = show(chain=True)
+    assert entry['certificate'] == u'cmVuZXdlZA=='
+    assert entry['certificate_chain'] == [b'renewed', b'root']
+    assert len(dogtag.reads) == 4
+
+
+def test_ca_mod_invalidates(dogtag):
+    dogtag.add(CA_ID, b'cert')
+    dogtag.add(OTHER_CA_ID, b'other')
+    show()
+    show(OTHER_CA_ID)
+    dogtag.add(CA_ID, b'renewed')
+
+    command = ca_plugin.ca_mod(FakeAPI(dogtag))
+    command.post_callback(FakeLDAP(), CA_DN, dict(ipacaid=[CA_ID]), u'sub')
+
+    assert show()['certificate'] == u'cmVuZXdlZA=='
+    assert show(OTHER_CA_ID)['certificate'] == u'b3RoZXI='
+    assert dogtag.reads == [(CA_ID, 'cert'), (OTHER_CA_ID, 'cert'),
+                            (CA_ID, 'cert')]
+
+
+def test_ca_del_invalidates(dogtag):
+    dogtag.add(CA_ID, b'cert')
+    show(chain=True)
+
+    command = ca_plugin.ca_del(FakeAPI(dogtag))
+    command.pre_callback(FakeLDAP(), CA_DN, u'sub')
+
+    # the certificate of a deleted CA is not served from the cache
+    with pytest.raises(KeyError):
+        show()
+
+
+def test_invalidate_all(dogtag):
+    dogtag.add(CA_ID, b'cert')
+    dogtag.add(OTHER_CA_ID, b'other')
+    show()
+    show(OTHER_CA_ID)
+
+    ca_plugin.invalidate_ca_cache()
+    show()
+    show(OTHER_CA_ID)
+    assert len(dogtag.reads) == 4
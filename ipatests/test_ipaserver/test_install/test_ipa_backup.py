@@ -0,0 +1,169 @@
+#
+# Copyright (C) 2017  FreeIPA Contributors see COPYING for license
+#
+
+"""
+Tests for the `ipaserver.install.ipa_backup` module.
+"""
+
+import io
+import logging
+import os
+
+import ldif
+import pytest
+
+from ipalib import errors
+from ipapython.dn import DN
+from ipaserver.install import ipa_backup
+
+pytestmark = pytest.mark.tier0
+
+log = logging.getLogger(__name__)
+
+
+class FakeEntry(object):
+    def __init__(self, dn, **attrs):
+        self.dn = DN(dn)
+        self.raw = {name: [v.encode('utf-8') for v in values]
+                    for name, values in attrs.items()}
+
+    def get(self, name, default=None):
+        values = self.raw.get(name.lower())
+        if values is None:
+            return default
+        return [v.decode('utf-8') for v in values]
+
+    @property
+    def single_value(self):
+        return {name: values[0].decode('utf-8')
+                for name, values in self.raw.items()}
+
+
+class FakeConnection(object):
+    def __init__(self, entries):
+        self.entries = entries
+        self.searches = []
+
+    def find_entries(self, filter, attrs_list, base_dn, **kwargs):
+        self.searches.append((filter, attrs_list, base_dn))
+        if not self.entries:
+            raise errors.EmptyResult(reason='no matching entry found')
+        return list(self.entries), False
+
+
+class FakeAPI(object):
+    class env(object):
+        host = 'ipa.example.com'
+
+
+def usn2ldif(tmpdir, entries):
+    backup = ipa_backup.Backup.__new__(ipa_backup.Backup)
+    backup._conn = FakeConnection(entries)
+    backup.dir = str(tmpdir)
+    backup.log = log
+    backup.usn2ldif('EXAMPLE-COM', 'ipaca', 10)
+
+    parser = ldif.LDIFRecordList(io.open(os.path.join(
+        str(tmpdir), ipa_backup.INCREMENTAL_LDIF % ('EXAMPLE-COM', 'ipaca')),
+        'rb'))
+    parser.parse()
+    with open(os.path.join(str(tmpdir), ipa_backup.INCREMENTAL_DELETED %
+                           ('EXAMPLE-COM', 'ipaca'))) as f:
+        deleted = [DN(line.strip()) for line in f]
+    return backup._conn, parser.all_records, deleted
+
+
+def test_usn2ldif(tmpdir):
+    entries = [
+        FakeEntry('cn=1,ou=ca,ou=requests,o=ipaca',
+                  objectclass=['top', 'request'], cn=['1'],
+                  nsuniqueid=['11111111-11111111-11111111-11111111']),
+        FakeEntry('ou=requests,o=ipaca',
+                  objectclass=['top', 'organizationalUnit'],
+                  ou=['requests'],
+                  nsuniqueid=['22222222-22222222-22222222-22222222']),
+        FakeEntry('nsuniqueid=ffffffff-ffffffff-ffffffff-ffffffff,o=ipaca',
+                  objectclass=['top', 'nsTombstone', 'extensibleObject'],
+                  nsuniqueid=['ffffffff-ffffffff-ffffffff-ffffffff']),
+        FakeEntry('nsuniqueid=33333333-33333333-33333333-33333333+cn=2,'
+                  'ou=ca,ou=requests,o=ipaca',
+                  objectclass=['top', 'request', 'nsTombstone'], cn=['2'],
+                  nsuniqueid=['33333333-33333333-33333333-33333333']),
+    ]
+    conn, records, deleted = usn2ldif(tmpdir, entries)
+
+    filter, attrs_list, base_dn = conn.searches[0]
+    assert 'entryusn>=11' in filter
+    assert 'nsuniqueid' in attrs_list
+    assert base_dn == DN(('o', 'ipaca'))
+
+    # parents first, the RUV and tombstones are not restored as entries
+    assert [DN(dn) for dn, _entry in records] == [
+        DN('ou=requests,o=ipaca'),
+        DN('cn=1,ou=ca,ou=requests,o=ipaca'),
+    ]
+    assert records[1][1]['nsuniqueid'] == [
+        b'11111111-11111111-11111111-11111111']
+    assert deleted == [DN('cn=2,ou=ca,ou=requests,o=ipaca')]
+
+
+def test_usn2ldif_no_changes(tmpdir):
+    _conn, records, deleted = usn2ldif(tmpdir, [])
+    assert records == []
+    assert deleted == []
+
+
+def write_header(backup_dir, **options):
+    os.mkdir(backup_dir)
+    with open(os.path.join(backup_dir, 'header'), 'w') as f:
+        f.write('[ipa]\n')
+        for name, value in options.items():
+            f.write('%s = %s\n' % (name, value))
+
+
+def test_find_base_backup(tmpdir, monkeypatch):
+    monkeypatch.setattr(ipa_backup.paths, 'IPA_BACKUP_DIR', str(tmpdir))
+    monkeypatch.setattr(ipa_backup, 'api', FakeAPI)
+
+    write_header(str(tmpdir.join('ipa-full-1')), host='ipa.example.com',
+                 time='2017-01-01T00:00:00', lastusn='100')
+    write_header(str(tmpdir.join('ipa-data-2')), host='ipa.example.com',
+                 time='2017-01-02T00:00:00', lastusn='200')
+    # newer, but no USN recorded or made on another host
+    write_header(str(tmpdir.join('ipa-full-3')), host='ipa.example.com',
+                 time='2017-01-03T00:00:00')
+    write_header(str(tmpdir.join('ipa-full-4')), host='ipa2.example.com',
+                 time='2017-01-04T00:00:00', lastusn='400')
+    tmpdir.join('not-a-backup').write('')
+
+    backup = ipa_backup.Backup.__new__(ipa_backup.Backup)
+    backup.log = log
+    assert backup.find_base_backup() == ('ipa-data-2', 200)
+
+
+def test_archive_members(tmpdir):
+    tmpdir.join('etc', 'sub', 'file').write('x', ensure=True)
+    tmpdir.join('etc', 'file').write('y')
+    tmpdir.join('etc', 'backup', 'old.tar').write('z', ensure=True)
+    tmpdir.join('etc', 'link').mksymlinkto(tmpdir.join('etc', 'sub'))
+    tmpdir.join('single').write('s')
+    tmpdir.join('structure', 'ignored').write('i', ensure=True)
+
+    def path(*names):
+        return str(tmpdir.join(*names))
+
+    members = ipa_backup.archive_members(
+        [path('etc'), path('single'), path('missing'), path('etc', 'file')],
+        [path('structure'), path('missing-dir')],
+        exclude=(path('etc', 'backup'),))
+
+    assert members == [
+        path('etc'),
+        path('etc', 'link'),
+        path('etc', 'file'),
+        path('etc', 'sub'),
+        path('etc', 'sub', 'file'),
+        path('single'),
+        path('structure'),
+    ]
@@ -0,0 +1,273 @@
+#
+# Copyright (C) 2017  FreeIPA Contributors see COPYING for license
+#
+
+"""
+Tests for the `ipaserver.install.ipa_restore` module.
+"""
+
+import io
+import logging
+import os
+
+import pytest
+
+from ipalib import errors
+from ipapython import admintool
+from ipapython.dn import DN
+from ipapython.ipautil import CIDict
+from ipaserver.install import ipa_restore
+
+pytestmark = pytest.mark.tier0
+
+log = logging.getLogger(__name__)
+
+RUV_ENTRY = (
+    b"dn: nsuniqueid=ffffffff-ffffffff-ffffffff-ffffffff,dc=example,dc=com\n"
+    b"objectClass: top\n"
+    b"objectClass: nsTombstone\n"
+    b"objectClass: extensibleobject\n"
+    b"nsuniqueid: ffffffff-ffffffff-ffffffff-ffffffff\n"
+    b"nsds50ruv: {replicageneration} 58ad8d3a000000040000\n"
+)
+
+
+def make_entry(i):
+    return (
+        b"dn: uid=user%d,cn=users,cn=accounts,dc=example,dc=com\n"
+        b"objectClass: top\n"
+        b"objectClass: person\n"
+        b"uid: user%d\n"
+        b"description: a long value which is continued on the next line a\n"
+        b" nd ends here\n"
+        b"nsuniqueid: %08x-11111111-22222222-33333333\n" % (i, i, i)
+    )
+
+
+def make_ldif(count, ruv_position):
+    entries = [make_entry(i) for i in range(count)]
+    expected = b"\n".join(entries)
+    entries.insert(ruv_position, RUV_ENTRY)
+    return b"version: 1\n" + b"\n".join(entries), b"version: 1\n" + expected
+
+
+@pytest.mark.parametrize('ruv_position', [0, 10, 100])
+@pytest.mark.parametrize('bufsize', [64, 1024 * 1024])
+def test_remove_ruv(ruv_position, bufsize):
+    data, expected = make_ldif(100, ruv_position)
+    out = io.BytesIO()
+    ipa_restore.remove_ruv(io.BytesIO(data), out, log, bufsize=bufsize)
+    assert out.getvalue() == expected
+
+
+@pytest.mark.parametrize('bufsize', [64, 1024 * 1024])
+def test_remove_ruv_trailing_empty_line(bufsize):
+    data, expected = make_ldif(10, 10)
+    out = io.BytesIO()
+    ipa_restore.remove_ruv(io.BytesIO(data + b"\n"), out, log,
+                           bufsize=bufsize)
+    assert out.getvalue() == expected + b"\n"
+
+
+def test_remove_ruv_keeps_other_tombstones():
+    tombstone = (
+        b"dn: nsuniqueid=12345678-11111111-22222222-33333333,"
+        b"uid=deleted,dc=example,dc=com\n"
+        b"objectClass: nsTombstone\n"
+        b"nsuniqueid: 12345678-11111111-22222222-33333333\n"
+        b"description: ffffffff-ffffffff-ffffffff-ffffffff\n"
+    )
+    out = io.BytesIO()
+    ipa_restore.remove_ruv(io.BytesIO(tombstone), out, log)
+    assert out.getvalue() == tombstone
+
+
+class FakeEntry(CIDict):
+    def __init__(self, dn, raw=()):
+        super(FakeEntry, self).__init__(raw)
+        self.dn = DN(dn)
+
+    @property
+    def raw(self):
+        return self
+
+    @property
+    def single_value(self):
+        return CIDict((name, values[0].decode('utf-8'))
+                      for name, values in self.items() if values)
+
+
+class FakeConnection(object):
+    """
+    Directory with raw values of entries stored by DN, names of attributes
+    are lower case
+    """
+    def __init__(self, entries=None):
+        self.entries = dict(entries or {})
+
+    def make_filter_from_attr(self, attr, value):
+        return (attr, value)
+
+    def make_entry(self, dn):
+        return FakeEntry(dn)
+
+    def get_entry(self, dn, attrs_list=None):
+        try:
+            return FakeEntry(dn, self.entries[dn])
+        except KeyError:
+            raise errors.NotFound(reason='entry not found')
+
+    def find_entries(self, filter, attrs_list=None, base_dn=None):
+        attr, value = filter
+        found = [FakeEntry(dn, raw) for dn, raw in self.entries.items()
+                 if dn.endswith(base_dn) and
+                 value.encode('utf-8') in raw.get(attr, [])]
+        if not found:
+            raise errors.EmptyResult(reason='no matching entry found')
+        return found, False
+
+    def _store(self, entry):
+        return {name.lower(): values
+                for name, values in entry.items() if values}
+
+    def add_entry(self, entry):
+        assert entry.dn not in self.entries
+        self.entries[entry.dn] = self._store(entry)
+
+    def update_entry(self, entry):
+        raw = self._store(entry)
+        if raw == self.entries[entry.dn]:
+            raise errors.EmptyModlist()
+        self.entries[entry.dn] = raw
+
+    def move_entry(self, dn, new_dn):
+        assert new_dn not in self.entries
+        self.entries[new_dn] = self.entries.pop(dn)
+
+    def delete_entry(self, dn):
+        del self.entries[dn]
+
+
+SUFFIX = DN('dc=example,dc=com')
+ACTIVE = DN('uid=tuser,cn=users,cn=accounts,dc=example,dc=com')
+DELETED = DN('uid=tuser,cn=deleted users,cn=accounts,cn=provisioning,'
+             'dc=example,dc=com')
+UNIQUEID = b'12345678-11111111-22222222-33333333'
+
+
+def apply_incremental(conn, data):
+    parser = ipa_restore.ApplyIncrementalParser(
+        io.BytesIO(b"version: 1\n" + data), conn, log, SUFFIX)
+    parser.parse()
+    return parser
+
+
+def test_apply_incremental_add():
+    conn = FakeConnection()
+    parser = apply_incremental(conn, (
+        b"dn: %s\n"
+        b"objectClass: person\n"
+        b"uid: tuser\n"
+        b"nsUniqueId: %s\n" % (str(ACTIVE).encode('utf-8'), UNIQUEID)))
+
+    assert (parser.count, parser.renamed) == (1, 0)
+    # nsuniqueid is assigned by the server
+    assert conn.entries[ACTIVE] == {
+        'objectclass': [b'person'], 'uid': [b'tuser']}
+
+
+def test_apply_incremental_update():
+    conn = FakeConnection({ACTIVE: {
+        'objectclass': [b'person'], 'uid': [b'tuser'],
+        'description': [b'old'], 'nsuniqueid': [UNIQUEID]}})
+    parser = apply_incremental(conn, (
+        b"dn: %s\n"
+        b"objectClass: person\n"
+        b"uid: tuser\n"
+        b"telephoneNumber: 123\n"
+        b"nsUniqueId: %s\n" % (str(ACTIVE).encode('utf-8'),
+                                UNIQUEID.upper())))
+
+    assert (parser.count, parser.renamed) == (1, 0)
+    assert conn.entries[ACTIVE] == {
+        'objectclass': [b'person'], 'uid': [b'tuser'],
+        'telephonenumber': [b'123'], 'nsuniqueid': [UNIQUEID]}
+
+
+def test_apply_incremental_renamed():
+    # the user was preserved after the base backup
+    conn = FakeConnection({ACTIVE: {
+        'objectclass': [b'person'], 'uid': [b'tuser'],
+        'nsuniqueid': [UNIQUEID]}})
+    parser = apply_incremental(conn, (
+        b"dn: %s\n"
+        b"objectClass: person\n"
+        b"uid: tuser\n"
+        b"nsUniqueId: %s\n" % (str(DELETED).encode('utf-8'), UNIQUEID)))
+
+    assert (parser.count, parser.renamed) == (1, 1)
+    assert list(conn.entries) == [DELETED]
+    assert conn.entries[DELETED]['nsuniqueid'] == [UNIQUEID]
+
+
+def test_apply_incremental_renamed_dn_taken():
+    # the user was preserved and a new user with the same name was added
+    other = b'87654321-11111111-22222222-33333333'
+    conn = FakeConnection({
+        ACTIVE: {'objectclass': [b'person'], 'uid': [b'tuser'],
+                 'nsuniqueid': [UNIQUEID]},
+        DELETED: {'objectclass': [b'person'], 'uid': [b'tuser'],
+                  'nsuniqueid': [other]},
+    })
+    parser = apply_incremental(conn, (
+        b"dn: %s\n"
+        b"objectClass: person\n"
+        b"uid: tuser\n"
+        b"description: preserved\n"
+        b"nsUniqueId: %s\n" % (str(DELETED).encode('utf-8'), UNIQUEID)))
+
+    assert (parser.count, parser.renamed) == (1, 1)
+    assert list(conn.entries) == [DELETED]
+    assert conn.entries[DELETED]['description'] == [b'preserved']
+
+
+def write_header(backup_dir, base=None):
+    os.mkdir(backup_dir)
+    with open(os.path.join(backup_dir, 'header'), 'w') as f:
+        f.write('[ipa]\ntype = DATA\n')
+        if base is not None:
+            f.write('base = %s\n' % base)
+
+
+def test_backup_chain(tmpdir, monkeypatch):
+    monkeypatch.setattr(ipa_restore.paths, 'IPA_BACKUP_DIR', str(tmpdir))
+    write_header(str(tmpdir.join('ipa-data-1')))
+    write_header(str(tmpdir.join('ipa-incremental-2')), base='ipa-data-1')
+    write_header(str(tmpdir.join('ipa-incremental-3')),
+                 base='ipa-incremental-2')
+
+    assert ipa_restore.backup_chain(str(tmpdir.join('ipa-data-1'))) == [
+        str(tmpdir.join('ipa-data-1'))]
+    assert ipa_restore.backup_chain(
+        str(tmpdir.join('ipa-incremental-3'))) == [
+            str(tmpdir.join('ipa-data-1')),
+            str(tmpdir.join('ipa-incremental-2')),
+            str(tmpdir.join('ipa-incremental-3')),
+        ]
+
+
+def test_backup_chain_errors(tmpdir, monkeypatch):
+    monkeypatch.setattr(ipa_restore.paths, 'IPA_BACKUP_DIR', str(tmpdir))
+    write_header(str(tmpdir.join('ipa-incremental-1')), base='ipa-data-0')
+    write_header(str(tmpdir.join('ipa-incremental-2')),
+                 base='ipa-incremental-3')
+    write_header(str(tmpdir.join('ipa-incremental-3')),
+                 base='ipa-incremental-2')
+
+    with pytest.raises(admintool.ScriptError) as e:
+        ipa_restore.backup_chain(str(tmpdir.join('ipa-incremental-1')))
+    assert 'ipa-data-0' in str(e.value)
+    with pytest.raises(admintool.ScriptError) as e:
+        ipa_restore.backup_chain(str(tmpdir.join('ipa-incremental-3')))
+    assert 'based on itself' in str(e.value)
+
@@ -0,0 +1,233 @@
+#
+# Copyright (C) 2017  FreeIPA Contributors see COPYING for license
+#
+
+"""
+Tests for waiting on entries and replication updates in
+`ipaserver.install.replication`.
+"""
+
+import ldap
+import pytest
+
+from ipalib import errors
+from ipapython import ipaldap
+from ipapython.dn import DN
+from ipaserver.install import replication
+
+pytestmark = pytest.mark.tier0
+
+BASE_DN = DN(('dc', 'example'), ('dc', 'com'))
+ENTRY_DN = DN(('cn', 'replica'), ('cn', 'masters'), BASE_DN)
+AGMT_DN = DN(('cn', 'meToreplica.example.com'), ('cn', 'replica'),
+             ('cn', 'dc\\3Dexample\\2Cdc\\3Dcom'), ('cn', 'mapping tree'),
+             ('cn', 'config'))
+
+
+class FakeEntry(object):
+    def __init__(self, dn, attrs=None):
+        self.dn = dn
+        self.single_value = attrs or {}
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(replication, 'time', clock)
+    return clock
+
+
+class FakeConnection(object):
+    """
+    LDAPClient whose persistent searches return ``psearch`` entries, or
+    raise it if it is an exception. The entry appears in the polled
+    searches once ``appears_at`` is reached.
+    """
+    MATCH_ALL = ipaldap.LDAPClient.MATCH_ALL
+    combine_filters = ipaldap.LDAPClient.combine_filters
+    make_filter_from_attr = ipaldap.LDAPClient.make_filter_from_attr
+
+    def __init__(self, clock, controls=(ipaldap.PERSISTENT_SEARCH_OID,),
+                 psearch=(), appears_at=None):
+        self.clock = clock
+        self.controls = controls
+        self.psearch = psearch
+        self.appears_at = appears_at
+        self.psearches = []
+        self.searches = 0
+
+    def get_supported_controls(self):
+        return self.controls
+
+    def persistent_search(self, filter, attrs_list, base_dn, scope,
+                          timeout=None):
+        self.psearches.append((filter, base_dn, scope, timeout))
+        if isinstance(self.psearch, Exception):
+            raise self.psearch
+        for entry in self.psearch:
+            yield entry
+
+    def get_entries(self, base_dn, scope, filter, attrs_list):
+        assert scope == ldap.SCOPE_BASE
+        self.searches += 1
+        if self.appears_at is None or self.clock.now < self.appears_at:
+            raise errors.NotFound(reason='no such entry')
+        return [FakeEntry(base_dn)]
+
+
+def test_wait_for_entry_persistent_search(clock):
+    conn = FakeConnection(clock, psearch=[
+        FakeEntry(DN(('cn', 'other'), ('cn', 'masters'), BASE_DN)),
+        FakeEntry(ENTRY_DN),
+    ])
+    replication.wait_for_entry(conn, ENTRY_DN, timeout=60,
+                               attr='objectclass')
+
+    assert conn.psearches == [(
+        '(&(cn=replica)(objectclass=*))', ENTRY_DN[1:],
+        ldap.SCOPE_ONELEVEL, 60)]
+    assert conn.searches == 0
+    assert clock.sleeps == []
+
+
+@pytest.mark.parametrize('psearch', [
+    errors.DatabaseTimeout(),
+    errors.NotFound(reason='no such entry'),
+])
+def test_wait_for_entry_persistent_search_failed(clock, psearch):
+    conn = FakeConnection(clock, psearch=psearch, appears_at=1002)
+    replication.wait_for_entry(conn, ENTRY_DN, timeout=60)
+
+    assert len(conn.psearches) == 1
+    assert conn.searches == 3
+    assert clock.sleeps == [1, 1]
+
+
+def test_wait_for_entry_poll(clock):
+    conn = FakeConnection(clock, controls=(), appears_at=1001)
+    replication.wait_for_entry(conn, ENTRY_DN, timeout=60)
+
+    assert conn.psearches == []
+    assert conn.searches == 2
+
+
+def test_wait_for_entry_timeout(clock):
+    conn = FakeConnection(clock, psearch=[])
+    with pytest.raises(errors.NotFound):
+        replication.wait_for_entry(conn, ENTRY_DN, timeout=3)
+
+    assert conn.searches == 3
+
+
+@pytest.mark.parametrize('value, sent', [
+    ('3:120/4 5:7/0', 127),
+    ('3:0/0', 0),
+    (None, None),
+    ('3:garbage', None),
+])
+def test_get_changes_sent(value, sent):
+    entry = FakeEntry(AGMT_DN,
+                      {'nsds5replicaChangesSentSinceStartup': value})
+    assert replication._get_changes_sent(entry) == sent
+
+
+def test_replication_progress():
+    assert replication.ReplicationProgress(4.0, sent=10).rate == 2.5
+    assert replication.ReplicationProgress(4.0).rate is None
+    assert replication.ReplicationProgress(4.0, sent=0).rate is None
+    assert replication.ReplicationProgress(0, sent=10).rate is None
+
+
+def test_print_progress(capsys):
+    replication.print_progress(replication.ReplicationProgress(4.5))
+    replication.print_progress(
+        replication.ReplicationProgress(5.0, sent=10))
+    out, _err = capsys.readouterr()
+    assert out == ('\rUpdate in progress, 4 seconds elapsed'
+                   '\rUpdate in progress, 5 seconds elapsed, '
+                   '10 changes sent (2.0/s)')
+
+
+class FakeAgreementConnection(object):
+    """
+    LDAPClient returning the agreement entry from the list of attribute
+    dicts, one per read, the last one is repeated
+    """
+    def __init__(self, states):
+        self.states = states
+
+    def get_entry(self, dn, attrs_list=None):
+        assert dn == AGMT_DN
+        attrs = self.states[0]
+        if len(self.states) > 1:
+            self.states.pop(0)
+        return FakeEntry(dn, attrs)
+
+
+def agreement(sent, inprogress='TRUE', start='20170101000000',
+              end='0'):
+    return {
+        'nsds5replicaUpdateInProgress': inprogress,
+        'nsds5ReplicaLastUpdateStatus': '0 Replica acquired successfully',
+        'nsds5ReplicaLastUpdateStart': start,
+        'nsds5ReplicaLastUpdateEnd': end,
+        'nsds5replicaChangesSentSinceStartup': sent,
+    }
+
+
+def test_wait_for_repl_update_progress(clock):
+    conn = FakeAgreementConnection([
+        agreement('3:100/0'),
+        agreement('3:100/0'),
+        agreement('3:150/0'),
+        agreement('3:190/0', inprogress='FALSE', end='20170101000001'),
+    ])
+    repl = replication.ReplicationManager(
+        'EXAMPLE.COM', 'replica.example.com', None, conn=conn)
+    reports = []
+
+    haserror, _msg = repl.wait_for_repl_update(conn, AGMT_DN,
+                                               progress=reports.append)
+
+    assert haserror == 0
+    # changes are counted from the start of the wait
+    assert [p.sent for p in reports] == [0, 50]
+    assert [p.elapsed for p in reports] == pytest.approx([1.0, 1.1])
+    assert clock.sleeps == [1, 0.1, 0.2]
+
+
+def test_wait_for_repl_init_progress(clock, capsys):
+    refresh = {
+        'nsds5BeginReplicaRefresh': 'start',
+        'nsds5replicaUpdateInProgress': 'TRUE',
+        'nsds5replicaChangesSentSinceStartup': '3:100/0',
+    }
+    conn = FakeAgreementConnection([
+        refresh,
+        refresh,
+        {'nsds5replicaUpdateInProgress': 'FALSE',
+         'nsds5ReplicaLastInitStatus': '0 Total update succeeded'},
+    ])
+    repl = replication.ReplicationManager(
+        'EXAMPLE.COM', 'replica.example.com', None, conn=conn)
+    reports = []
+
+    assert repl.wait_for_repl_init(conn, AGMT_DN,
+                                   progress=reports.append) == 0
+    # entries sent by a total update are not counted by the server
+    assert [p.sent for p in reports] == [None, None]
+    assert clock.sleeps == [0.1, 0.2, 0.4]
+    assert 'Update succeeded' in capsys.readouterr()[0]
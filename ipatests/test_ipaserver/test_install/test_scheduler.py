@@ -0,0 +1,126 @@
+#
+# Copyright (C) 2017  FreeIPA Contributors see COPYING for license
+#
+
+"""
+Tests for the `ipaserver.install.scheduler` module.
+"""
+
+import threading
+
+import pytest
+
+from ipaserver.install.scheduler import StepScheduler
+
+pytestmark = pytest.mark.tier0
+
+
+class Recorder(object):
+    def __init__(self):
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def __call__(self, name, result=False):
+        with self.lock:
+            self.calls.append(name)
+        return result
+
+
+@pytest.mark.parametrize('max_workers', [1, 4])
+def test_requires_and_locks_order(max_workers):
+    rec = Recorder()
+    scheduler = StepScheduler(max_workers=max_workers)
+    scheduler.step('a', rec, 'a', locks=['file'])
+    scheduler.step('b', rec, 'b')
+    scheduler.step('c', rec, 'c', locks=['file'])
+    scheduler.step('d', rec, 'd', requires=['b', 'c'])
+    results = scheduler.run()
+
+    assert sorted(rec.calls) == ['a', 'b', 'c', 'd']
+    assert rec.calls.index('a') < rec.calls.index('c')
+    assert rec.calls[-1] == 'd'
+    assert set(results) == {'a', 'b', 'c', 'd'}
+    assert set(scheduler.timings) == {'a', 'b', 'c', 'd'}
+
+
+def test_restarts_collapsed():
+    rec = Recorder()
+    restarts = []
+    scheduler = StepScheduler()
+    scheduler.add_restart_handler('svc', lambda: restarts.append('svc'))
+    scheduler.add_restart_handler('other', lambda: restarts.append('other'))
+    scheduler.step('a', rec, 'a', True, restarts=['svc'])
+    scheduler.step('b', rec, 'b', True, restarts=['svc'])
+    scheduler.step('c', rec, 'c', False, restarts=['other'])
+    scheduler.run()
+
+    assert restarts == ['svc']
+
+
+def test_failure_stops_scheduling():
+    rec = Recorder()
+    restarts = []
+
+    def fail():
+        raise RuntimeError('failed')
+
+    scheduler = StepScheduler()
+    scheduler.add_restart_handler('svc', lambda: restarts.append('svc'))
+    scheduler.step('a', rec, 'a', True, restarts=['svc'])
+    scheduler.step('b', fail, requires=['a'])
+    scheduler.step('c', rec, 'c', requires=['b'])
+
+    with pytest.raises(RuntimeError):
+        scheduler.run()
+
+    assert rec.calls == ['a']
+    assert restarts == []
+
+
+def test_unknown_requirement():
+    scheduler = StepScheduler()
+    with pytest.raises(ValueError):
+        scheduler.step('a', lambda: None, requires=['b'])
+
+
+def test_thread_setup_teardown():
+    local = threading.local()
+    seen = []
+
+    def setup():
+        local.conn = True
+
+    def teardown():
+        del local.conn
+
+    def check():
+        seen.append(getattr(local, 'conn', False))
+
+    scheduler = StepScheduler(max_workers=2, thread_setup=setup,
+                              thread_teardown=teardown)
+    scheduler.step('a', check)
+    scheduler.step('b', check)
+    scheduler.run()
+
+    assert seen == [True, True]
+
+
+def test_thread_setup_failure():
+    rec = Recorder()
+    teardowns = []
+
+    def setup():
+        raise RuntimeError('setup failed')
+
+    scheduler = StepScheduler(max_workers=2, thread_setup=setup,
+                              thread_teardown=lambda: teardowns.append(1))
+    scheduler.step('a', rec, 'a')
+    scheduler.step('b', rec, 'b')
+    scheduler.step('c', rec, 'c', requires=['a'])
+
+    with pytest.raises(RuntimeError) as e:
+        scheduler.run()
+
+    assert str(e.value) == 'setup failed'
+    assert rec.calls == []
+    assert teardowns == []
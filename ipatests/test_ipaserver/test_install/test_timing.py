@@ -0,0 +1,65 @@
+#
+# Copyright (C) 2017  FreeIPA Contributors see COPYING for license
+#
+
+"""
+Tests for the `ipaserver.install.timing` module.
+"""
+
+import json
+import os
+import threading
+import time
+
+import pytest
+
+from ipaserver.install import timing
+
+pytestmark = pytest.mark.tier0
+
+
+def test_timed_step_summary(tmpdir, monkeypatch):
+    monkeypatch.setenv(timing.PROFILE_ENV, str(tmpdir))
+    monkeypatch.setattr(timing, '_timings', [])
+
+    with timing.timed_step('testsvc', 'first step'):
+        sum(range(1000))
+
+    with pytest.raises(RuntimeError):
+        with timing.timed_step('testsvc', 'failing step'):
+            raise RuntimeError('failed')
+
+    summary_file = str(tmpdir.join('timings.json'))
+    timing.write_summary(summary_file, 'test')
+
+    with open(summary_file) as f:
+        summary = json.load(f)
+
+    assert summary['command'] == 'test'
+    assert [s['step'] for s in summary['steps']] == ['first step',
+                                                     'failing step']
+    assert [s['failed'] for s in summary['steps']] == [False, True]
+    profiles = [f for f in os.listdir(str(tmpdir)) if f.endswith('.prof')]
+    assert len(profiles) == 2
+
+
+def test_timed_step_in_thread(monkeypatch):
+    monkeypatch.setattr(timing, '_timings', [])
+
+    def step():
+        with timing.timed_step('testsvc', 'sleeping step'):
+            time.sleep(0.2)
+
+    t = threading.Thread(target=step)
+    t.start()
+    # CPU used by other threads must not be attributed to the step
+    while t.is_alive():
+        pass
+
+    [step_timing] = timing.get_timings()
+    assert step_timing.subprocess_cpu is None
+    if timing._RUSAGE_THREAD is None:
+        assert step_timing.cpu is None
+    else:
+        assert step_timing.cpu < 0.1
+    assert step_timing.as_dict()['subprocess_cpu'] is None
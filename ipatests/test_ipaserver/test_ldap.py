@@ -26,8 +26,11 @@
 # The DM password needs to be set in ~/.ipa/.dmpw
 
 import os
+import shutil
 import sys
+import tempfile
 
+import ldap
 import pytest
 import nose
 from nose.tools import assert_raises  # pylint: disable=E0611
@@ -38,6 +41,7 @@ from ipaserver.plugins.ldap2 import ldap2
 from ipalib import api, x509, create_api, errors
 from ipapython import ipautil
 from ipapython.dn import DN
+from ipapython.ipaldap import SchemaCache, SearchTimings
 
 if six.PY3:
     unicode = str
@@ -145,6 +149,63 @@ class test_ldap(object):
         serial = x509.load_certificate(cert, x509.DER).serial_number
         assert serial is not None
 
+    def test_search_timings(self):
+        """
+        Test the timings of a search reported by find_entries
+        """
+        self.conn = ldap2(api, ldap_uri=self.ldapuri)
+        self.conn.connect()
+        timings = SearchTimings()
+        entries, _truncated = self.conn.find_entries(
+            '(objectclass=*)', ['objectclass'], api.env.basedn,
+            self.conn.SCOPE_ONELEVEL, timings=timings)
+        assert timings.entries == len(entries)
+        assert timings.server > 0
+        assert timings.conversion >= 0
+
+    def test_iter_entries(self):
+        """
+        Test that iter_entries returns all pages of a paged search
+        """
+        self.conn = ldap2(api, ldap_uri=self.ldapuri)
+        self.conn.connect()
+        entries, _truncated = self.conn.find_entries(
+            '(objectclass=*)', ['objectclass'], api.env.basedn,
+            self.conn.SCOPE_ONELEVEL)
+        assert len(entries) > 2
+
+        iterated = list(self.conn.iter_entries(
+            '(objectclass=*)', ['objectclass'], api.env.basedn,
+            self.conn.SCOPE_ONELEVEL, page_size=2))
+        assert (sorted(e.dn for e in iterated) ==
+                sorted(e.dn for e in entries))
+
+        with assert_raises(errors.NotFound):
+            list(self.conn.iter_entries(
+                base_dn=DN(('cn', 'does not exist'), api.env.basedn)))
+
+    def test_schema_disk_cache(self):
+        """
+        Test that the schema is shared through the on-disk cache
+        """
+        self.conn = ldap2(api, ldap_uri=self.ldapuri)
+        self.conn.connect()
+        cache_dir = tempfile.mkdtemp()
+        try:
+            schema = SchemaCache(cache_dir).get_schema(
+                self.ldapuri, self.conn.conn)
+            assert os.listdir(cache_dir)
+
+            cache = SchemaCache(cache_dir)
+            version = cache._get_schema_version(self.conn.conn)
+            cached = cache._read_cached_schema(self.ldapuri, version)
+            assert cached is not None
+            assert (sorted(cached.listall(ldap.schema.ObjectClass)) ==
+                    sorted(schema.listall(ldap.schema.ObjectClass)))
+            assert cache._read_cached_schema(self.ldapuri, {}) is None
+        finally:
+            shutil.rmtree(cache_dir)
+
 
 @pytest.mark.tier0
 class test_LDAPEntry(object):
@@ -322,3 +383,34 @@ class test_LDAPEntry(object):
 
         e.raw['test'].append(b'second')
         assert e['test'] == ['not list', u'second']
+
+    def test_modlist_of_search_result(self):
+        result = [(str(self.dn1), {'cn': [b'test1'], 'description': [b'a']})]
+        e = self.conn._convert_result(result)[0]
+        assert e['cn'] == self.cn1
+        assert e.generate_modlist() == []
+
+        e['description'].append(u'b')
+        raw = e.raw['cn']
+        raw.append(b'test2')
+        assert sorted(e.generate_modlist()) == [
+            (ldap.MOD_ADD, 'cn', [b'test2']),
+            (ldap.MOD_ADD, 'description', [b'b']),
+        ]
+
+        e.reset_modlist()
+        assert e.generate_modlist() == []
+
+    def test_encode_decode(self):
+        conn = self.conn
+        assert conn.encode(True) == 'TRUE'
+        assert conn.encode(42) == b'42'
+        assert conn.encode([u'a', DN(('cn', 'b'))]) == [b'a', b'cn=b']
+        assert conn.encode(None) is None
+        with assert_raises(TypeError):
+            conn.encode(object())
+
+        assert conn.decode(b'a', 'cn') == u'a'
+        assert conn.decode([b'cn=b'], 'memberof') == [DN(('cn', 'b'))]
+        with assert_raises(ValueError):
+            conn.decode(b'not a dn', 'memberof')
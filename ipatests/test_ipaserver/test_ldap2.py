@@ -0,0 +1,253 @@
+#
+# Copyright (C) 2017  FreeIPA Contributors see COPYING for license
+#
+
+"""
+Tests for the bulk group membership updates of `ipaserver.plugins.ldap2`.
+
+The directory is simulated in memory, no LDAP server is needed.
+"""
+
+import ldap
+import pytest
+
+from ipalib import api, errors
+from ipapython.dn import DN, RDN
+from ipaserver.plugins.ldap2 import ldap2
+
+pytestmark = pytest.mark.tier0
+
+USERS_DN = DN(('cn', 'users'), ('cn', 'accounts'), ('dc', 'example'),
+              ('dc', 'com'))
+GROUPS_DN = DN(('cn', 'groups'), ('cn', 'accounts'), ('dc', 'example'),
+               ('dc', 'com'))
+GROUP_DN = DN(('cn', 'group'), GROUPS_DN)
+
+
+def user_dn(name):
+    return DN(('uid', name), USERS_DN)
+
+
+def decode_dn(value):
+    if isinstance(value, bytes):
+        value = value.decode('utf-8')
+    return DN(value)
+
+
+class FakeEntry(object):
+    def __init__(self, dn, attrs):
+        self.dn = dn
+        self.attrs = attrs
+
+    def get(self, name, default=None):
+        return self.attrs.get(name, default)
+
+
+class FakeConnection(object):
+    """
+    python-ldap connection which modifies member attributes of groups in
+    the directory. Changes in ``concurrent`` are (operation, dn) tuples
+    made by another client right before the next modify operation.
+    """
+    def __init__(self, directory):
+        self.directory = directory
+        self.concurrent = []
+        self.modifies = []
+
+    def modify_s(self, dn, modlist):
+        members = self.directory[DN(dn)]
+        for op, value in self.concurrent:
+            if op == ldap.MOD_ADD:
+                members.add(value)
+            else:
+                members.discard(value)
+        del self.concurrent[:]
+
+        ((op, _attr, values),) = modlist
+        values = [decode_dn(v) for v in values]
+        self.modifies.append((op, values))
+        if op == ldap.MOD_ADD:
+            if any(v in members for v in values):
+                raise ldap.TYPE_OR_VALUE_EXISTS(
+                    {'desc': 'Type or value exists'})
+            members.update(values)
+        else:
+            if any(v not in members for v in values):
+                raise ldap.NO_SUCH_ATTRIBUTE({'desc': 'No such attribute'})
+            members.difference_update(values)
+
+
+class FakeLDAP2(ldap2):
+    """
+    ldap2 looking entries up in a dict which maps DNs of existing entries
+    to their set of members
+    """
+    conn = None
+
+    def __init__(self, directory, chunk_size=2):
+        super(FakeLDAP2, self).__init__(api, ldap_uri='ldap://ipa.example.com')
+        self.member_chunk_size = chunk_size
+        self.directory = directory
+        self.conn = FakeConnection(directory)
+        self.lookups = []
+        self.searches = []
+
+    def get_entry(self, dn, attrs_list=None, **kwargs):
+        self.lookups.append(dn)
+        if dn not in self.directory:
+            raise errors.NotFound(reason='no such entry')
+        return FakeEntry(dn, {'member': list(self.directory[dn])})
+
+    def get_entries(self, base_dn, scope=ldap.SCOPE_SUBTREE, filter=None,
+                    attrs_list=None, **kwargs):
+        assert scope == self.SCOPE_ONELEVEL
+        self.searches.append(filter)
+        entries = [
+            FakeEntry(dn, {}) for dn in self.directory
+            if dn[1:] == base_dn and
+            self.make_filter_from_attr(dn[0].attr, dn[0].value) in filter
+        ]
+        if not entries:
+            raise errors.NotFound(reason='no such entry')
+        return entries
+
+
+def make_directory(*members):
+    directory = dict((user_dn(u'user%d' % i), set()) for i in range(10))
+    directory[GROUP_DN] = set(members)
+    return directory
+
+
+def test_add_entries_chunks():
+    directory = make_directory()
+    backend = FakeLDAP2(directory)
+    dns = [user_dn(u'user%d' % i) for i in range(5)]
+
+    assert backend.add_entries_to_group(dns, GROUP_DN) == []
+
+    assert directory[GROUP_DN] == set(dns)
+    assert backend.conn.modifies == [
+        (ldap.MOD_ADD, dns[0:2]),
+        (ldap.MOD_ADD, dns[2:4]),
+        (ldap.MOD_ADD, dns[4:5]),
+    ]
+    # existence is checked with one search per chunk of the same parent
+    assert len(backend.searches) == 3
+    assert backend.lookups == [GROUP_DN]
+
+
+def test_add_entries_fallback():
+    directory = make_directory()
+    backend = FakeLDAP2(directory)
+    dns = [user_dn(u'user%d' % i) for i in range(4)]
+    # user1 is added by somebody else after the group was read
+    backend.conn.concurrent.append((ldap.MOD_ADD, dns[1]))
+
+    failed = backend.add_entries_to_group(dns, GROUP_DN)
+
+    assert [(dn, type(e)) for dn, e in failed] == [
+        (dns[1], errors.AlreadyGroupMember)]
+    assert directory[GROUP_DN] == set(dns)
+    # the failed chunk is retried entry by entry, the next one is not
+    assert backend.conn.modifies == [
+        (ldap.MOD_ADD, dns[0:2]),
+        (ldap.MOD_ADD, dns[0:1]),
+        (ldap.MOD_ADD, dns[1:2]),
+        (ldap.MOD_ADD, dns[2:4]),
+    ]
+
+
+def test_add_entries_errors_order():
+    member = user_dn(u'user0')
+    directory = make_directory(member)
+    directory[DN(('cn', 'other'), GROUPS_DN)] = set()
+    backend = FakeLDAP2(directory)
+    missing = user_dn(u'missing')
+    dns = [
+        user_dn(u'user1'),
+        missing,
+        GROUP_DN,
+        member,
+        user_dn(u'user2'),
+        user_dn(u'user1'),
+        DN(('cn', 'other'), GROUPS_DN),
+    ]
+
+    failed = backend.add_entries_to_group(dns, GROUP_DN)
+
+    # duplicates are reported at the position of the repeated dn
+    assert [(dn, type(e)) for dn, e in failed] == [
+        (missing, errors.NotFound),
+        (GROUP_DN, errors.SameGroupError),
+        (member, errors.AlreadyGroupMember),
+        (user_dn(u'user1'), errors.AlreadyGroupMember),
+    ]
+    assert directory[GROUP_DN] == {
+        member, user_dn(u'user1'), user_dn(u'user2'),
+        DN(('cn', 'other'), GROUPS_DN)}
+
+
+def test_add_entries_allow_same():
+    directory = make_directory()
+    backend = FakeLDAP2(directory)
+
+    assert backend.add_entries_to_group(
+        [GROUP_DN], GROUP_DN, allow_same=True) == []
+    assert directory[GROUP_DN] == {GROUP_DN}
+
+
+def test_add_entries_multivalued_rdn():
+    multi = DN(RDN(('uid', 'multi'), ('cn', 'multi')), USERS_DN)
+    missing = DN(RDN(('uid', 'missing'), ('cn', 'missing')), USERS_DN)
+    directory = make_directory()
+    directory[multi] = set()
+    backend = FakeLDAP2(directory)
+    dns = [multi, user_dn(u'user0'), missing]
+
+    failed = backend.add_entries_to_group(dns, GROUP_DN)
+
+    assert [(dn, type(e)) for dn, e in failed] == [
+        (missing, errors.NotFound)]
+    assert directory[GROUP_DN] == {multi, user_dn(u'user0')}
+    # multi-valued RDNs are looked up one by one, the rest is searched
+    assert sorted(backend.lookups) == sorted([multi, missing, GROUP_DN])
+    assert len(backend.searches) == 1
+
+
+def test_remove_entries_chunks():
+    dns = [user_dn(u'user%d' % i) for i in range(5)]
+    directory = make_directory(*dns)
+    backend = FakeLDAP2(directory)
+
+    assert backend.remove_entries_from_group(dns, GROUP_DN) == []
+
+    assert directory[GROUP_DN] == set()
+    assert backend.conn.modifies == [
+        (ldap.MOD_DELETE, dns[0:2]),
+        (ldap.MOD_DELETE, dns[2:4]),
+        (ldap.MOD_DELETE, dns[4:5]),
+    ]
+
+
+def test_remove_entries_fallback():
+    dns = [user_dn(u'user%d' % i) for i in range(4)]
+    directory = make_directory(*dns)
+    backend = FakeLDAP2(directory)
+    # user0 is removed by somebody else after the group was read
+    backend.conn.concurrent.append((ldap.MOD_DELETE, dns[0]))
+
+    failed = backend.remove_entries_from_group(
+        dns + [user_dn(u'user5'), dns[1]], GROUP_DN)
+
+    assert [(dn, type(e)) for dn, e in failed] == [
+        (dns[0], errors.NotGroupMember),
+        (user_dn(u'user5'), errors.NotGroupMember),
+        (dns[1], errors.NotGroupMember),
+    ]
+    assert directory[GROUP_DN] == set()
+    assert backend.conn.modifies == [
+        (ldap.MOD_DELETE, dns[0:2]),
+        (ldap.MOD_DELETE, dns[0:1]),
+        (ldap.MOD_DELETE, dns[1:2]),
+        (ldap.MOD_DELETE, dns[2:4]),
+    ]
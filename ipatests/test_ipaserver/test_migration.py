@@ -0,0 +1,221 @@
+#
+# Copyright (C) 2017  FreeIPA Contributors see COPYING for license
+#
+
+"""
+Tests for the `ipaserver.plugins.migration` module.
+"""
+
+import os
+import threading
+
+import pytest
+
+from ipapython.dn import DN
+from ipaserver.plugins import migration
+
+pytestmark = pytest.mark.tier0
+
+BASE_DN = DN(('dc', 'example'), ('dc', 'com'))
+SEARCH_BASES = {
+    'user': DN(('ou', 'people'), BASE_DN),
+    'group': DN(('ou', 'groups'), BASE_DN),
+}
+
+
+@pytest.fixture
+def migration_dir(tmpdir, monkeypatch):
+    monkeypatch.setattr(migration.paths, 'IPA_MIGRATION_DIR', str(tmpdir))
+    return tmpdir
+
+
+def make_checkpoint(ldapuri=u'ldap://ds.example.com', options=None):
+    return migration.MigrationCheckpoint(ldapuri, BASE_DN, SEARCH_BASES,
+                                         options)
+
+
+def test_checkpoint_resume(migration_dir):
+    checkpoint = make_checkpoint()
+    assert checkpoint.load() == {}
+    checkpoint.add('user', u'tuser')
+    checkpoint.add('user', u'\u010dapek')
+    checkpoint.add('group', u'tuser')
+    checkpoint.close()
+
+    checkpoint = make_checkpoint()
+    assert checkpoint.load() == {
+        'user': {u'tuser', u'\u010dapek'},
+        'group': {u'tuser'},
+    }
+    assert checkpoint.is_migrated('user', u'\u010dapek')
+    assert checkpoint.is_migrated('group', u'tuser')
+    assert not checkpoint.is_migrated('group', u'\u010dapek')
+    assert not checkpoint.is_migrated('netgroup', u'tuser')
+
+    # objects migrated after resuming are appended
+    checkpoint.add('group', u'admins')
+    checkpoint.close()
+    assert make_checkpoint().load()['group'] == {u'tuser', u'admins'}
+
+
+def test_checkpoint_per_migration(migration_dir):
+    checkpoint = make_checkpoint()
+    checkpoint.load()
+    checkpoint.add('user', u'tuser')
+    checkpoint.close()
+
+    other = make_checkpoint(u'ldap://ds2.example.com')
+    assert other.filename != checkpoint.filename
+    assert other.load() == {}
+    other.close()
+
+
+def test_checkpoint_options(migration_dir):
+    options = dict(schema=u'RFC2307bis', exclude_users=(u'a', u'B'))
+    checkpoint = make_checkpoint(options=options)
+    same = make_checkpoint(options=dict(schema=u'RFC2307bis',
+                                        exclude_users=[u'b', u'A']))
+    assert same.filename == checkpoint.filename
+
+    for other in (dict(schema=u'RFC2307', exclude_users=(u'a', u'b')),
+                  dict(schema=u'RFC2307bis', exclude_users=(u'a',)),
+                  None):
+        assert make_checkpoint(options=other).filename != checkpoint.filename
+
+
+def test_checkpoint_recorded_immediately(migration_dir):
+    checkpoint = make_checkpoint()
+    checkpoint.load()
+    checkpoint.add('user', u'tuser')
+
+    # an interrupted migration does not close the file
+    assert make_checkpoint().load() == {'user': {u'tuser'}}
+    checkpoint.close()
+
+
+def test_checkpoint_remove(migration_dir):
+    checkpoint = make_checkpoint()
+    checkpoint.load()
+    checkpoint.add('user', u'tuser')
+    assert os.path.exists(checkpoint.filename)
+
+    checkpoint.remove()
+    assert not os.path.exists(checkpoint.filename)
+    # adding after the file is closed is ignored, removing twice is fine
+    checkpoint.add('user', u'other')
+    checkpoint.remove()
+    assert make_checkpoint().load() == {}
+
+
+def test_checkpoint_unwritable(migration_dir):
+    migration_dir.remove()
+    checkpoint = make_checkpoint()
+    assert checkpoint.load() == {}
+    checkpoint.add('user', u'tuser')
+    checkpoint.remove()
+
+
+class FakeAPI(object):
+    Object = {'user': None, 'group': None}
+
+
+class FakeLDAP(object):
+    def __init__(self):
+        self.connects = 0
+        self.disconnects = 0
+        self.lock = threading.Lock()
+
+    def connect(self, ccache=None):
+        with self.lock:
+            self.connects += 1
+
+    def disconnect(self):
+        with self.lock:
+            self.disconnects += 1
+
+    def has_upg(self):
+        return True
+
+
+class FakeDSLDAP(FakeLDAP):
+    def __init__(self, pkeys):
+        super(FakeDSLDAP, self).__init__()
+        self.pkeys = pkeys
+
+    def iter_entries(self, filter, attrs_list, base_dn, scope, **kwargs):
+        for pkey in self.pkeys:
+            yield pkey
+
+
+class FakeCheckpoint(object):
+    removed = False
+
+    def remove(self):
+        self.removed = True
+
+
+class migrate_test(migration.migrate_ds):
+    """
+    migrate_ds which records the migrated entries instead of adding them
+    """
+    migrate_order = ('user',)
+
+    def __init__(self, fail=None):
+        super(migrate_test, self).__init__(FakeAPI())
+        self.fail = fail
+        self.threads = set()
+
+    def _migrate_entry(self, ldap, ldap_obj_name, entry_attrs, config,
+                       context, options, state):
+        self.threads.add(threading.current_thread().ident)
+        if entry_attrs == self.fail:
+            raise RuntimeError('failed to migrate %s' % entry_attrs)
+        return entry_attrs
+
+
+def migrate(command, pkeys, threaded=True):
+    ldap = FakeLDAP()
+    ds_ldap = FakeDSLDAP(pkeys)
+    checkpoint = FakeCheckpoint()
+    options = {'userobjectclass': ('person',), 'exclude_users': (),
+               'scope': u'onelevel'}
+    try:
+        migrated, failed = command.migrate(
+            ldap, {}, ds_ldap, BASE_DN, options,
+            ds_connect=ds_ldap.connect if threaded else None,
+            checkpoint=checkpoint)
+    finally:
+        if threaded:
+            assert ldap.connects == ldap.disconnects == 4
+            assert ds_ldap.connects == ds_ldap.disconnects == 4
+    assert checkpoint.removed
+    return migrated, failed
+
+
+def test_migrate_threaded():
+    pkeys = [u'user%d' % i for i in range(3000)]
+    command = migrate_test()
+    migrated, failed = migrate(command, pkeys)
+
+    assert sorted(migrated['user']) == sorted(pkeys)
+    assert failed == {'user': {}}
+    assert threading.current_thread().ident not in command.threads
+
+
+def test_migrate_unthreaded():
+    command = migrate_test()
+    migrated, _failed = migrate(command, [u'user1', u'user2'],
+                                threaded=False)
+
+    assert migrated['user'] == [u'user1', u'user2']
+    assert command.threads == {threading.current_thread().ident}
+
+
+def test_migrate_threaded_error():
+    # more entries than fit in the queue, the producer must not block
+    # once the workers stop
+    pkeys = [u'user%d' % i for i in range(5000)]
+    command = migrate_test(fail=u'user10')
+    with pytest.raises(RuntimeError) as e:
+        migrate(command, pkeys)
+    assert str(e.value) == 'failed to migrate user10'
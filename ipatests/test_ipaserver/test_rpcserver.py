@@ -21,6 +21,8 @@
 Test the `ipaserver.rpc` module.
 """
 
+import gzip
+import io
 import json
 import pytest
 
@@ -52,6 +54,22 @@ class StartResponse(object):
         self.headers = headers
 
 
+def test_accepts_gzip():
+    f = rpcserver.accepts_gzip
+    assert f({'HTTP_ACCEPT_ENCODING': 'gzip, deflate'})
+    assert f({'HTTP_ACCEPT_ENCODING': 'deflate, GZIP;q=0.5'})
+    assert not f({'HTTP_ACCEPT_ENCODING': 'gzip;q=0'})
+    assert not f({'HTTP_ACCEPT_ENCODING': 'identity'})
+    assert not f({})
+
+
+def test_gzip_compress():
+    data = b'{"result": null}' * 1000
+    compressed = rpcserver.gzip_compress(data)
+    assert len(compressed) < len(data)
+    assert gzip.GzipFile(fileobj=io.BytesIO(compressed)).read() == data
+
+
 def test_not_found():
     api = 'the api instance'
     f = rpcserver.HTTP_Status(api)
@@ -221,3 +221,74 @@ def test_entry_to_dict():
     assert_deepequal(
         baseldap.entry_to_dict(entry, all=True, raw=True),
         the_dict)
+
+
+@pytest.mark.tier0
+def test_bulk_create_post_callbacks():
+    """Test that LDAPBulkCreate calls the callbacks of its create command"""
+    messages = []
+
+    class FakeEntry(object):
+        def __init__(self, dn):
+            self.dn = dn
+
+    class FakeLDAP(object):
+        def add_entries(self, entries, window=100):
+            return [errors.DuplicateEntry() if e.dn == DN('cn=dup') else None
+                    for e in entries]
+
+    class bulktest_add(baseldap.BaseLDAPCommand):
+        """Fake create command"""
+        def _prepare_entry(self, ldap, *keys, **options):
+            return FakeEntry(DN(('cn', keys[-1]))), []
+
+        def _handle_add_error(self, error, *keys):
+            raise error
+
+        def post_callback(self, ldap, dn, entry_attrs, *keys, **options):
+            messages.append(('create command post_callback', keys))
+            return dn
+
+    def registered_callback(self, ldap, dn, entry_attrs, *keys, **options):
+        assert isinstance(self, bulktest_add)
+        assert entry_attrs.dn == dn
+        messages.append(('registered callback', keys, options['flag']))
+        if keys[-1] == u'broken':
+            raise errors.ValidationError(name='cn', error=u'broken')
+        return dn
+
+    bulktest_add.register_post_callback(registered_callback)
+
+    class FakeAPI(object):
+        Command = {}
+
+    class bulktest_add_bulk(baseldap.LDAPBulkCreate):
+        """Fake bulk create command"""
+        create_command = 'bulktest_add'
+
+        class obj(object):
+            backend = FakeLDAP()
+
+        def _prepare_item(self, command, item, version):
+            return (item['cn'],), dict(flag=item['cn'].upper())
+
+        def post_callback(self, ldap, added, **options):
+            messages.append(
+                ('bulk post_callback', [item.keys for item in added]))
+
+    api = FakeAPI()
+    api.Command['bulktest_add'] = bulktest_add(api)
+    result = bulktest_add_bulk(api).execute(
+        [dict(cn=u'one'), dict(cn=u'dup'), dict(cn=u'broken')],
+        version=u'2.0')
+
+    # the post_callback of the create command is replaced by the one of
+    # the bulk command, other callbacks are called for every added entry
+    assert messages == [
+        ('bulk post_callback', [(u'one',), (u'broken',)]),
+        ('registered callback', (u'one',), u'ONE'),
+        ('registered callback', (u'broken',), u'BROKEN'),
+    ]
+    assert result['count'] == 2
+    assert [r.get('error_name') for r in result['results']] == [
+        None, u'DuplicateEntry', u'ValidationError']
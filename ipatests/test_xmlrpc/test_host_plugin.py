@@ -381,6 +381,35 @@ class TestHostWithService(XMLRPC_test):
                 pass
 
 
+@pytest.mark.tier1
+class TestBulkDelete(XMLRPC_test):
+    def test_delete_bulk(self, host, host2, this_host):
+        """ Delete hosts in bulk, a master is not deleted with the others """
+        host.ensure_exists()
+        host2.ensure_exists()
+
+        service1 = u'dns/%s@%s' % (host.fqdn, host.api.env.realm)
+        host.run_command('service_add', service1, force=True)
+
+        result = host.run_command(
+            'host_del_bulk', [host.fqdn, this_host.fqdn, host2.fqdn])
+
+        assert result['count'] == 2
+        results = result['results']
+        assert [r['value'] for r in results] == [
+            host.fqdn, this_host.fqdn, host2.fqdn]
+        assert results[0]['error'] is None
+        assert DN(results[0]['dn']) == host.dn
+        assert results[1]['error_name'] == u'ValidationError'
+        assert results[2]['error'] is None
+
+        host.track_delete()
+        host2.track_delete()
+        with raises_exact(errors.NotFound(
+                reason=u'%s: service not found' % service1)):
+            host.run_command('service_show', service1)
+
+
 @pytest.mark.tier1
 class TestManagedHosts(XMLRPC_test):
     def test_managed_hosts(self, host, host2, host3):
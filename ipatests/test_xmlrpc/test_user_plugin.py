@@ -534,6 +534,39 @@ class TestCreate(XMLRPC_test):
         testuser.check_create(result)
         testuser.delete()
 
+    def test_create_bulk(self):
+        """ Create users in bulk, an invalid one does not stop the others """
+        testusers = [
+            UserTracker(name=u'tuser%d' % i, givenname=u'Test',
+                        sn=u'Tuser%d' % i)
+            for i in (1, 2)
+        ]
+        for testuser in testusers:
+            testuser.ensure_missing()
+
+        result = api.Command['user_add_bulk']([
+            dict(uid=testusers[0].name, givenname=u'Test', sn=u'Tuser1'),
+            dict(uid=invaliduser1, givenname=u'Test', sn=u'User1'),
+            dict(uid=testusers[1].name, givenname=u'Test', sn=u'Tuser2',
+                 random=True),
+        ])
+
+        assert result['count'] == 2
+        results = result['results']
+        assert [r['value'] for r in results] == [
+            testusers[0].name, None, testusers[1].name]
+        assert results[0]['error'] is None
+        assert DN(results[0]['dn']) == testusers[0].dn
+        assert results[1]['error_name'] == u'ValidationError'
+        assert results[2]['error'] is None
+        assert results[2]['randompassword']
+
+        for testuser in testusers:
+            testuser.track_create()
+            entry = api.Command['user_show'](testuser.name)['result']
+            assert u'ipausers' in entry['memberof_group']
+            testuser.delete()
+
     def test_create_with_different_default_home(self, user):
         """ Change default home directory and check that a newly created
             user has his home set properly """